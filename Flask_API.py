@@ -3,38 +3,58 @@ from flask_cors import CORS
 from dotenv import load_dotenv
 import os
 
+from log_utils import get_logger
+
 # RAG 로직 불러오기
 from rag_utils_flask import (
     get_similar_business_info_rag,
     get_rag_business_recommendation,
     get_location_analysis_with_rag,
-    ask_chat_with_rag
+    build_chat_context,
+    ask_chat_with_context
 )
+from session_store import AnalysisSessionStore, SessionTooLarge
+from cache_utils import start_snapshotter
 
 # .env 파일 불러오기
 load_dotenv()
 
+logger = get_logger(__name__)
+
 # Flask 앱 초기화
 app = Flask(__name__)
 CORS(app)  # CORS 허용 (React 연동 시 필수)
 
+# 분석 결과 서버 측 세션 (클라이언트는 session_id 만 주고받음)
+sessions = AnalysisSessionStore()
+
 # 👉 /ask: 자유 질의 GPT
 @app.route("/ask", methods=["POST"])
 def ask():
     data = request.json
     question = data.get("question", "")
-    analyzed = data.get("analyzed", {})  # 추가된 분석 context (선택)
+    session_id = data.get("session_id")
+    analyzed = data.get("analyzed", {})  # (이전 방식) 분석 결과 전체를 직접 전달
 
-    print("🧾 받은 질문:", question)
+    logger.info("받은 질문: %s", question)
 
     if not question:
         return jsonify({"error": "질문이 비어 있습니다."}), 400
 
+    if session_id:
+        session = sessions.get(session_id)
+        if session is None:
+            return jsonify({"error": "분석 세션이 없거나 만료되었습니다. 다시 분석해주세요."}), 404
+        # /analyze 때 만들어 둔 컨텍스트를 그대로 사용 (매 턴 다시 만들지 않음)
+        context = session["context"]
+    else:
+        context = build_chat_context(analyzed)
+
     try:
-        answer = ask_chat_with_rag(question, analyzed_context=analyzed)
+        answer = ask_chat_with_context(question, context)
         return jsonify({"answer": answer})
     except Exception as e:
-        print("❌ 오류:", e)
+        logger.exception("/ask 오류: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # 👉 /analyze: 지역 및 업종 분석
@@ -56,16 +76,28 @@ def analyze():
         recommendation = get_rag_business_recommendation(gu, dong, population, estate)
         location_analysis = get_location_analysis_with_rag(gu, dong, item, population, estate, similar["description"])
 
-        return jsonify({
+        result = {
             "score": score,
             "recommendation": recommendation,
             "location_analysis": location_analysis,
             "similar": similar
-        })
+        }
+        analyzed = {
+            "gu": gu, "dong": dong, "item": item,
+            "population": {"PSNG_NO": (population or {}).get("PSNG_NO", "정보 없음")},
+            **result
+        }
+        try:
+            result["session_id"] = sessions.create({"analyzed": analyzed, "context": build_chat_context(analyzed)})
+        except SessionTooLarge as e:
+            # 세션 저장에 실패해도 분석 결과는 반환 (클라이언트는 이전 방식으로 /ask 가능)
+            logger.warning("analysis session not stored: %s", e)
+        return jsonify(result)
     except Exception as e:
-        print("❌ 분석 오류:", e)
+        logger.exception("/analyze 분석 오류: %s", e, extra={"gu": gu, "dong": dong, "item": item})
         return jsonify({"error": str(e)}), 500
 
 # ✅ 서버 실행
 if __name__ == "__main__":
+    start_snapshotter()  # CACHE_SNAPSHOT_PATH 가 있으면 주기적으로 캐시 스냅샷 저장
     app.run(host="0.0.0.0", port=8000)
@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+
+# ✅ 워커 콜드 스타트 벤치마크
+# 새 파이썬 프로세스에서 rag_total_final_api 를 import 하는 데 걸리는 시간을 측정하고 목표치와 비교합니다.
+# 사용법: python bench_startup.py [반복 횟수]
+#   STARTUP_TARGET_SEC (기본 0.5초) 보다 중앙값이 크면 종료 코드 1
+
+TARGET_SEC = float(os.environ.get("STARTUP_TARGET_SEC", "0.5"))
+MODULE = "rag_total_final_api"
+
+# import 만으로는 로드되면 안 되는 무거운 모듈들
+HEAVY_MODULES = ["langchain", "langchain_community", "weaviate", "pandas", "flask_cors"]
+
+CHILD_CODE = f"""
+import sys, time, json
+start = time.perf_counter()
+import {MODULE}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+def measure_once():
+    env = dict(os.environ)
+    # 설정 검증은 앱 시작 시점에 하므로 import 는 환경 변수 없이도 성공해야 합니다
+    for name in ["REAL_ESTATE_KEY", "POPULATION_API_KEY"]:
+        env.pop(name, None)
+    wall_start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - wall_start
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["wall"] = wall
+    return result
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [measure_once() for _ in range(runs)]
+    imports = [r["elapsed"] for r in results]
+    walls = [r["wall"] for r in results]
+    heavy = sorted({m for r in results for m in r["heavy"]})
+
+    median = statistics.median(imports)
+    print(f"[{MODULE}] import 중앙값: {median * 1000:.1f}ms (최소 {min(imports) * 1000:.1f}ms, 최대 {max(imports) * 1000:.1f}ms)")
+    print(f"[{MODULE}] 프로세스 전체 중앙값: {statistics.median(walls) * 1000:.1f}ms")
+    print(f"목표: {TARGET_SEC * 1000:.0f}ms 이하")
+
+    ok = median <= TARGET_SEC
+    if heavy:
+        print(f"❌ import 시점에 로드된 무거운 모듈: {', '.join(heavy)}")
+        ok = False
+    print("✅ 통과" if ok else "❌ 실패")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,730 @@
+import os
+import mmap
+import time
+import json
+import pickle
+import random
+import struct
+import sqlite3
+import hashlib
+import weakref
+import functools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from log_utils import get_logger
+from resilience import LastGood, get_executor
+
+logger = get_logger(__name__)
+
+# ✅ 2단 캐시 (프로세스 내 LRU → 프로세스 간 공유 저장소)
+# 여러 API 프로세스(serve.py 워커, Flask_API)가 같은 캐시를 보도록 공유 계층을 둡니다.
+#   CACHE_URL=memory (기본, 공유 계층 없음) | sqlite:///경로/cache.sqlite | redis://host:6379/0
+#   CACHE_PREFIX: 키 앞에 붙는 이름 (기본 devicemart)
+# 키는 "{prefix}:{namespace}:{key}" 로 네임스페이스가 나뉘며, 값은 pickle 로 직렬화합니다.
+
+CACHE_PREFIX = os.environ.get("CACHE_PREFIX", "devicemart")
+LOCAL_CACHE_MAX_ENTRIES = int(os.environ.get("LOCAL_CACHE_MAX_ENTRIES", "2048"))
+
+_MISSING = object()
+
+# 1. 직렬화
+class PickleSerializer:
+    def dumps(self, value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+class JsonSerializer:
+    def dumps(self, value):
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+def make_key(*parts):
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=repr)
+    # 긴 키(프롬프트 등)는 해시로 줄임
+    return raw if len(raw) <= 200 else hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+# 2. 프로세스 내 LRU (항목별 만료 시각)
+class LRUCache:
+    def __init__(self, max_entries=LOCAL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl if ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        # (key, value, expires_at) 복사본 (스냅샷 저장용)
+        with self._lock:
+            return [(key, value, expires_at) for key, (value, expires_at) in self._entries.items()]
+
+    def __len__(self):
+        return len(self._entries)
+
+# 3. 공유 저장소 백엔드 (bytes 값, 초 단위 TTL)
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def add(self, key, value, ttl=None):
+        # 공유 저장소가 없으면 프로세스 간 잠금도 없음 (항상 획득 성공)
+        return True
+
+    def delete(self, key):
+        pass
+
+    def delete_if(self, key, value):
+        pass
+
+    def extend_if(self, key, value, ttl):
+        return True
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)")
+
+    def _conn(self):
+        # 스레드/프로세스마다 별도 커넥션
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _expires_at(ttl):
+        return time.time() + ttl if ttl else None
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, self._expires_at(ttl))
+        )
+        # 가끔 만료 항목 정리
+        if random.random() < 0.01:
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def add(self, key, value, ttl=None):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?", (key, now))
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, self._expires_at(ttl))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cur.rowcount == 1
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def delete_if(self, key, value):
+        # 값이 그대로일 때만 삭제 (잠금 소유자 확인)
+        self._conn().execute("DELETE FROM cache WHERE key = ? AND value = ?", (key, value))
+
+    def extend_if(self, key, value, ttl):
+        cur = self._conn().execute(
+            "UPDATE cache SET expires_at = ? WHERE key = ? AND value = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self._expires_at(ttl), key, value, time.time())
+        )
+        return cur.rowcount == 1
+
+_REDIS_DELETE_IF = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+_REDIS_EXTEND_IF = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+
+class RedisBackend:
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        # 비교 후 삭제 / 연장은 Lua 스크립트로 원자적으로 실행
+        self._delete_if = self._client.register_script(_REDIS_DELETE_IF)
+        self._extend_if = self._client.register_script(_REDIS_EXTEND_IF)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(key, value, ex=int(ttl) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self._client.set(key, value, ex=int(ttl) if ttl else None, nx=True))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def delete_if(self, key, value):
+        self._delete_if(keys=[key], args=[value])
+
+    def extend_if(self, key, value, ttl):
+        return bool(self._extend_if(keys=[key], args=[value, int(ttl * 1000)]))
+
+def create_backend(url):
+    if not url or url == "memory":
+        return NullBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"지원하지 않는 CACHE_URL 입니다: {url}")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(os.environ.get("CACHE_URL", "memory"))
+    return _backend
+
+# 4. 2단 캐시
+_caches = weakref.WeakSet()
+
+LOCK_RENEW_TICK_SEC = 1.0
+
+class _LockKeeper:
+    # 잡고 있는 공유 잠금을 ttl 의 1/3 마다 연장 (계산이 lock_ttl 보다 오래 걸려도 잠금이 중간에 풀리지 않도록)
+    # 프로세스마다 스레드 하나가 모든 잠금을 돌봄
+    def __init__(self):
+        self._held = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def hold(self, backend, lock_key, token, ttl):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._held, self._pid = {}, os.getpid()
+                threading.Thread(target=self._run, name="cache-lock-keeper", daemon=True).start()
+            self._held[token] = (backend, lock_key, ttl, time.monotonic() + ttl / 3)
+
+    def release(self, token):
+        with self._lock:
+            self._held.pop(token, None)
+
+    def _run(self):
+        while True:
+            time.sleep(LOCK_RENEW_TICK_SEC)
+            now = time.monotonic()
+            with self._lock:
+                due = [(token, entry) for token, entry in self._held.items() if entry[3] <= now]
+            for token, (backend, lock_key, ttl, _) in due:
+                try:
+                    kept = backend.extend_if(lock_key, token, ttl)
+                except Exception as e:
+                    logger.warning("shared cache lock renew failed (%s): %s", lock_key, e)
+                    kept = True
+                with self._lock:
+                    if token not in self._held:
+                        continue
+                    if kept:
+                        self._held[token] = (backend, lock_key, ttl, now + ttl / 3)
+                    else:
+                        logger.warning("shared cache lock lost: %s", lock_key)
+                        del self._held[token]
+
+_lock_keeper = _LockKeeper()
+
+class TwoTierCache:
+    def __init__(self, namespace, ttl, local_ttl=None, backend=None, serializer=None, local=None, lock_ttl=30):
+        self.namespace = namespace
+        self.ttl = ttl
+        # 로컬 계층은 공유 계층보다 짧게 유지해 다른 프로세스의 갱신을 빨리 반영
+        self.local_ttl = local_ttl if local_ttl is not None else min(ttl, 60)
+        self._backend = backend
+        self.serializer = serializer or PickleSerializer()
+        self.local = local or LRUCache()
+        self.lock_ttl = lock_ttl
+        # 키별 락은 고정 개수로 나눠 씀 (키가 늘어나도 락 객체가 쌓이지 않음)
+        self._key_locks = [threading.Lock() for _ in range(64)]
+        _caches.add(self)
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def _local_ttl(self, ttl):
+        # 공유 계층이 없으면(memory) 로컬 계층이 유일한 저장소이므로 전체 TTL 을 유지
+        if isinstance(self.backend, NullBackend):
+            return ttl
+        return min(ttl, self.local_ttl)
+
+    def full_key(self, key):
+        return f"{CACHE_PREFIX}:{self.namespace}:{key}"
+
+    def get(self, key, default=None):
+        full_key = self.full_key(key)
+        value = self.local.get(full_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        try:
+            data = self.backend.get(full_key)
+        except Exception as e:
+            logger.warning("shared cache get failed (%s): %s", self.namespace, e)
+            data = None
+        if data is None:
+            return self._from_snapshot(full_key, default)
+        value = self.serializer.loads(data)
+        self.local.set(full_key, value, self.local_ttl)
+        return value
+
+    def _from_snapshot(self, full_key, default):
+        snapshot = get_snapshot()
+        found = snapshot.get(full_key) if snapshot is not None else None
+        if found is None:
+            return default
+        value, expires_at = found
+        # 스냅샷 이후 TTL 설정이 줄었으면 현재 TTL 기준으로 자름
+        ttl = self.ttl if expires_at is None else min(expires_at - time.time(), self.ttl)
+        if ttl <= 0:
+            return default
+        self.local.set(full_key, value, self._local_ttl(ttl))
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        full_key = self.full_key(key)
+        self.local.set(full_key, value, self._local_ttl(ttl))
+        try:
+            self.backend.set(full_key, self.serializer.dumps(value), ttl)
+        except Exception as e:
+            logger.warning("shared cache set failed (%s): %s", self.namespace, e)
+
+    def delete(self, key):
+        full_key = self.full_key(key)
+        self.local.delete(full_key)
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            snapshot.discard(full_key)
+        try:
+            self.backend.delete(full_key)
+        except Exception as e:
+            logger.warning("shared cache delete failed (%s): %s", self.namespace, e)
+
+    def _key_lock(self, key):
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    @contextmanager
+    def lock(self, key):
+        # 프로세스 간 잠금 (공유 저장소의 add/SETNX), 획득 여부를 yield
+        # 값은 이 잠금만의 토큰: 잡고 있는 동안 lock_ttl 을 계속 연장하고, 풀 때는 토큰이 같을 때만 삭제
+        # (프로세스가 죽으면 lock_ttl 뒤 자동 해제, 다른 프로세스가 새로 잡은 잠금은 지우지 않음)
+        backend = self.backend
+        lock_key = self.full_key(key) + ":lock"
+        token = os.urandom(16).hex().encode()
+        try:
+            acquired = backend.add(lock_key, token, self.lock_ttl)
+        except Exception as e:
+            logger.warning("shared cache lock failed (%s): %s", self.namespace, e)
+            acquired, token = True, None
+        if acquired and token is not None and not isinstance(backend, NullBackend):
+            _lock_keeper.hold(backend, lock_key, token, self.lock_ttl)
+        try:
+            yield acquired
+        finally:
+            if acquired and token is not None:
+                _lock_keeper.release(token)
+                try:
+                    backend.delete_if(lock_key, token)
+                except Exception:
+                    pass
+
+    def _latest(self, key):
+        # 공유 저장소의 최신 값 우선 (로컬 계층은 다른 프로세스의 갱신을 아직 못 봤을 수 있음)
+        full_key = self.full_key(key)
+        try:
+            data = self.backend.get(full_key)
+        except Exception as e:
+            logger.warning("shared cache get failed (%s): %s", self.namespace, e)
+            data = None
+        if data is not None:
+            return self.serializer.loads(data)
+        value = self.local.get(full_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return self._from_snapshot(full_key, None)
+
+    def update(self, key, fn, ttl=None):
+        # 읽고-고쳐-쓰기: 키 잠금 안에서 최신 값(없으면 None)에 fn 을 적용해 저장, fn 이 None 을 돌려주면 저장하지 않음
+        # 다른 프로세스가 잠금을 lock_ttl 넘게 잡고 있으면 잠금 없이 진행
+        with self._key_lock(key):
+            deadline = time.monotonic() + self.lock_ttl
+            while True:
+                with self.lock(key) as acquired:
+                    if acquired or time.monotonic() >= deadline:
+                        value = fn(self._latest(key))
+                        if value is not None:
+                            self.set(key, value, ttl)
+                        return value
+                time.sleep(0.05)
+
+    def get_or_compute(self, key, compute, ttl=None, cacheable=None):
+        # 캐시 스탬피드 방지: 프로세스 안에서는 키별 락, 프로세스 간에는 공유 잠금으로 한 곳에서만 계산
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._key_lock(key):
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            with self.lock(key) as acquired:
+                if not acquired:
+                    # 다른 프로세스가 계산 중이면 결과가 올라올 때까지 잠시 대기
+                    deadline = time.monotonic() + self.lock_ttl
+                    while time.monotonic() < deadline:
+                        time.sleep(0.05)
+                        value = self.get(key, _MISSING)
+                        if value is not _MISSING:
+                            return value
+                value = compute()
+                if isinstance(value, LastGood):
+                    # 업스트림 실패로 마지막 정상 응답을 대신 받은 경우는 저장하지 않음
+                    return value.value
+                if cacheable is None or cacheable(value):
+                    self.set(key, value, ttl)
+                return value
+
+def cached(namespace, ttl, key=None, cacheable=None, **cache_kwargs):
+    cache = TwoTierCache(namespace, ttl, **cache_kwargs)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs) if key else make_key(fn.__name__, args, kwargs)
+            return cache.get_or_compute(cache_key, lambda: fn(*args, **kwargs), cacheable=cacheable)
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+# 5. 캐시 스냅샷 (재시작 / 배포 직후 콜드 캐시로 업스트림과 LLM 호출이 몰리는 것을 방지)
+# - 주기적으로(CACHE_SNAPSHOT_INTERVAL_SEC) 각 캐시의 로컬 계층을 CACHE_SNAPSHOT_PATH 파일 하나로 저장
+#   (여러 워커가 같은 파일에 쓰므로 파일 잠금 아래에서 기존 스냅샷의 유효 항목과 합쳐 원자적으로 교체)
+# - 시작 시 파일을 mmap 으로 열고 인덱스만 읽으며, 값은 로컬 / 공유 계층에서 못 찾은 키를 처음 요청할 때 꺼냄
+# - 형식 버전 / CACHE_SNAPSHOT_VERSION / CACHE_PREFIX 가 다르거나 CACHE_SNAPSHOT_MAX_AGE_SEC 보다 오래된 파일은 무시,
+#   항목별 만료 시각도 그대로 유지
+# 파일 형식: MAGIC | 헤더 길이(8바이트) | 헤더(pickle: 버전, 생성 시각, 키 → (offset, length, expires_at)) | 값(pickle) 들
+CACHE_SNAPSHOT_PATH = os.environ.get("CACHE_SNAPSHOT_PATH", "")
+CACHE_SNAPSHOT_INTERVAL_SEC = float(os.environ.get("CACHE_SNAPSHOT_INTERVAL_SEC", "300"))
+CACHE_SNAPSHOT_MAX_AGE_SEC = float(os.environ.get("CACHE_SNAPSHOT_MAX_AGE_SEC", "86400"))
+CACHE_SNAPSHOT_MAX_BYTES = int(os.environ.get("CACHE_SNAPSHOT_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_SNAPSHOT_VERSION = os.environ.get("CACHE_SNAPSHOT_VERSION", "1")
+# 진행 중 작업 상태처럼 재시작 후 의미가 없는 네임스페이스는 제외
+CACHE_SNAPSHOT_EXCLUDE = set(filter(None, os.environ.get("CACHE_SNAPSHOT_EXCLUDE", "jobs").split(",")))
+
+_SNAPSHOT_MAGIC = b"CACHESNAP1"
+_SNAPSHOT_HEADER_LEN = struct.Struct(">Q")
+
+def _namespace_of(full_key):
+    parts = full_key.split(":", 2)
+    return parts[1] if len(parts) == 3 else ""
+
+class CacheSnapshot:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.created_at = None
+        self._mmap = None
+        self._data_start = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size <= len(_SNAPSHOT_MAGIC) + _SNAPSHOT_HEADER_LEN.size:
+                    return
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return
+        try:
+            if mm[:len(_SNAPSHOT_MAGIC)] != _SNAPSHOT_MAGIC:
+                raise ValueError("unknown snapshot format")
+            (header_len,) = _SNAPSHOT_HEADER_LEN.unpack_from(mm, len(_SNAPSHOT_MAGIC))
+            start = len(_SNAPSHOT_MAGIC) + _SNAPSHOT_HEADER_LEN.size
+            header = pickle.loads(mm[start:start + header_len])
+        except Exception as e:
+            logger.warning("cache snapshot %s unreadable: %s", self.path, e)
+            mm.close()
+            return
+        age = time.time() - header["created_at"]
+        if header["version"] != CACHE_SNAPSHOT_VERSION or header["prefix"] != CACHE_PREFIX or age > CACHE_SNAPSHOT_MAX_AGE_SEC:
+            logger.info("cache snapshot %s ignored (version=%s, age=%.0fs)", self.path, header["version"], age)
+            mm.close()
+            return
+        now = time.time()
+        self.entries = {key: entry for key, entry in header["entries"].items() if entry[2] is None or entry[2] > now}
+        self.created_at = header["created_at"]
+        self._mmap = mm
+        self._data_start = start + header_len
+        logger.debug("cache snapshot %s loaded: %d entries (age %.0fs)", self.path, len(self.entries), age)
+
+    def raw(self, full_key):
+        entry = self.entries.get(full_key)
+        if entry is None:
+            return None
+        offset, length, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        start = self._data_start + offset
+        return self._mmap[start:start + length], expires_at
+
+    def get(self, full_key):
+        found = self.raw(full_key)
+        if found is None:
+            return None
+        data, expires_at = found
+        try:
+            return pickle.loads(data), expires_at
+        except Exception as e:
+            logger.warning("cache snapshot entry %s unreadable: %s", full_key, e)
+            self.discard(full_key)
+            return None
+
+    def discard(self, full_key):
+        self.entries.pop(full_key, None)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+_snapshot = None
+_snapshot_loaded = False
+_snapshot_lock = threading.Lock()
+
+def get_snapshot():
+    # 처음 호출 시 한 번만 mmap (serve.py 마스터에서 열면 워커들이 같은 페이지를 공유)
+    global _snapshot, _snapshot_loaded
+    if not _snapshot_loaded:
+        with _snapshot_lock:
+            if not _snapshot_loaded:
+                if CACHE_SNAPSHOT_PATH:
+                    _snapshot = CacheSnapshot(CACHE_SNAPSHOT_PATH)
+                    logger.info("cache snapshot %s: %d entries", CACHE_SNAPSHOT_PATH, len(_snapshot))
+                _snapshot_loaded = True
+    return _snapshot
+
+@contextmanager
+def _file_lock(path):
+    import fcntl
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def save_snapshot(path=None):
+    path = path or CACHE_SNAPSHOT_PATH
+    if not path:
+        return 0
+    now = time.time()
+    blobs = {}
+    for cache in list(_caches):
+        if cache.namespace in CACHE_SNAPSHOT_EXCLUDE:
+            continue
+        for full_key, value, expires_at in cache.local.items():
+            if expires_at is not None and expires_at <= now:
+                continue
+            try:
+                blobs[full_key] = (pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), expires_at)
+            except Exception as e:
+                logger.debug("cache snapshot skipped %s: %s", full_key, e)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _file_lock(path):
+        # 다른 워커가 저장한 항목 중 아직 유효한 것은 유지 (현재 프로세스 값이 우선)
+        previous = CacheSnapshot(path)
+        for full_key in list(previous.entries):
+            if full_key not in blobs and _namespace_of(full_key) not in CACHE_SNAPSHOT_EXCLUDE:
+                found = previous.raw(full_key)
+                if found is not None:
+                    blobs[full_key] = (bytes(found[0]), found[1])
+        previous.close()
+
+        entries, chunks, offset = {}, [], 0
+        for full_key, (data, expires_at) in blobs.items():
+            if offset + len(data) > CACHE_SNAPSHOT_MAX_BYTES:
+                continue
+            entries[full_key] = (offset, len(data), expires_at)
+            chunks.append(data)
+            offset += len(data)
+        header = pickle.dumps(
+            {"version": CACHE_SNAPSHOT_VERSION, "prefix": CACHE_PREFIX, "created_at": now, "entries": entries},
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_SNAPSHOT_MAGIC)
+            f.write(_SNAPSHOT_HEADER_LEN.pack(len(header)))
+            f.write(header)
+            for data in chunks:
+                f.write(data)
+        os.replace(tmp_path, path)
+    logger.info("cache snapshot saved: %d entries, %d bytes", len(entries), offset)
+    return len(entries)
+
+_snapshotter_pid = None
+
+def start_snapshotter(interval=CACHE_SNAPSHOT_INTERVAL_SEC):
+    # 프로세스(워커)마다 하나씩, 워커끼리 겹치지 않게 주기에 약간의 jitter
+    global _snapshotter_pid
+    if not CACHE_SNAPSHOT_PATH or interval <= 0 or _snapshotter_pid == os.getpid():
+        return
+    _snapshotter_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(interval * random.uniform(0.8, 1.2))
+            try:
+                save_snapshot()
+            except Exception as e:
+                logger.warning("cache snapshot failed: %s", e)
+
+    threading.Thread(target=run, name="cache-snapshot", daemon=True).start()
+
+# 6. stale-while-revalidate 결과 캐시
+# - soft_ttl 이내: 캐시 값을 그대로 반환
+# - soft_ttl ~ hard_ttl: 캐시 값을 바로 반환하고 백그라운드에서 다시 계산
+# - hard_ttl 초과 / 캐시 없음: 요청이 직접 계산 (같은 키는 한 곳에서만 계산)
+# 값은 (value, computed_at) 으로 TwoTierCache 에 저장되므로 여러 프로세스가 같은 결과를 공유합니다.
+# get() 은 (value, meta) 를 반환하며 meta 에 캐시 상태와 데이터 나이가 들어 있습니다.
+
+class StaleWhileRevalidateCache:
+    def __init__(self, soft_ttl, hard_ttl, name="swr", store=None):
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.name = name
+        self.store = store or TwoTierCache(name, hard_ttl, local_ttl=min(soft_ttl, 60))
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _compute_and_store(self, key, compute, cacheable):
+        value = compute()
+        computed_at = time.time()
+        if cacheable is None or cacheable(value):
+            self.store.set(key, (value, computed_at))
+        return value, computed_at
+
+    def _refresh_in_background(self, key, compute, cacheable):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                with self.store.lock(key) as acquired:
+                    # 다른 프로세스가 이미 갱신 중이면 생략
+                    if acquired:
+                        self._compute_and_store(key, compute, cacheable)
+            except Exception as e:
+                logger.warning("%s background refresh failed for %s: %s", self.name, key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        get_executor("refresh").submit(run)
+
+    def get(self, key, compute, cacheable=None, refresh=None):
+        # refresh: stale 값을 백그라운드에서 다시 계산할 함수 (기본 compute, 요청에 묶인 콜백을 넘기지 않을 때 사용)
+        key = make_key(key)
+        entry = self.store.get(key)
+        now = time.time()
+        if entry is not None:
+            value, computed_at = entry
+            age = now - computed_at
+            if age < self.soft_ttl:
+                return value, self._meta("hit", computed_at, now)
+            if age < self.hard_ttl:
+                self._refresh_in_background(key, refresh or compute, cacheable)
+                return value, self._meta("stale", computed_at, now)
+
+        # 저장은 _compute_and_store 가 하므로 get_or_compute 는 스탬피드 방지 용도로만 사용
+        value, computed_at = self.store.get_or_compute(
+            key,
+            lambda: self._compute_and_store(key, compute, cacheable),
+            cacheable=lambda entry: False
+        )
+        return value, self._meta("miss", computed_at, time.time())
+
+    def age(self, key):
+        # 저장된 값이 계산된 지 몇 초 지났는지 (없으면 None)
+        entry = self.store.get(make_key(key))
+        return time.time() - entry[1] if entry is not None else None
+
+    def refresh(self, key, compute, cacheable=None):
+        # 요청을 기다리지 않고 미리 다시 계산해 저장 (다른 프로세스가 같은 키를 계산 중이면 None)
+        key = make_key(key)
+        with self.store.lock(key) as acquired:
+            if not acquired:
+                return None
+            return self._compute_and_store(key, compute, cacheable)
+
+    def invalidate(self, key):
+        self.store.delete(make_key(key))
+
+    @staticmethod
+    def _meta(status, computed_at, now):
+        return {
+            "cache": status,
+            "age_sec": round(max(now - computed_at, 0.0), 3),
+            "computed_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(computed_at))
+        }
@@ -0,0 +1,116 @@
+import hashlib
+
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# ✅ 토큰 예산 기반 상담 대화 기록 관리
+# - system 프롬프트와 최근 대화는 그대로 유지
+# - 오래된 대화는 summarize(이전 요약, 밀려난 대화) 콜백으로 점진적으로 요약해 하나의 요약문으로 유지
+# - 분석 컨텍스트는 매 턴마다 붙이지 않고 별도 system 메시지로 한 번만 포함 (내용이 바뀔 때만 교체)
+# build_messages() 가 만드는 메시지 목록은 항상 token_budget 이하가 되도록 잘립니다.
+
+def _load_encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+_encoder = _load_encoder()
+
+def count_tokens(text):
+    if _encoder is not None:
+        return len(_encoder.encode(text))
+    # tiktoken 이 없으면 보수적으로 추정 (한글은 글자당 1토큰 가까이 나옴)
+    return len(text)
+
+def truncate_tokens(text, limit):
+    # 앞에서부터 limit 토큰까지만 남김
+    if count_tokens(text) <= limit:
+        return text
+    if _encoder is None:
+        return text[:max(limit, 0)]
+    return _encoder.decode(_encoder.encode(text)[:max(limit, 0)])
+
+def message_tokens(message):
+    # 메시지마다 role 등 부가 토큰 약 4개
+    return count_tokens(message["content"]) + 4
+
+class ChatHistoryManager:
+    def __init__(self, system_prompt, summarize=None, token_budget=3000, keep_recent_turns=4, summary_budget=400):
+        self.system_prompt = system_prompt
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.summary_budget = summary_budget
+        self.context = ""
+        self._context_hash = None
+        self.summary = ""
+        self.turns = []
+
+    def set_context(self, context):
+        context = (context or "").strip()
+        context_hash = hashlib.sha1(context.encode("utf-8")).hexdigest()
+        if context_hash != self._context_hash:
+            self.context = context
+            self._context_hash = context_hash
+
+    def add_turn(self, user, assistant):
+        self.turns.append({"user": user, "assistant": assistant})
+        while len(self.turns) > self.keep_recent_turns:
+            self._compact(self.turns.pop(0))
+
+    def _compact(self, turn):
+        if self.summarize is None:
+            return
+        try:
+            self.summary = self.summarize(self.summary, [turn]).strip()
+        except Exception as e:
+            # 요약 실패 시 해당 턴은 요약 없이 버림 (요청 자체는 계속 진행)
+            logger.warning("chat history summarize failed: %s", e)
+        self.summary = truncate_tokens(self.summary, self.summary_budget)
+
+    def _fixed_messages(self):
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if self.context:
+            messages.append({"role": "system", "content": f"[분석 컨텍스트]\n{self.context}"})
+        if self.summary:
+            messages.append({"role": "system", "content": f"[이전 대화 요약]\n{self.summary}"})
+        return messages
+
+    def build_messages(self, user_input):
+        fixed = self._fixed_messages()
+        latest = {"role": "user", "content": user_input}
+        used = sum(message_tokens(m) for m in fixed) + message_tokens(latest)
+
+        # 최근 턴부터 예산 안에 들어가는 만큼만 그대로 포함
+        recent = []
+        for turn in reversed(self.turns):
+            pair = [{"role": "user", "content": turn["user"]}, {"role": "assistant", "content": turn["assistant"]}]
+            cost = sum(message_tokens(m) for m in pair)
+            if used + cost > self.token_budget:
+                break
+            recent = pair + recent
+            used += cost
+
+        messages = fixed + recent + [latest]
+        if used > self.token_budget:
+            messages = self._trim(messages, used)
+        return messages
+
+    def _trim(self, messages, used):
+        # 고정 메시지만으로도 예산을 넘으면 요약 → 컨텍스트 순으로 뒤에서부터 잘라냄
+        over = used - self.token_budget
+        for index in range(len(messages) - 2, 0, -1):
+            if over <= 0:
+                break
+            content = messages[index]["content"]
+            keep = max(count_tokens(content) - over, 0)
+            trimmed = truncate_tokens(content, keep)
+            over -= count_tokens(content) - count_tokens(trimmed)
+            messages[index] = {**messages[index], "content": trimmed}
+        return [m for m in messages if m["content"] or m["role"] == "user"]
+
+    def tokens(self, user_input=""):
+        return sum(message_tokens(m) for m in self.build_messages(user_input))
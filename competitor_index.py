@@ -0,0 +1,589 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# ✅ 경쟁 점포 로컬 인덱스
+# 카카오 장소 검색 결과(좌표 / 카테고리)를 sqlite 파일(COMPETITOR_DB_PATH)에 모아두고,
+# 프로세스마다 위경도 격자(COMPETITOR_CELL_M)로 색인해 "동 중심 반경 r 미터 안의 카테고리 c 점포 수" 를 원격 호출 없이 계산합니다.
+# 수집은 백그라운드 크롤러가 (구, 동, 키워드) 단위로 조금씩 하며, 워커가 여러 개여도 파일 락을 잡은 프로세스 하나만 수집합니다.
+#   - 분당 요청 수(COMPETITOR_CRAWL_PER_MINUTE, 0 이면 수집 안 함)와 하루 요청 수(COMPETITOR_CRAWL_DAILY_QUOTA)를 넘지 않음
+#   - 요청 경로에서 인덱스에 없는 (구, 동, 업종)을 만나면 수집 요청을 남기고, 크롤러는 요청된 작업부터 처리
+#     (업종은 COMPETITOR_CRAWL_KEYWORDS 또는 이미 수집된 카테고리 이름만, 임의 문자열로 요청 수를 쓰지 않도록)
+#   - 수집한 지 COMPETITOR_REFRESH_SEC 가 지난 작업은 다시 수집, 그보다 두 배 넘게 다시 보이지 않은 점포는 폐업으로 보고 삭제
+
+COMPETITOR_DB_PATH = os.environ.get("COMPETITOR_DB_PATH", "competitors.sqlite")
+COMPETITOR_CELL_M = float(os.environ.get("COMPETITOR_CELL_M", "200"))
+COMPETITOR_RELOAD_SEC = float(os.environ.get("COMPETITOR_RELOAD_SEC", "60"))
+COMPETITOR_CRAWL_KEYWORDS = [
+    k.strip() for k in os.environ.get(
+        "COMPETITOR_CRAWL_KEYWORDS", "카페,음식점,편의점,미용실,치킨,베이커리,주점,학원"
+    ).split(",") if k.strip()
+]
+COMPETITOR_CRAWL_RADIUS_M = float(os.environ.get("COMPETITOR_CRAWL_RADIUS_M", "1000"))
+COMPETITOR_CRAWL_PER_MINUTE = float(os.environ.get("COMPETITOR_CRAWL_PER_MINUTE", "30"))
+# 카카오 로컬 API 일일 한도 중 실시간 요청 몫을 남겨두고 크롤러가 쓸 몫
+COMPETITOR_CRAWL_DAILY_QUOTA = int(os.environ.get("COMPETITOR_CRAWL_DAILY_QUOTA", "10000"))
+# 반경 1km 사각형 기준 5단계면 약 60m 사각형까지 나눔 (그래도 45건이 넘으면 잘린 수집으로 기록)
+COMPETITOR_CRAWL_MAX_DEPTH = int(os.environ.get("COMPETITOR_CRAWL_MAX_DEPTH", "5"))
+COMPETITOR_REFRESH_SEC = float(os.environ.get("COMPETITOR_REFRESH_SEC", str(7 * 86400)))
+COMPETITOR_REQUESTED_MAX_ENTRIES = int(os.environ.get("COMPETITOR_REQUESTED_MAX_ENTRIES", "10000"))
+# 실패한 작업은 COMPETITOR_CRAWL_RETRY_SEC, 그 두 배, 네 배 ... 뒤에 다시 시도하고,
+# COMPETITOR_CRAWL_MAX_ATTEMPTS 번 실패하면 수집 요청을 지우고 다음 갱신 주기까지 건너뜀
+COMPETITOR_CRAWL_RETRY_SEC = float(os.environ.get("COMPETITOR_CRAWL_RETRY_SEC", "600"))
+COMPETITOR_CRAWL_MAX_ATTEMPTS = int(os.environ.get("COMPETITOR_CRAWL_MAX_ATTEMPTS", "3"))
+
+KAKAO_KEYWORD_API = "https://dapi.kakao.com/v2/local/search/keyword.json"
+KAKAO_ADDRESS_API = "https://dapi.kakao.com/v2/local/search/address.json"
+KAKAO_PAGE_SIZE = 15
+KAKAO_MAX_PAGES = 3  # 검색 결과는 최대 45건까지만 페이지로 받을 수 있음
+
+M_PER_DEG_LAT = 111320.0
+SEOUL_LAT = 37.55
+
+def rect_around(lat, lng, radius_m):
+    # 반경 radius_m 원을 감싸는 (left, bottom, right, top) 사각형
+    d_lat = radius_m / M_PER_DEG_LAT
+    d_lng = radius_m / (M_PER_DEG_LAT * math.cos(math.radians(lat)))
+    return lng - d_lng, lat - d_lat, lng + d_lng, lat + d_lat
+
+def search_rect(fetch_json, keyword, rect, max_depth, found, depth=0):
+    # 카카오 키워드 검색으로 사각형 안 장소를 found[id] 에 모음
+    # 한 질의로 받을 수 있는 결과(45건)보다 많으면 사각형을 4등분해서 다시 검색
+    # max_depth 까지 나눠도 45건을 넘는 사각형이 있으면 True (일부 점포가 빠짐)
+    left, bottom, right, top = rect
+    truncated = False
+    for page in range(1, KAKAO_MAX_PAGES + 1):
+        params = {"query": keyword, "rect": f"{left},{bottom},{right},{top}", "page": page, "size": KAKAO_PAGE_SIZE}
+        data = fetch_json(KAKAO_KEYWORD_API, params)
+        meta = data.get("meta") or {}
+        if page == 1 and meta.get("total_count", 0) > KAKAO_PAGE_SIZE * KAKAO_MAX_PAGES:
+            if depth < max_depth:
+                mid_x, mid_y = (left + right) / 2, (bottom + top) / 2
+                for sub in ((left, bottom, mid_x, mid_y), (mid_x, bottom, right, mid_y),
+                            (left, mid_y, mid_x, top), (mid_x, mid_y, right, top)):
+                    truncated = search_rect(fetch_json, keyword, sub, max_depth, found, depth + 1) or truncated
+                return truncated
+            truncated = True
+        for doc in data.get("documents") or []:
+            found[doc["id"]] = doc
+        if meta.get("is_end", True):
+            break
+    return truncated
+
+def place_tags(category_group, category_name, keywords=()):
+    # '음식점 > 카페 > 커피전문점' → {'음식점', '카페', '커피전문점'} + 카테고리 코드(CE7) + 수집 키워드
+    tags = {part.strip() for part in (category_name or "").split(">") if part.strip()}
+    tags.update(k for k in keywords if k)
+    if category_group:
+        tags.add(category_group)
+    return frozenset(tags)
+
+# 1. 격자 색인
+class CompetitorIndex:
+    def __init__(self, places, centroids=None, crawled=None, version=None, cell_m=COMPETITOR_CELL_M, truncated=None):
+        # places: [(name, lat, lng, tags)], centroids: {(gu, dong): (lat, lng)}, crawled: {(gu, dong, keyword): crawled_at}
+        # truncated: 검색 한도(45건)에 걸려 일부 점포가 빠진 (gu, dong, keyword)
+        self.names = [p[0] for p in places]
+        self.lats = [p[1] for p in places]
+        self.lngs = [p[2] for p in places]
+        self.tags = [p[3] for p in places]
+        self.centroids = centroids or {}
+        self.crawled = crawled or {}
+        self.truncated = truncated or set()
+        self.version = version
+        self._categories = None
+        self._lat_step = cell_m / M_PER_DEG_LAT
+        self._lng_step = cell_m / (M_PER_DEG_LAT * math.cos(math.radians(SEOUL_LAT)))
+        self._grids = {None: self._build_grid(range(len(self.lats)))}
+        self._grids_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell(self, lat, lng):
+        return math.floor(lat / self._lat_step), math.floor(lng / self._lng_step)
+
+    def _build_grid(self, indices):
+        cells = {}
+        for k in indices:
+            cells.setdefault(self._cell(self.lats[k], self.lngs[k]), []).append(k)
+        return cells
+
+    def _grid(self, category):
+        # 카테고리별 격자는 처음 질의될 때 한 번 만들어 둠 (칸 안에서 카테고리를 다시 거르지 않도록)
+        grid = self._grids.get(category)
+        if grid is None:
+            with self._grids_lock:
+                grid = self._grids.get(category)
+                if grid is None:
+                    grid = self._build_grid(k for k, tags in enumerate(self.tags) if category in tags)
+                    self._grids[category] = grid
+        return grid
+
+    def _cells_in_radius(self, grid, lat, lng, radius_m):
+        # 반경을 덮는 격자 칸마다 (칸 전체가 원 안인지, 점 목록) 을 돌려줌 (등장방형 근사 거리)
+        m_per_deg_lng = M_PER_DEG_LAT * math.cos(math.radians(lat))
+        d_lat, d_lng = radius_m / M_PER_DEG_LAT, radius_m / m_per_deg_lng
+        i0, j0 = self._cell(lat - d_lat, lng - d_lng)
+        i1, j1 = self._cell(lat + d_lat, lng + d_lng)
+        r2 = radius_m * radius_m
+        for i in range(i0, i1 + 1):
+            lat_lo, lat_hi = i * self._lat_step, (i + 1) * self._lat_step
+            far_y = max(abs(lat_lo - lat), abs(lat_hi - lat)) * M_PER_DEG_LAT
+            near_y = max(lat_lo - lat, 0, lat - lat_hi) * M_PER_DEG_LAT
+            for j in range(j0, j1 + 1):
+                members = grid.get((i, j))
+                if not members:
+                    continue
+                lng_lo, lng_hi = j * self._lng_step, (j + 1) * self._lng_step
+                far_x = max(abs(lng_lo - lng), abs(lng_hi - lng)) * m_per_deg_lng
+                near_x = max(lng_lo - lng, 0, lng - lng_hi) * m_per_deg_lng
+                if near_x * near_x + near_y * near_y > r2:
+                    continue
+                yield far_x * far_x + far_y * far_y <= r2, members
+
+    def within(self, lat, lng, radius_m, category=None):
+        m_per_deg_lng = M_PER_DEG_LAT * math.cos(math.radians(lat))
+        r2 = radius_m * radius_m
+        lats, lngs = self.lats, self.lngs
+        for inside, members in self._cells_in_radius(self._grid(category), lat, lng, radius_m):
+            if inside:
+                yield from members
+                continue
+            for k in members:
+                dy = (lats[k] - lat) * M_PER_DEG_LAT
+                dx = (lngs[k] - lng) * m_per_deg_lng
+                if dx * dx + dy * dy <= r2:
+                    yield k
+
+    def count(self, lat, lng, radius_m, category=None):
+        # 원 안에 완전히 들어가는 칸은 점 개수만 더함
+        m_per_deg_lng = M_PER_DEG_LAT * math.cos(math.radians(lat))
+        r2 = radius_m * radius_m
+        lats, lngs = self.lats, self.lngs
+        total = 0
+        for inside, members in self._cells_in_radius(self._grid(category), lat, lng, radius_m):
+            if inside:
+                total += len(members)
+                continue
+            for k in members:
+                dy = (lats[k] - lat) * M_PER_DEG_LAT
+                dx = (lngs[k] - lng) * m_per_deg_lng
+                if dx * dx + dy * dy <= r2:
+                    total += 1
+        return total
+
+    def category_counts(self, lat, lng, radius_m, n=10):
+        counts = {}
+        for k in self.within(lat, lng, radius_m):
+            for tag in self.tags[k]:
+                counts[tag] = counts.get(tag, 0) + 1
+        return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+    def centroid(self, gu, dong):
+        return self.centroids.get((gu.strip(), dong.strip()))
+
+    def crawled_at(self, gu, dong, keyword):
+        return self.crawled.get((gu.strip(), dong.strip(), keyword.strip()))
+
+    def is_truncated(self, gu, dong, keyword):
+        return (gu.strip(), dong.strip(), keyword.strip()) in self.truncated
+
+    @property
+    def categories(self):
+        # 색인된 점포의 카테고리 / 수집 키워드 전체 (처음 쓸 때 한 번 계산)
+        if self._categories is None:
+            self._categories = frozenset().union(*self.tags)
+        return self._categories
+
+# 2. sqlite 저장소 (여러 프로세스가 같은 파일을 읽고, 크롤러 하나만 씀)
+class CompetitorStore:
+    def __init__(self, path=COMPETITOR_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS places (
+                id TEXT PRIMARY KEY, name TEXT, lat REAL, lng REAL,
+                category_group TEXT, category_name TEXT, seen_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS place_keywords (
+                place_id TEXT, keyword TEXT, PRIMARY KEY (place_id, keyword)
+            );
+            CREATE TABLE IF NOT EXISTS dongs (gu TEXT, dong TEXT, lat REAL, lng REAL, PRIMARY KEY (gu, dong));
+            CREATE TABLE IF NOT EXISTS crawls (
+                gu TEXT, dong TEXT, keyword TEXT, crawled_at REAL, places INTEGER, truncated INTEGER DEFAULT 0,
+                PRIMARY KEY (gu, dong, keyword)
+            );
+            CREATE TABLE IF NOT EXISTS crawl_requests (
+                gu TEXT, dong TEXT, keyword TEXT, requested_at REAL, PRIMARY KEY (gu, dong, keyword)
+            );
+            CREATE TABLE IF NOT EXISTS crawl_failures (
+                gu TEXT, dong TEXT, keyword TEXT, attempts INTEGER, retry_at REAL, PRIMARY KEY (gu, dong, keyword)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        # truncated 열이 없던 이전 파일
+        if "truncated" not in {row[1] for row in conn.execute("PRAGMA table_info(crawls)")}:
+            conn.execute("ALTER TABLE crawls ADD COLUMN truncated INTEGER DEFAULT 0")
+
+    def _conn(self):
+        # 스레드/프로세스마다 별도 커넥션
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _meta(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def version(self):
+        return int(self._meta("version", 0))
+
+    def used_today(self):
+        return int(self._meta(f"quota:{date.today().isoformat()}", 0))
+
+    def add_usage(self, n=1):
+        key = f"quota:{date.today().isoformat()}"
+        self._conn().execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value",
+            (key, n)
+        )
+
+    def centroid(self, gu, dong):
+        row = self._conn().execute("SELECT lat, lng FROM dongs WHERE gu = ? AND dong = ?", (gu, dong)).fetchone()
+        return tuple(row) if row else None
+
+    def set_centroid(self, gu, dong, lat, lng):
+        self._conn().execute("INSERT OR REPLACE INTO dongs (gu, dong, lat, lng) VALUES (?, ?, ?, ?)", (gu, dong, lat, lng))
+
+    def save_crawl(self, gu, dong, keyword, places, truncated=False):
+        # places: 카카오 장소 검색 documents, 한 트랜잭션으로 저장하고 version 을 올려 다른 프로세스가 다시 읽게 함
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for doc in places:
+                conn.execute(
+                    "INSERT OR REPLACE INTO places (id, name, lat, lng, category_group, category_name, seen_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc["id"], doc.get("place_name"), float(doc["y"]), float(doc["x"]),
+                     doc.get("category_group_code"), doc.get("category_name"), now)
+                )
+                conn.execute("INSERT OR IGNORE INTO place_keywords (place_id, keyword) VALUES (?, ?)", (doc["id"], keyword))
+            conn.execute(
+                "INSERT OR REPLACE INTO crawls (gu, dong, keyword, crawled_at, places, truncated) VALUES (?, ?, ?, ?, ?, ?)",
+                (gu, dong, keyword, now, len(places), int(truncated))
+            )
+            conn.execute("DELETE FROM crawl_requests WHERE gu = ? AND dong = ? AND keyword = ?", (gu, dong, keyword))
+            conn.execute("DELETE FROM crawl_failures WHERE gu = ? AND dong = ? AND keyword = ?", (gu, dong, keyword))
+            # 두 번의 갱신 주기 동안 다시 보이지 않은 점포는 폐업으로 보고 정리
+            stale = now - 2 * COMPETITOR_REFRESH_SEC
+            conn.execute("DELETE FROM place_keywords WHERE place_id IN (SELECT id FROM places WHERE seen_at < ?)", (stale,))
+            conn.execute("DELETE FROM places WHERE seen_at < ?", (stale,))
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('version', 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def request_crawl(self, gu, dong, keyword):
+        self._conn().execute(
+            "INSERT OR IGNORE INTO crawl_requests (gu, dong, keyword, requested_at) VALUES (?, ?, ?, ?)",
+            (gu, dong, keyword, time.time())
+        )
+
+    def pending_requests(self):
+        # 재시도 대기 중인 요청은 빼고 먼저 들어온 순서
+        return self._conn().execute(
+            "SELECT r.gu, r.dong, r.keyword FROM crawl_requests r "
+            "LEFT JOIN crawl_failures f ON f.gu = r.gu AND f.dong = r.dong AND f.keyword = r.keyword "
+            "WHERE f.retry_at IS NULL OR f.retry_at <= ? ORDER BY r.requested_at",
+            (time.time(),)
+        ).fetchall()
+
+    def record_failure(self, gu, dong, keyword, retry_sec=COMPETITOR_CRAWL_RETRY_SEC,
+                       max_attempts=COMPETITOR_CRAWL_MAX_ATTEMPTS, refresh_sec=COMPETITOR_REFRESH_SEC):
+        # 실패 횟수를 올리고 다음 시도 시각을 미룸, max_attempts 번째 실패면 요청을 지우고 True
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT attempts FROM crawl_failures WHERE gu = ? AND dong = ? AND keyword = ?", (gu, dong, keyword)
+            ).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            dropped = attempts >= max_attempts
+            retry_at = now + (refresh_sec if dropped else retry_sec * 2 ** (attempts - 1))
+            conn.execute(
+                "INSERT OR REPLACE INTO crawl_failures (gu, dong, keyword, attempts, retry_at) VALUES (?, ?, ?, ?, ?)",
+                (gu, dong, keyword, attempts, retry_at)
+            )
+            if dropped:
+                conn.execute("DELETE FROM crawl_requests WHERE gu = ? AND dong = ? AND keyword = ?", (gu, dong, keyword))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dropped
+
+    def backing_off(self):
+        # 다시 시도할 시각이 아직 안 된 작업
+        return set(self._conn().execute(
+            "SELECT gu, dong, keyword FROM crawl_failures WHERE retry_at > ?", (time.time(),)
+        ))
+
+    def crawl_times(self):
+        return {(gu, dong, kw): at for gu, dong, kw, at in self._conn().execute(
+            "SELECT gu, dong, keyword, crawled_at FROM crawls"
+        )}
+
+    def truncated_crawls(self):
+        return set(self._conn().execute("SELECT gu, dong, keyword FROM crawls WHERE truncated"))
+
+    def load_index(self):
+        conn = self._conn()
+        version = self.version()
+        keywords = {}
+        for place_id, keyword in conn.execute("SELECT place_id, keyword FROM place_keywords"):
+            keywords.setdefault(place_id, []).append(keyword)
+        places = [
+            (name, lat, lng, place_tags(group, category, keywords.get(place_id, ())))
+            for place_id, name, lat, lng, group, category in conn.execute(
+                "SELECT id, name, lat, lng, category_group, category_name FROM places"
+            )
+        ]
+        centroids = {(gu, dong): (lat, lng) for gu, dong, lat, lng in conn.execute("SELECT gu, dong, lat, lng FROM dongs")}
+        return CompetitorIndex(places, centroids, self.crawl_times(), version, truncated=self.truncated_crawls())
+
+    def stats(self):
+        conn = self._conn()
+        return {
+            "places": conn.execute("SELECT COUNT(*) FROM places").fetchone()[0],
+            "crawled": conn.execute("SELECT COUNT(*) FROM crawls").fetchone()[0],
+            "truncated": conn.execute("SELECT COUNT(*) FROM crawls WHERE truncated").fetchone()[0],
+            "pending_requests": conn.execute("SELECT COUNT(*) FROM crawl_requests").fetchone()[0],
+            "failed": conn.execute("SELECT COUNT(*) FROM crawl_failures").fetchone()[0],
+            "version": self.version(),
+            "quota_used_today": self.used_today(),
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_competitor_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CompetitorStore()
+    return _store
+
+# 3. 프로세스별 인덱스 (COMPETITOR_RELOAD_SEC 마다 저장소 version 을 확인해 바뀌었으면 백그라운드에서 다시 색인)
+_index = None
+_index_checked_at = 0.0
+_index_reloading = False
+_index_lock = threading.Lock()
+_requested = OrderedDict()
+_requested_lock = threading.Lock()
+_known_dongs = None
+
+def _reload_index():
+    global _index, _index_reloading
+    try:
+        _index = get_competitor_store().load_index()
+        logger.info("competitor index loaded: %d places (version %s)", len(_index), _index.version)
+    except Exception as e:
+        logger.warning("competitor index reload failed: %s", e)
+    finally:
+        _index_reloading = False
+
+def get_competitor_index():
+    global _index, _index_checked_at, _index_reloading
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = get_competitor_store().load_index()
+                _index_checked_at = time.monotonic()
+        return _index
+    now = time.monotonic()
+    if now - _index_checked_at >= COMPETITOR_RELOAD_SEC and not _index_reloading:
+        with _index_lock:
+            if now - _index_checked_at >= COMPETITOR_RELOAD_SEC and not _index_reloading:
+                _index_checked_at = now
+                if get_competitor_store().version() != _index.version:
+                    _index_reloading = True
+                    threading.Thread(target=_reload_index, name="competitor-index", daemon=True).start()
+    return _index
+
+def is_crawlable(keyword):
+    keyword = keyword.strip()
+    return keyword in COMPETITOR_CRAWL_KEYWORDS or keyword in get_competitor_index().categories
+
+def set_known_dongs(dongs):
+    # 주소 마스터의 (구, 동) 목록, 이후 목록에 없는 동은 수집 요청을 받지 않음
+    global _known_dongs
+    _known_dongs = frozenset((gu.strip(), dong.strip()) for gu, dong in dongs)
+
+def request_crawl(gu, dong, keyword):
+    # 아는 동 + 수집 가능한 업종이면 기록하고 True (같은 프로세스에서는 최근 COMPETITOR_REQUESTED_MAX_ENTRIES 개 안에서 한 번만)
+    key = (gu.strip(), dong.strip(), keyword.strip())
+    with _requested_lock:
+        if key in _requested:
+            return True
+    if _known_dongs is not None and key[:2] not in _known_dongs:
+        return False
+    if not is_crawlable(key[2]):
+        return False
+    with _requested_lock:
+        if key in _requested:
+            return True
+        _requested[key] = True
+        while len(_requested) > COMPETITOR_REQUESTED_MAX_ENTRIES:
+            _requested.popitem(last=False)
+    get_competitor_store().request_crawl(*key)
+    return True
+
+# 4. 백그라운드 크롤러
+class CompetitorCrawler:
+    def __init__(self, fetch_json, dongs, store=None, keywords=None, per_minute=COMPETITOR_CRAWL_PER_MINUTE,
+                 daily_quota=COMPETITOR_CRAWL_DAILY_QUOTA, radius_m=COMPETITOR_CRAWL_RADIUS_M,
+                 max_depth=COMPETITOR_CRAWL_MAX_DEPTH, refresh_sec=COMPETITOR_REFRESH_SEC):
+        # fetch_json(url, params) -> 카카오 응답 dict (서킷 브레이커 / 동시 호출 제한은 호출하는 쪽에서)
+        self.fetch_json = fetch_json
+        self.dongs = dongs
+        self.store = store or get_competitor_store()
+        self.keywords = keywords if keywords is not None else COMPETITOR_CRAWL_KEYWORDS
+        self.interval = 60.0 / per_minute if per_minute > 0 else None
+        self.daily_quota = daily_quota
+        self.radius_m = radius_m
+        self.max_depth = max_depth
+        self.refresh_sec = refresh_sec
+        self._last_request = 0.0
+        self.requests = 0
+
+    def _fetch(self, url, params):
+        # 분당 / 하루 요청 수를 넘지 않도록 요청 사이 간격을 두고, 하루 몫을 다 쓰면 다음 날까지 대기
+        while self.store.used_today() >= self.daily_quota:
+            time.sleep(600)
+        if self.interval:
+            wait = self._last_request + self.interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self._last_request = time.monotonic()
+        self.store.add_usage()
+        self.requests += 1
+        return self.fetch_json(url, params)
+
+    def centroid(self, gu, dong):
+        location = self.store.centroid(gu, dong)
+        if location:
+            return location
+        data = self._fetch(KAKAO_ADDRESS_API, {"query": f"서울특별시 {gu} {dong}"})
+        docs = data.get("documents") or []
+        if not docs:
+            data = self._fetch(KAKAO_KEYWORD_API, {"query": f"{gu} {dong}", "size": 1})
+            docs = data.get("documents") or []
+        if not docs:
+            return None
+        location = (float(docs[0]["y"]), float(docs[0]["x"]))
+        self.store.set_centroid(gu, dong, *location)
+        return location
+
+    def crawl(self, gu, dong, keyword):
+        location = self.centroid(gu, dong)
+        if location is None:
+            raise LookupError(f"no centroid for {gu} {dong}")
+        found = {}
+        truncated = search_rect(self._fetch, keyword, rect_around(*location, self.radius_m), self.max_depth, found)
+        if truncated:
+            logger.warning("competitor crawl %s %s %s: search limit reached, some places missing", gu, dong, keyword)
+        self.store.save_crawl(gu, dong, keyword, list(found.values()), truncated=truncated)
+        return len(found)
+
+    def next_task(self):
+        # 재시도 대기 중인 작업은 건너뜀
+        pending = self.store.pending_requests()
+        if pending:
+            return tuple(pending[0])
+        # 한 번도 수집하지 않은 작업 → 가장 오래된 작업 순
+        crawled = self.store.crawl_times()
+        backing_off = self.store.backing_off()
+        due = time.time() - self.refresh_sec
+        oldest = None
+        for gu, dong in self.dongs:
+            for keyword in self.keywords:
+                if (gu, dong, keyword) in backing_off:
+                    continue
+                at = crawled.get((gu, dong, keyword))
+                if at is None:
+                    return gu, dong, keyword
+                if at < due and (oldest is None or at < oldest[0]):
+                    oldest = (at, (gu, dong, keyword))
+        return oldest[1] if oldest else None
+
+    def run_once(self):
+        task = self.next_task()
+        if task is None:
+            return None
+        try:
+            count = self.crawl(*task)
+        except Exception:
+            # 실패는 작업에 기록해 다음 차례에는 다른 작업을 먼저 수집 (같은 작업만 계속 다시 시도하지 않도록)
+            if self.store.record_failure(*task, refresh_sec=self.refresh_sec):
+                logger.warning("competitor crawl %s: giving up after %d attempts", " ".join(task), COMPETITOR_CRAWL_MAX_ATTEMPTS)
+            raise
+        logger.info("competitor crawl %s: %d places", " ".join(task), count)
+        return task
+
+    def run_forever(self, idle_sec=60):
+        while True:
+            try:
+                if self.run_once() is None:
+                    time.sleep(idle_sec)
+            except Exception as e:
+                # 업스트림 장애 / 서킷 open 은 잠시 쉬었다가 다음 작업부터
+                logger.warning("competitor crawl failed: %s", e)
+                time.sleep(idle_sec)
+
+_crawler_pid = None
+
+def start_crawler(fetch_json, dongs):
+    # 워커마다 호출해도 락 파일을 잡은 프로세스 하나만 수집 (그 프로세스가 죽으면 다른 워커가 이어받음)
+    global _crawler_pid
+    set_known_dongs(dongs)
+    if COMPETITOR_CRAWL_PER_MINUTE <= 0 or _crawler_pid == os.getpid():
+        return
+    _crawler_pid = os.getpid()
+
+    def run():
+        import fcntl
+        with open(COMPETITOR_DB_PATH + ".lock", "a") as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError:
+                    time.sleep(60)
+            logger.info("competitor crawler started (pid %s)", os.getpid())
+            CompetitorCrawler(fetch_json, dongs).run_forever()
+
+    threading.Thread(target=run, name="competitor-crawler", daemon=True).start()
@@ -0,0 +1,155 @@
+import re
+import math
+import hashlib
+
+# ✅ 동 × 월 부동산 거래가 누적 집계
+# 구 × 월 실거래가 응답(그 달 전체 거래)이 들어올 때마다 동(umdNm)별 월 집계(건수, 합계, 최소 / 최대, 중앙값용 스케치)를 만듭니다.
+# 달마다 응답 요약값(digest)만 남겨, 같은 달을 다시 받아도(캐시 만료 후 재조회) 내용이 같으면 그대로 두고
+# 늦게 신고된 거래 등으로 달라졌으면 그 달 집계를 새 응답으로 바꿉니다. 원본 거래나 거래별 기록은 남기지 않으므로,
+# 시세 추이 질의는 집계만 읽어 바로 답할 수 있습니다.
+
+SKETCH_RELATIVE_ACCURACY = 0.01
+GU_TOTAL = ""  # 구 전체 집계의 동 이름
+
+_DONG_NUMBER_RE = re.compile(r"\d+(·\d+)*(가)?동$")
+
+class PriceSketch:
+    # 로그 간격 버킷 히스토그램: 분위수를 상대 오차 accuracy 안에서 계산하고, 다른 스케치와 그대로 합칠 수 있음
+    __slots__ = ("gamma", "buckets", "count")
+
+    def __init__(self, accuracy=SKETCH_RELATIVE_ACCURACY):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.buckets = {}
+        self.count = 0
+
+    def add(self, value, n=1):
+        if value <= 0:
+            return
+        key = math.ceil(math.log(value, self.gamma))
+        self.buckets[key] = self.buckets.get(key, 0) + n
+        self.count += n
+
+    def merge(self, other):
+        for key, n in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + n
+        self.count += other.count
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return None
+
+class MonthlyPrice:
+    __slots__ = ("count", "total", "min", "max", "sketch")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.sketch = PriceSketch()
+
+    def add(self, price):
+        self.count += 1
+        self.total += price
+        self.min = price if self.min is None else min(self.min, price)
+        self.max = price if self.max is None else max(self.max, price)
+        self.sketch.add(price)
+
+    def merge(self, other):
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def to_dict(self):
+        median = self.sketch.quantile(0.5)
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count) if self.count else None,
+            "median": round(median) if median is not None else None,
+            "min": self.min,
+            "max": self.max,
+        }
+
+def _digest(fingerprints):
+    # 거래 순서와 무관한 응답 요약값 (프로세스가 달라도 같은 값)
+    return hashlib.blake2b("\n".join(sorted(fingerprints)).encode(), digest_size=16).digest()
+
+class GuTrend:
+    # 구 하나의 {yyyymm: {동: MonthlyPrice}} (구 전체는 GU_TOTAL 로 함께 유지)
+    def __init__(self, gu):
+        self.gu = gu
+        self.months = {}
+        self._digests = {}  # yyyymm -> 마지막으로 반영한 응답의 digest
+
+    def __setstate__(self, state):
+        # 이전 형식(거래 fingerprint 를 달마다 모두 보관하던 _seen)으로 저장된 집계: 받은 달만 기억하고 다음 응답으로 다시 만듦
+        seen = state.pop("_seen", None)
+        if seen is not None:
+            state["_digests"] = dict.fromkeys(seen, b"")
+        self.__dict__.update(state)
+
+    def ingest(self, yyyymm, umd_deals):
+        # umd_deals 는 그 달 전체 거래, 집계가 바뀌었으면 True (이 달의 응답을 받았다는 사실은 거래가 없어도 기록)
+        by_dong = {}
+        fingerprints = []
+        for umd, deal in umd_deals:
+            if deal.price is None:
+                continue
+            fingerprints.append(f"{umd}|{deal.price}|{deal.date_ordinal}|{deal.building_type}")
+            for dong in (umd.strip(), GU_TOTAL):
+                by_dong.setdefault(dong, MonthlyPrice()).add(deal.price)
+        digest = _digest(fingerprints)
+        if self._digests.get(yyyymm) == digest:
+            return False
+        self._digests[yyyymm] = digest
+        self.months[yyyymm] = by_dong
+        return True
+
+    def prune(self, oldest):
+        # oldest(yyyymm) 보다 오래된 달의 집계를 버리고 버린 달 수를 반환
+        old = [yyyymm for yyyymm in self._digests.keys() | self.months.keys() if yyyymm < oldest]
+        for yyyymm in old:
+            self._digests.pop(yyyymm, None)
+            self.months.pop(yyyymm, None)
+        return len(old)
+
+    def has_month(self, yyyymm):
+        return yyyymm in self._digests
+
+    def dongs(self):
+        return sorted({dong for by_dong in self.months.values() for dong in by_dong if dong != GU_TOTAL})
+
+    def month(self, yyyymm, dong=None):
+        by_dong = self.months.get(yyyymm, {})
+        if not dong:
+            return by_dong.get(GU_TOTAL) or MonthlyPrice()
+        # 행정동('역삼1동')으로 물어도 법정동('역삼동') 집계를 찾도록 기존 동 필터(dong in umdNm)와 같은 규칙 + 번호 제거
+        names = {dong.strip(), _DONG_NUMBER_RE.sub("동", dong.strip())}
+        matched = [agg for umd, agg in by_dong.items() if umd != GU_TOTAL and any(name in umd for name in names)]
+        if len(matched) == 1:
+            return matched[0]
+        merged = MonthlyPrice()
+        for agg in matched:
+            merged.merge(agg)
+        return merged
+
+    def series(self, months, dong=None):
+        # months 순서대로 [{"month", count, mean, median, min, max}], 아직 받지 않은 달은 제외
+        return [
+            {"month": yyyymm, **self.month(yyyymm, dong).to_dict()}
+            for yyyymm in months if self.has_month(yyyymm)
+        ]
+
+    def missing(self, months):
+        return [yyyymm for yyyymm in months if not self.has_month(yyyymm)]
@@ -0,0 +1,164 @@
+import xml.etree.ElementTree as ET
+from datetime import date, datetime
+
+# ✅ 부동산 거래 레코드
+# dealAmount 문자열("110,000")을 수집 시점에 한 번만 정수(만원)로 바꾸고, 날짜도 ordinal 로 미리 계산해 둡니다.
+# API 응답용으로는 to_dict() 로 기존 JSON 형태({"dealAmount": "110,000", "dealYear": 2024, ...})를 그대로 만듭니다.
+
+def parse_price(text):
+    if text is None:
+        return None
+    text = text.strip().replace(",", "")
+    return int(text) if text.isdigit() else None
+
+def format_price(price):
+    return f"{price:,}" if price is not None else "N/A"
+
+def to_date_ordinal(year, month, day):
+    try:
+        return date(year, month, day).toordinal()
+    except ValueError:
+        return 0
+
+class Deal:
+    __slots__ = ("price", "year", "month", "day", "date_ordinal", "building_type")
+
+    def __init__(self, price, year, month, day, building_type="N/A"):
+        self.price = price
+        self.year = year
+        self.month = month
+        self.day = day
+        self.date_ordinal = to_date_ordinal(year, month, day)
+        self.building_type = building_type
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            parse_price(data.get("dealAmount")),
+            int(data.get("dealYear", 0)),
+            int(data.get("dealMonth", 0)),
+            int(data.get("dealDay", 0)),
+            data.get("buildingType", "N/A")
+        )
+
+    @property
+    def deal_date(self):
+        return date.fromordinal(self.date_ordinal) if self.date_ordinal else None
+
+    @property
+    def amount_text(self):
+        return format_price(self.price)
+
+    def to_dict(self):
+        return {
+            "dealAmount": self.amount_text,
+            "dealYear": self.year,
+            "dealMonth": self.month,
+            "dealDay": self.day,
+            "buildingType": self.building_type
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, Deal):
+            return NotImplemented
+        return (self.price, self.date_ordinal, self.building_type) == (other.price, other.date_ordinal, other.building_type)
+
+    def __repr__(self):
+        return f"Deal({self.amount_text}, {self.year}-{self.month}-{self.day}, {self.building_type})"
+
+# dict(클라이언트가 보낸 estate 등)와 Deal 을 모두 받기 위한 변환
+def as_deal(obj):
+    return obj if isinstance(obj, Deal) else Deal.from_dict(obj)
+
+def deals_to_dicts(deals):
+    return [as_deal(d).to_dict() for d in deals] if deals else []
+
+def sort_recent(deals, limit=30):
+    return sorted(deals, key=lambda d: d.date_ordinal, reverse=True)[:limit]
+
+def mean_price(deals):
+    prices = [d.price for d in map(as_deal, deals) if d.price is not None]
+    return sum(prices) / len(prices) if prices else None
+
+# 최근 n개월 yyyymm 목록 (pandas.DateOffset 대신 단순 월 계산)
+def recent_months(n, now=None):
+    now = now or datetime.now()
+    year, month = now.year, now.month
+    months = []
+    for _ in range(n):
+        months.append(f"{year:04d}{month:02d}")
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return months
+
+# ✅ data.go.kr 부동산 실거래가 XML 스트리밍 파서
+# 응답 전체를 메모리에 올리지 않고 <item> 이 끝날 때마다 바로 처리한 뒤 버립니다.
+# umdNm 필터도 그 자리에서 적용하므로 응답 크기와 상관없이 메모리 사용량이 일정합니다.
+# 오류 응답(resultCode 가 정상이 아니거나 인증키 오류 등 cmmMsgHeader)은 거래 0건이 아니라 RealEstateAPIError 로 처리합니다.
+
+RESULT_OK_CODES = ("00", "000")
+
+class RealEstateAPIError(Exception):
+    pass
+
+def iter_umd_deals(stream, meta=None):
+    # (umdNm, Deal) 을 동 구분 없이 모두 반환 (구 전체 응답을 한 번에 캐시 / 집계할 때)
+    # meta 를 넘기면 다 읽은 뒤 totalCount 를 채움 (페이지 계산용)
+    items_elem = None
+    header_ok = False
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "items":
+                items_elem = elem
+            continue
+        if elem.tag == "header":
+            code = (elem.findtext("resultCode") or "").strip()
+            if code not in RESULT_OK_CODES:
+                raise RealEstateAPIError(f"resultCode {code or '?'}: {(elem.findtext('resultMsg') or '').strip()}")
+            header_ok = True
+            continue
+        if elem.tag == "cmmMsgHeader":
+            reason = elem.findtext("returnAuthMsg") or elem.findtext("errMsg") or ""
+            raise RealEstateAPIError(f"{(elem.findtext('returnReasonCode') or '?').strip()}: {reason.strip()}")
+        if elem.tag == "totalCount" and meta is not None:
+            meta["totalCount"] = int((elem.text or "0").strip() or 0)
+            continue
+        if elem.tag != "item":
+            continue
+        yield elem.findtext("umdNm", default="N/A"), Deal(
+            parse_price(elem.findtext("dealAmount")),
+            int(elem.findtext("dealYear", "0")),
+            int(elem.findtext("dealMonth", "0")),
+            int(elem.findtext("dealDay", "0")),
+            elem.findtext("buildingType", "N/A")
+        )
+        # 처리 끝난 item 과 그 자식들을 트리에서 떼어냄
+        elem.clear()
+        if items_elem is not None:
+            items_elem.clear()
+    if not header_ok:
+        raise RealEstateAPIError("response has no result header")
+
+def iter_deal_items(stream, dong):
+    for umd, deal in iter_umd_deals(stream):
+        if dong in umd:
+            yield deal
+
+def filter_dong(umd_deals, dong):
+    return [deal for umd, deal in umd_deals if dong in umd]
+
+# requests 스트리밍 응답(stream=True)에서 바로 파싱
+def iter_deal_items_from_response(res, dong):
+    res.raw.decode_content = True
+    try:
+        yield from iter_deal_items(res.raw, dong)
+    finally:
+        res.close()
+
+def iter_umd_deals_from_response(res, meta=None):
+    res.raw.decode_content = True
+    try:
+        yield from iter_umd_deals(res.raw, meta)
+    finally:
+        res.close()
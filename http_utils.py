@@ -0,0 +1,111 @@
+import gzip
+import json
+import hashlib
+
+from flask import current_app, request, jsonify
+
+# ✅ 응답 크기 줄이기: 필드 선택(?fields=), gzip/brotli 압축, ETag / If-None-Match
+# brotli 는 패키지가 설치되어 있을 때만 사용합니다.
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+# 1. 필드 선택: "score,similar" 또는 "population.PSNG_NO" 처럼 점으로 하위 필드 지정
+def parse_fields(raw):
+    if not raw:
+        return None
+    return [field.strip() for field in raw.split(",") if field.strip()]
+
+def select_fields(data, fields, always=("meta",)):
+    if not fields:
+        return data
+    selected = {}
+    for field in list(fields) + [key for key in always if key in data]:
+        head, _, rest = field.partition(".")
+        if head not in data:
+            continue
+        value = data[head]
+        if rest and isinstance(value, dict):
+            nested = select_fields(value, [rest], always=())
+            if isinstance(selected.get(head), dict):
+                selected[head].update(nested)
+            else:
+                selected[head] = nested
+        else:
+            selected[head] = value
+    return selected
+
+# 2. ETag: 본문 내용 해시 (캐시 나이 같은 메타데이터는 제외하므로 weak ETag)
+def content_etag(data):
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return 'W/"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+def etag_matches(etag):
+    header = request.headers.get("If-None-Match", "")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # 비교 시 W/ 접두사는 무시 (weak comparison)
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+def json_with_etag(data, etag_source=None, headers=None):
+    etag = content_etag(etag_source if etag_source is not None else data)
+    if etag_matches(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(data)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    for key, value in (headers or {}).items():
+        response.headers[key] = value
+    return response
+
+# 3. 압축 (app.after_request 에 등록)
+def _choose_encoding(accept_encoding):
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+def compress_response(response):
+    response.headers.add("Vary", "Accept-Encoding")
+    if (
+        response.status_code < 200 or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+    ):
+        return response
+    encoding = _choose_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=5)
+    else:
+        compressed = gzip.compress(body, compresslevel=6)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Content-Length"] = str(len(compressed))
+    return response
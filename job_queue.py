@@ -0,0 +1,112 @@
+import os
+import time
+import queue
+import secrets
+import itertools
+import threading
+
+from log_utils import get_logger
+from cache_utils import TwoTierCache
+
+logger = get_logger(__name__)
+
+# ✅ 오래 걸리는 분석용 비동기 작업 큐
+# - submit() 은 작업 ID 를 바로 반환하고, 프로세스 내 워커 스레드(JOB_WORKERS 개)가 우선순위 순으로 실행
+# - 작업 상태 / 중간 결과는 TwoTierCache("jobs") 에 기록하므로 CACHE_URL 공유 저장소를 쓰면 어느 워커 프로세스에서도 조회 가능
+# - 대기 작업이 JOB_QUEUE_MAX 를 넘으면 QueueFull 예외
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "100"))
+JOB_TTL_SEC = float(os.environ.get("JOB_TTL_SEC", "3600"))
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+class QueueFull(Exception):
+    pass
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+class JobQueue:
+    def __init__(self, name="jobs", workers=JOB_WORKERS, max_queued=JOB_QUEUE_MAX, ttl=JOB_TTL_SEC):
+        self.name = name
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.store = TwoTierCache(name, ttl, local_ttl=1)
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def _ensure_workers(self):
+        # fork 이후에는 스레드가 없으므로 프로세스마다 큐 / 워커를 새로 시작
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.PriorityQueue(self.max_queued)
+            for i in range(self.workers):
+                threading.Thread(target=self._worker, name=f"{self.name}-worker-{i}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _save(self, job):
+        self.store.set(job["id"], job, self.ttl)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def submit(self, kind, fn, payload, priority="normal"):
+        self._ensure_workers()
+        job = {
+            "id": secrets.token_urlsafe(12),
+            "kind": kind,
+            "status": "queued",
+            "priority": priority,
+            "payload": payload,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self._save(job)
+        try:
+            self._queue.put_nowait((PRIORITIES.get(priority, 1), next(self._seq), job, fn))
+        except queue.Full:
+            self.store.delete(job["id"])
+            raise QueueFull(f"{self.name} queue is full ({self.max_queued})")
+        return job["id"]
+
+    def _worker(self):
+        while True:
+            _, _, job, fn = self._queue.get()
+            try:
+                self._run(job, fn)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job, fn):
+        job.update(status="running", started_at=_now())
+        self._save(job)
+
+        def report(stage, partial):
+            # 단계별 중간 결과 기록 (GET /jobs/<id> 로 조회 가능), 끝난 작업에 늦게 들어온 보고는 무시
+            if job["status"] in ("done", "failed"):
+                return
+            job.update(progress=stage, result=partial)
+            self._save(job)
+
+        try:
+            result = fn(job["payload"], report)
+            job.update(status="done", progress="done", result=result)
+        except Exception as e:
+            logger.exception("job %s (%s) failed: %s", job["id"], job["kind"], e)
+            job.update(status="failed", error=str(e))
+        job["finished_at"] = _now()
+        self._save(job)
+
+    def stats(self):
+        return {"queued": self._queue.qsize() if self._queue is not None else 0, "workers": self.workers}
@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+from log_utils import get_logger
+from resilience import UPSTREAMS, DeadlineExceeded, UpstreamUnavailable, call_upstream, time_budget
+
+logger = get_logger(__name__)
+
+# ✅ OpenAI 호출 조절기 (프로세스당 하나)
+# 1) 동시 호출 수(LLM_MAX_CONCURRENCY)와 분당 토큰(LLM_TOKENS_PER_MINUTE, 0 이면 제한 없음)을 넘지 않도록 대기열에서 순서대로 실행
+# 2) 대기열은 엔드포인트(route)별 우선순위 순 (숫자가 작을수록 먼저), 같은 우선순위는 먼저 온 순서
+#    사용자 대화형 요청이 백그라운드 작업보다 먼저 나가도록 llm_priority() 로 구간별 우선순위를 덮어쓸 수 있음
+# 3) 동시에 들어온 임베딩 요청은 LLM_EMBED_BATCH_WINDOW_MS 동안 모아 embeddings API 한 번으로 보냄
+# 대기 시간이 LLM_QUEUE_TIMEOUT_SEC(또는 요청 deadline)를 넘으면 UpstreamUnavailable 로 실패 처리 (서킷 브레이커에는 반영 안 함)
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_QUEUE_TIMEOUT_SEC = float(os.environ.get("LLM_QUEUE_TIMEOUT_SEC", "30"))
+# 응답 토큰은 미리 알 수 없으므로 호출당 추정치를 더해 예약
+LLM_COMPLETION_TOKENS_ESTIMATE = int(os.environ.get("LLM_COMPLETION_TOKENS_ESTIMATE", "500"))
+LLM_EMBED_BATCH_WINDOW_MS = float(os.environ.get("LLM_EMBED_BATCH_WINDOW_MS", "5"))
+LLM_EMBED_MAX_BATCH = int(os.environ.get("LLM_EMBED_MAX_BATCH", "64"))
+
+DEFAULT_ROUTE_PRIORITIES = {
+    "embedding": 0,
+    "chat": 0,
+    "ask_rag": 0,
+    "recommend_business": 1,
+    "location_analysis": 1,
+    "analyze_market": 1,
+}
+DEFAULT_PRIORITY = 1
+BACKGROUND_PRIORITY = 5
+
+def _load_route_priorities():
+    priorities = dict(DEFAULT_ROUTE_PRIORITIES)
+    raw = os.environ.get("LLM_ROUTE_PRIORITIES")
+    if raw:
+        try:
+            priorities.update(json.loads(raw))
+        except ValueError as e:
+            logger.error("LLM_ROUTE_PRIORITIES 파싱 실패: %s", e)
+    return priorities
+
+ROUTE_PRIORITIES = _load_route_priorities()
+
+_priority_override = contextvars.ContextVar("llm_priority", default=None)
+
+@contextmanager
+def llm_priority(priority):
+    # 이 구간(및 resilience.submit 으로 넘긴 작업)의 LLM 호출 우선순위 지정
+    token = _priority_override.set(priority)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+def route_priority(route):
+    override = _priority_override.get()
+    if override is not None:
+        return override
+    return ROUTE_PRIORITIES.get(route, DEFAULT_PRIORITY)
+
+def estimate_tokens(text, completion=LLM_COMPLETION_TOKENS_ESTIMATE):
+    from chat_history import count_tokens
+    return count_tokens(text) + completion
+
+# 1. 동시 호출 / 토큰 속도 조절
+class LLMGovernor:
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, tokens_per_minute=LLM_TOKENS_PER_MINUTE):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self._cond = threading.Condition()
+        self._waiters = []  # (priority, seq) 힙
+        self._seq = itertools.count()
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.granted = 0
+        self.timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        rate = self.tokens_per_minute / 60.0
+        self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+    def _can_run(self, tokens):
+        if self.in_flight >= self.max_concurrency:
+            return False
+        if not self.tokens_per_minute:
+            return True
+        self._refill()
+        # 버킷보다 큰 요청은 버킷이 가득 찼을 때 통과
+        return self._tokens >= min(tokens, self.tokens_per_minute)
+
+    @contextmanager
+    def slot(self, route, tokens=0, timeout=None):
+        timeout = LLM_QUEUE_TIMEOUT_SEC if timeout is None else timeout
+        entry = (route_priority(route), next(self._seq))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while not (self._waiters[0] == entry and self._can_run(tokens)):
+                    left = started + timeout - time.monotonic()
+                    if left <= 0:
+                        self.timeouts += 1
+                        raise UpstreamUnavailable(f"openai queue timeout after {timeout:.1f}s (route={route})")
+                    # 맨 앞이면 토큰이 다시 찰 때까지 짧게 폴링, 아니면 앞 요청이 빠질 때까지 대기
+                    self._cond.wait(min(left, 0.05) if self._waiters[0] == entry else left)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+            self.in_flight += 1
+            self._tokens -= tokens
+            waited = time.monotonic() - started
+            self.granted += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            if self.tokens_per_minute:
+                self._refill()
+            return {
+                "max_concurrency": self.max_concurrency,
+                "tokens_per_minute": self.tokens_per_minute,
+                "in_flight": self.in_flight,
+                "queued": len(self._waiters),
+                "tokens_available": int(self._tokens) if self.tokens_per_minute else None,
+                "granted": self.granted,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self._wait_total / self.granted * 1000, 1) if self.granted else None,
+                "wait_max_ms": round(self._wait_max * 1000, 1),
+            }
+
+_governor = None
+_governor_pid = None
+_governor_lock = threading.Lock()
+
+def get_governor():
+    # fork 이후 대기열 / 락 상태를 물려받지 않도록 프로세스마다 새로 생성
+    global _governor, _governor_pid
+    if _governor is None or _governor_pid != os.getpid():
+        with _governor_lock:
+            if _governor is None or _governor_pid != os.getpid():
+                _governor, _governor_pid = LLMGovernor(), os.getpid()
+    return _governor
+
+def governed_call(route, prompt, fn, completion=LLM_COMPLETION_TOKENS_ESTIMATE):
+    # fn(timeout) 을 조절기 슬롯 안에서 call_upstream("openai") 로 실행
+    tokens = estimate_tokens(prompt, completion)
+    try:
+        timeout = time_budget(LLM_QUEUE_TIMEOUT_SEC)
+    except DeadlineExceeded as e:
+        raise UpstreamUnavailable(f"openai: {e}") from e
+    with get_governor().slot(route, tokens, timeout=timeout):
+        return call_upstream("openai", fn)
+
+# 2. 임베딩 micro-batching
+_embed_stats = {"batches": 0, "items": 0}
+_embed_stats_lock = threading.Lock()
+
+class EmbeddingBatcher:
+    def __init__(self, embed_many, window_ms=LLM_EMBED_BATCH_WINDOW_MS, max_batch=LLM_EMBED_MAX_BATCH):
+        self.embed_many = embed_many
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending = []
+        self._pid = None
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                self._pending = []
+                threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+                self._pid = os.getpid()
+
+    def submit(self, text):
+        self._ensure_thread()
+        future = Future()
+        with self._cond:
+            self._pending.append((text, future))
+            self._cond.notify()
+        return future
+
+    def embed(self, text):
+        return self.submit(text).result(timeout=time_budget(LLM_QUEUE_TIMEOUT_SEC + UPSTREAMS["openai"]["timeout"]))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # 첫 요청 이후 window 동안 같이 보낼 요청을 모음
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self._flush(batch)
+
+    def _flush(self, batch):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = dict(zip(texts, self.embed_many(texts)))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with _embed_stats_lock:
+            _embed_stats["batches"] += 1
+            _embed_stats["items"] += len(batch)
+        for text, future in batch:
+            future.set_result(vectors[text])
+
+class BatchedEmbeddings:
+    # langchain Embeddings 인터페이스 (embed_query / embed_documents) 를 그대로 제공
+    def __init__(self, inner):
+        self.inner = inner
+        self.batcher = EmbeddingBatcher(self._embed_many)
+
+    def _embed_many(self, texts):
+        prompt = "\n".join(texts)
+        return governed_call("embedding", prompt, lambda timeout: self.inner.embed_documents(texts), completion=0)
+
+    def embed_query(self, text):
+        return self.batcher.embed(text)
+
+    def embed_documents(self, texts):
+        return self._embed_many(list(texts))
+
+def governor_stats():
+    stats = get_governor().stats()
+    with _embed_stats_lock:
+        batches, items = _embed_stats["batches"], _embed_stats["items"]
+    stats["embedding"] = {
+        "batches": batches,
+        "items": items,
+        "avg_batch_size": round(items / batches, 2) if batches else None,
+    }
+    return stats
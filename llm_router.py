@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# ✅ LLM 모델 라우팅
+# 요청마다 (질문 길이, 처리 경로, 엔드포인트) 로 모델 등급(tier)을 고르고, 등급별 지연 시간 / 토큰 사용량을 기록합니다.
+#   LLM_FAST_MODEL (기본 gpt-4.1-mini), LLM_STRONG_MODEL (기본 gpt-4.1)
+#   LLM_SHORT_QUESTION_CHARS: 이 길이 이하의 질문은 fast 등급 (기본 80자)
+#   LLM_ROUTE_OVERRIDES: {"엔드포인트": "tier"} 또는 {"엔드포인트:경로": "tier"} 형태의 JSON
+# 경로(path): forced(GPT 강제), no_context(문서/컨텍스트 없음), fallback_context, rag(문서 기반), combined(통합 분석)
+
+MODEL_TIERS = {
+    "fast": os.environ.get("LLM_FAST_MODEL", "gpt-4.1-mini"),
+    "strong": os.environ.get("LLM_STRONG_MODEL", "gpt-4.1"),
+}
+SHORT_QUESTION_CHARS = int(os.environ.get("LLM_SHORT_QUESTION_CHARS", "80"))
+
+# 분석형 엔드포인트는 질문이 짧아도 strong 등급 유지
+DEFAULT_ROUTE_OVERRIDES = {
+    "recommend_business": "strong",
+    "location_analysis": "strong",
+    "analyze_market": "strong",
+}
+
+def _load_route_overrides():
+    overrides = dict(DEFAULT_ROUTE_OVERRIDES)
+    raw = os.environ.get("LLM_ROUTE_OVERRIDES")
+    if raw:
+        try:
+            overrides.update(json.loads(raw))
+        except ValueError as e:
+            logger.error("LLM_ROUTE_OVERRIDES 파싱 실패: %s", e)
+    return overrides
+
+ROUTE_OVERRIDES = _load_route_overrides()
+
+def choose_tier(question, path, route):
+    override = ROUTE_OVERRIDES.get(f"{route}:{path}") or ROUTE_OVERRIDES.get(route)
+    if override in MODEL_TIERS:
+        return override
+    # 문서를 붙이는 경로는 긴 컨텍스트를 다뤄야 하므로 strong
+    if path in ("rag", "combined"):
+        return "strong"
+    if len(question.strip()) <= SHORT_QUESTION_CHARS:
+        return "fast"
+    return "strong"
+
+def route_model(question, path, route):
+    tier = choose_tier(question, path, route)
+    return tier, MODEL_TIERS[tier]
+
+# 등급별 사용 통계
+class TierStats:
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=500)
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 1) if latencies else None
+
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+        }
+
+_stats = {}
+_route_counts = {}
+_stats_lock = threading.Lock()
+
+def record_call(tier, model, route, path, latency, prompt_tokens=0, completion_tokens=0, error=False):
+    with _stats_lock:
+        stats = _stats.get(tier)
+        if stats is None or stats.model != model:
+            stats = _stats[tier] = TierStats(model)
+        stats.calls += 1
+        stats.errors += int(error)
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens
+        stats.latencies.append(latency)
+        route_key = f"{route}:{path}"
+        _route_counts.setdefault(route_key, {}).setdefault(tier, 0)
+        _route_counts[route_key][tier] += 1
+
+def routing_stats():
+    with _stats_lock:
+        return {
+            "tiers": {tier: stats.snapshot() for tier, stats in _stats.items()},
+            "routes": {route: dict(counts) for route, counts in _route_counts.items()},
+        }
+
+@contextmanager
+def track_llm_call(tier, model, route, path):
+    # langchain OpenAI 콜백으로 토큰 사용량 수집 (없으면 지연 시간만 기록)
+    try:
+        from langchain_community.callbacks.manager import get_openai_callback
+        callback_cm = get_openai_callback()
+    except ImportError:
+        callback_cm = None
+
+    start = time.perf_counter()
+    error = False
+    cb = None
+    try:
+        if callback_cm is not None:
+            with callback_cm as cb:
+                yield
+        else:
+            yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        latency = time.perf_counter() - start
+        record_call(
+            tier, model, route, path, latency,
+            prompt_tokens=getattr(cb, "prompt_tokens", 0),
+            completion_tokens=getattr(cb, "completion_tokens", 0),
+            error=error
+        )
+        logger.debug("llm call tier=%s model=%s route=%s path=%s latency=%.3fs", tier, model, route, path, latency)
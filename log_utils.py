@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import queue
+import random
+import signal
+import atexit
+import logging
+import threading
+import logging.handlers
+
+# ✅ 공통 로깅 설정
+# - 레벨: LOG_LEVEL (기본 INFO), 포맷: LOG_FORMAT=json|text (기본 json)
+# - 핸들러는 QueueHandler → 백그라운드 QueueListener 로 비동기 출력 (요청 스레드는 큐에 넣기만 함)
+# - 행 단위 디버그처럼 많은 이벤트는 extra={"sample_rate": 0.01} 로 샘플링
+# - 운영 중 디버그 on/off: kill -USR1 <pid> (install_debug_toggle 호출 시)
+#
+# 메시지는 logger.debug("... %s", value) 처럼 인자로 넘겨야 레벨이 꺼져 있을 때 포맷팅 비용이 없습니다.
+
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# LogRecord 기본 속성 (extra 로 넘긴 필드만 골라내기 위함)
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sample_rate"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        if rate is None or rate >= 1:
+            return True
+        return random.random() < rate
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    # 큐가 가득 차면 요청 스레드를 막지 않고 로그를 버립니다
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+_setup_lock = threading.Lock()
+_listener = None
+_queue = None
+
+def _build_output_handler():
+    handler = logging.StreamHandler(sys.stdout)
+    if os.environ.get("LOG_FORMAT", "json") == "text":
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+    return handler
+
+def _start_listener():
+    global _listener
+    _listener = logging.handlers.QueueListener(_queue, _build_output_handler(), respect_handler_level=False)
+    _listener.start()
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+def _restart_listener_in_child():
+    # fork 된 자식에는 리스너 스레드가 없으므로 새 큐/리스너를 띄웁니다
+    global _queue
+    if _listener is None:
+        return
+    _queue = queue.Queue(LOG_QUEUE_SIZE)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = _queue
+    _start_listener()
+
+def setup_logging(level=None):
+    global _queue
+    with _setup_lock:
+        if _queue is not None:
+            return
+        _queue = queue.Queue(LOG_QUEUE_SIZE)
+        handler = NonBlockingQueueHandler(_queue)
+        handler.addFilter(SamplingFilter())
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(level or os.environ.get("LOG_LEVEL", "INFO").upper())
+        _start_listener()
+        atexit.register(_stop_listener)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(name)
+
+def set_level(level):
+    logging.getLogger().setLevel(level)
+
+def install_debug_toggle(sig=getattr(signal, "SIGUSR1", None)):
+    if sig is None or threading.current_thread() is not threading.main_thread():
+        return
+    base_level = logging.getLogger().level
+
+    def toggle(signum, frame):
+        root = logging.getLogger()
+        root.setLevel(base_level if root.level == logging.DEBUG else logging.DEBUG)
+
+    signal.signal(sig, toggle)
@@ -0,0 +1,87 @@
+import numpy as np
+
+# ✅ 시간대별 유동인구 프로파일 (동 × 24시간 배열)
+# tpssPassengerCnt 응답의 PSNG_NO_00 ~ PSNG_NO_23 을 한 번에 2차원 배열로 모아두고,
+# 피크 시간 / 시간대 비중 / 시간대별 상위 동 같은 질의를 동 전체에 대해 벡터 연산으로 계산합니다.
+
+HOURS = 24
+HOUR_FIELDS = [f"PSNG_NO_{str(h).zfill(2)}" for h in range(HOURS)]
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def window_hours(start, end):
+    # [start, end) 시간 구간, 자정을 넘는 구간(예: 22 ~ 2)도 허용
+    # start == end 는 start 한 시간만, 하루 전체는 0 ~ 24
+    if not (0 <= start < HOURS and 0 <= end <= HOURS):
+        raise ValueError("start must be 0-23 and end 0-24")
+    length = HOURS if end - start == HOURS else ((end - start) % HOURS or 1)
+    return np.arange(start, start + length) % HOURS
+
+class PopulationProfiles:
+    def __init__(self, dong_ids, names, matrix):
+        self.dong_ids = dong_ids
+        self.names = names  # dong_id 와 같은 순서의 (gu, dong)
+        self.matrix = matrix
+        self.index = {dong_id: i for i, dong_id in enumerate(dong_ids)}
+        self._by_name = {name: i for i, name in enumerate(names)}
+        self.totals = matrix.sum(axis=1)
+        self.peak_hours = matrix.argmax(axis=1)
+
+    @classmethod
+    def from_rows(cls, rows_by_dong, address_rows):
+        names = {}
+        for entry in address_rows:
+            dong_id = entry.get("dong_id", "").strip()
+            if len(dong_id) == 8:
+                names.setdefault(dong_id, (entry.get("cgg_nm", "").strip(), entry.get("dong_nm", "").strip()))
+        # 주소 마스터에 있는 동만 사용
+        dong_ids = [dong_id for dong_id in rows_by_dong if dong_id in names]
+        matrix = np.zeros((len(dong_ids), HOURS), dtype=np.float32)
+        for i, dong_id in enumerate(dong_ids):
+            row = rows_by_dong[dong_id]
+            matrix[i] = [_to_number(row.get(field)) for field in HOUR_FIELDS]
+        return cls(dong_ids, [names[dong_id] for dong_id in dong_ids], matrix)
+
+    def __len__(self):
+        return len(self.dong_ids)
+
+    def find(self, gu, dong):
+        return self._by_name.get((gu.strip(), dong.strip()))
+
+    def window_totals(self, start, end):
+        return self.matrix[:, window_hours(start, end)].sum(axis=1)
+
+    def summarize(self, i, window_total, window_share):
+        gu, dong = self.names[i]
+        return {
+            "gu": gu,
+            "dong": dong,
+            "dong_id": self.dong_ids[i],
+            "total": int(self.totals[i]),
+            "peak_hour": int(self.peak_hours[i]),
+            "window_total": int(window_total),
+            "window_share": round(float(window_share), 4),
+        }
+
+    def top(self, start, end, n=10, by="window_total"):
+        window = self.window_totals(start, end)
+        shares = np.divide(window, self.totals, out=np.zeros_like(window), where=self.totals > 0)
+        key = shares if by == "window_share" else window
+        n = min(n, len(key))
+        if n <= 0:
+            return []
+        # 전체 정렬 대신 상위 n 개만 골라 정렬
+        candidates = np.argpartition(-key, n - 1)[:n]
+        order = candidates[np.argsort(-key[candidates], kind="stable")]
+        return [self.summarize(i, window[i], shares[i]) for i in order]
+
+    def describe(self, i, start, end):
+        window_total = self.matrix[i, window_hours(start, end)].sum()
+        total = self.totals[i]
+        summary = self.summarize(i, window_total, window_total / total if total > 0 else 0.0)
+        summary["hourly"] = [int(v) for v in self.matrix[i]]
+        return summary
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import random
+import threading
+from collections import Counter
+
+from log_utils import get_logger
+from cache_utils import TwoTierCache
+from resilience import record_upstream_calls
+from llm_governor import BACKGROUND_PRIORITY, llm_priority
+
+logger = get_logger(__name__)
+
+# ✅ 수요 기반 미리 가져오기 (prefetch)
+# 1) 요청이 들어온 키(예: (구, 동, 업종))를 반감기 PREFETCH_HALF_LIFE_SEC 로 감쇠하는 점수로 세고, 시간대별 요청량도 함께 학습
+# 2) 한가한 시간대(요청량이 평균의 PREFETCH_OFF_PEAK_RATIO 이하인 시간, 학습 전에는 PREFETCH_OFF_PEAK_HOURS)에
+#    점수 상위 키 중 캐시가 곧 오래된 값이 될 키(나이 > soft TTL × PREFETCH_REFRESH_AHEAD)를 미리 다시 계산
+# 3) 미리 계산은 한 번에 하나씩, LLM 호출은 BACKGROUND_PRIORITY 로, 업스트림별 시간당 호출 수(PREFETCH_QUOTAS)를 넘지 않게
+# 워커별 요청 기록은 PREFETCH_FLUSH_SEC 마다 공유 캐시("prefetch")에 합치고, 미리 계산은 공유 잠금을 잡은 프로세스 하나만 실행합니다.
+# (CACHE_URL=memory 에서는 프로세스마다 자기 요청 기록으로 따로 동작)
+
+PREFETCH_INTERVAL_SEC = float(os.environ.get("PREFETCH_INTERVAL_SEC", "300"))  # 0 이면 미리 계산 안 함
+PREFETCH_FLUSH_SEC = float(os.environ.get("PREFETCH_FLUSH_SEC", "30"))
+PREFETCH_HALF_LIFE_SEC = float(os.environ.get("PREFETCH_HALF_LIFE_SEC", str(6 * 3600)))
+PREFETCH_TOP_N = int(os.environ.get("PREFETCH_TOP_N", "20"))
+PREFETCH_MIN_SCORE = float(os.environ.get("PREFETCH_MIN_SCORE", "2"))
+PREFETCH_MAX_KEYS = int(os.environ.get("PREFETCH_MAX_KEYS", "1000"))
+PREFETCH_REFRESH_AHEAD = float(os.environ.get("PREFETCH_REFRESH_AHEAD", "0.8"))
+PREFETCH_OFF_PEAK_HOURS = os.environ.get("PREFETCH_OFF_PEAK_HOURS", "1-7")
+PREFETCH_OFF_PEAK_RATIO = float(os.environ.get("PREFETCH_OFF_PEAK_RATIO", "0.5"))
+# 시간대 학습에 필요한 최소 요청 수 (이보다 적으면 PREFETCH_OFF_PEAK_HOURS 사용)
+PREFETCH_MIN_OBSERVATIONS = int(os.environ.get("PREFETCH_MIN_OBSERVATIONS", "200"))
+PREFETCH_ROUND_MAX_SEC = float(os.environ.get("PREFETCH_ROUND_MAX_SEC", "600"))
+PREFETCH_QUOTAS = {"real_estate": 300, "population": 30, "kakao": 300, "openai": 200}
+PREFETCH_QUOTAS.update(json.loads(os.environ.get("PREFETCH_QUOTAS", "{}")))
+# 키 하나를 미리 계산할 때 드는 업스트림 호출 수 추정 (한 번 실행한 키는 실제 호출 수 사용)
+DEFAULT_PREFETCH_COST = {"real_estate": 6, "population": 1, "kakao": 1, "openai": 2}
+PREFETCH_RECENT_MAX = 50
+
+def parse_hours(spec):
+    # "1-7,14-16" → {1, ..., 6, 14, 15} ([시작, 끝) 구간, 자정을 넘는 "22-2" 도 허용)
+    hours = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        start, _, end = part.partition("-")
+        start = int(start) % 24
+        end = int(end) % 24 if end else (start + 1) % 24
+        length = (end - start) % 24 or 24
+        hours.update((start + i) % 24 for i in range(length))
+    return hours
+
+class DemandState:
+    # 키별 감쇠 점수 + 시간대별 요청량 + 캐시 적중 통계 (워커별로 쌓아 공유 상태에 merge)
+    def __init__(self):
+        self.scores = {}  # key -> (score, updated_at)
+        self.hourly = [0.0] * 24
+        self.counters = Counter()
+
+    @staticmethod
+    def _decayed(score, updated_at, now):
+        return score * 0.5 ** ((now - updated_at) / PREFETCH_HALF_LIFE_SEC)
+
+    def add(self, key, n=1.0, now=None):
+        now = now or time.time()
+        score, updated_at = self.scores.get(key, (0.0, now))
+        self.scores[key] = (self._decayed(score, updated_at, now) + n, now)
+        self.hourly[time.localtime(now).tm_hour] += n
+
+    def merge(self, other, now=None):
+        now = now or time.time()
+        for key, (score, updated_at) in other.scores.items():
+            mine, mine_at = self.scores.get(key, (0.0, now))
+            self.scores[key] = (self._decayed(mine, mine_at, now) + self._decayed(score, updated_at, now), now)
+        self.hourly = [a + b for a, b in zip(self.hourly, other.hourly)]
+        self.counters.update(other.counters)
+        if len(self.scores) > PREFETCH_MAX_KEYS:
+            self.scores = {key: (score, now) for key, score in self.top(PREFETCH_MAX_KEYS, now)}
+        return self
+
+    def top(self, n, now=None):
+        now = now or time.time()
+        ranked = sorted(
+            ((key, self._decayed(score, updated_at, now)) for key, (score, updated_at) in self.scores.items()),
+            key=lambda kv: -kv[1]
+        )
+        return ranked[:n]
+
+    def off_peak_hours(self):
+        total = sum(self.hourly)
+        if total < PREFETCH_MIN_OBSERVATIONS:
+            return parse_hours(PREFETCH_OFF_PEAK_HOURS)
+        threshold = total / 24 * PREFETCH_OFF_PEAK_RATIO
+        return {hour for hour, count in enumerate(self.hourly) if count <= threshold}
+
+class Prefetcher:
+    def __init__(self, name, refresh, age, soft_ttl, key_fields=None, interval=PREFETCH_INTERVAL_SEC, quotas=None):
+        # refresh(key) -> 성공 여부 (캐시를 다시 계산해 저장), age(key) -> 캐시 값의 나이(초) 또는 None
+        self.name = name
+        self.refresh = refresh
+        self.age = age
+        self.soft_ttl = soft_ttl
+        self.key_fields = key_fields
+        self.interval = interval
+        self.quotas = quotas if quotas is not None else PREFETCH_QUOTAS
+        # leader 잠금은 잡고 있는 동안 계속 연장되므로 lock_ttl 은 프로세스가 죽었을 때 풀리기까지의 시간
+        self.store = TwoTierCache(f"prefetch:{name}", 7 * 86400)
+        self._pending = DemandState()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    # 요청 경로
+    def observe(self, key, meta=None):
+        # 요청 1건 기록, meta 가 있으면 (StaleWhileRevalidateCache 의 meta) 캐시 적중 / 미리 계산한 값으로 응답했는지도 집계
+        now = time.time()
+        prefetch_served = False
+        if meta is not None and meta["cache"] != "miss":
+            prefetched_at = (self.store.get("state") or {}).get("prefetched", {}).get(key)
+            # 응답한 값이 마지막 미리 계산 이후에 만들어졌으면 미리 계산 덕분에 적중한 것으로 봄
+            prefetch_served = bool(prefetched_at) and now - meta["age_sec"] >= prefetched_at
+        with self._lock:
+            self._pending.add(key, now=now)
+            if meta is None:
+                return
+            counters = self._pending.counters
+            counters["requests"] += 1
+            counters[meta["cache"]] += 1
+            if prefetch_served:
+                counters["prefetch_served"] += 1
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, DemandState()
+        if pending.scores or pending.counters:
+            self.store.update("demand", lambda demand: (demand or DemandState()).merge(pending))
+
+    # 미리 계산
+    def _usage_this_hour(self, state):
+        return state.get("usage", {}).get(int(time.time() // 3600), {})
+
+    def _within_quota(self, state, key):
+        used = self._usage_this_hour(state)
+        cost = state.get("costs", {}).get(key, DEFAULT_PREFETCH_COST)
+        return all(used.get(name, 0) + n <= self.quotas.get(name, float("inf")) for name, n in cost.items())
+
+    def _record(self, key, started, ok, calls):
+        hour = int(started // 3600)
+        cost = dict(Counter(calls))
+
+        def apply(state):
+            state = state or {}
+            usage = {h: u for h, u in state.get("usage", {}).items() if h >= hour - 1}
+            current = Counter(usage.get(hour, {}))
+            current.update(cost)
+            usage[hour] = dict(current)
+            prefetched = {k: at for k, at in state.get("prefetched", {}).items() if at >= started - 86400}
+            costs = dict(state.get("costs", {}))
+            if ok:
+                prefetched[key] = started
+                costs[key] = cost
+            recent = (state.get("recent", []) + [{
+                "key": key, "at": started, "sec": round(time.time() - started, 2), "ok": ok, "calls": cost
+            }])[-PREFETCH_RECENT_MAX:]
+            return {**state, "usage": usage, "prefetched": prefetched, "costs": costs, "recent": recent,
+                    "prefetched_total": state.get("prefetched_total", 0) + (1 if ok else 0)}
+
+        self.store.update("state", apply)
+
+    def due_keys(self, demand, now=None):
+        # 점수 상위 키 중 캐시가 없거나 곧 오래된 값이 될 키
+        due = []
+        for key, score in demand.top(PREFETCH_TOP_N, now):
+            if score < PREFETCH_MIN_SCORE:
+                break
+            age = self.age(key)
+            if age is None or age >= self.soft_ttl * PREFETCH_REFRESH_AHEAD:
+                due.append(key)
+        return due
+
+    def run_round(self, force=False):
+        # 미리 계산한 키 목록을 반환 (한가한 시간대가 아니거나 다른 프로세스가 실행 중이면 빈 목록)
+        demand = self.store.get("demand") or DemandState()
+        if not force and time.localtime().tm_hour not in demand.off_peak_hours():
+            return []
+        done = []
+        with self.store.lock("leader") as acquired:
+            if not acquired:
+                return []
+            started_round = time.monotonic()
+            for key in self.due_keys(demand):
+                if time.monotonic() - started_round > PREFETCH_ROUND_MAX_SEC:
+                    break
+                if not self._within_quota(self.store.get("state") or {}, key):
+                    logger.info("prefetch %s: hourly quota reached", self.name)
+                    break
+                started = time.time()
+                with record_upstream_calls() as calls, llm_priority(BACKGROUND_PRIORITY):
+                    try:
+                        ok = bool(self.refresh(key))
+                    except Exception as e:
+                        logger.warning("prefetch %s failed for %s: %s", self.name, key, e)
+                        ok = False
+                self._record(key, started, ok, calls)
+                if ok:
+                    done.append(key)
+        if done:
+            logger.info("prefetch %s: refreshed %d keys", self.name, len(done))
+        return done
+
+    def start(self):
+        # 프로세스(워커)마다 한 번, 요청 기록은 PREFETCH_FLUSH_SEC 마다 공유하고 미리 계산은 PREFETCH_INTERVAL_SEC 마다 시도
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = DemandState()
+
+        def run():
+            next_round = time.monotonic() + self.interval * random.uniform(0.5, 1.0)
+            while True:
+                time.sleep(PREFETCH_FLUSH_SEC * random.uniform(0.8, 1.2))
+                try:
+                    self._flush()
+                    if self.interval > 0 and time.monotonic() >= next_round:
+                        next_round = time.monotonic() + self.interval
+                        self.run_round()
+                except Exception as e:
+                    logger.warning("prefetch %s loop failed: %s", self.name, e)
+
+        threading.Thread(target=run, name=f"prefetch-{self.name}", daemon=True).start()
+
+    # 상태 조회
+    def _describe(self, key):
+        return dict(zip(self.key_fields, key)) if self.key_fields else key
+
+    def stats(self):
+        demand = self.store.get("demand") or DemandState()
+        with self._lock:
+            demand = DemandState().merge(demand).merge(self._pending)
+        state = self.store.get("state") or {}
+        counters = demand.counters
+        requests = counters["requests"]
+        off_peak = demand.off_peak_hours()
+        return {
+            "enabled": self.interval > 0,
+            "off_peak_hours": sorted(off_peak),
+            "in_off_peak": time.localtime().tm_hour in off_peak,
+            "hot_keys": [{**self._describe(key), "score": round(score, 2)} for key, score in demand.top(10)],
+            "requests": requests,
+            "cache": {status: counters[status] for status in ("hit", "stale", "miss")},
+            "hit_rate": round((counters["hit"] + counters["stale"]) / requests, 4) if requests else None,
+            "prefetch_served": counters["prefetch_served"],
+            "prefetch_hit_rate": round(counters["prefetch_served"] / requests, 4) if requests else None,
+            "prefetched_total": state.get("prefetched_total", 0),
+            "quotas_per_hour": self.quotas,
+            "usage_this_hour": self._usage_this_hour(state),
+            "recent": [
+                {**r, "key": self._describe(r["key"]), "at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(r["at"]))}
+                for r in reversed(state.get("recent", []))
+            ],
+        }
@@ -0,0 +1,154 @@
+import re
+from collections import deque
+
+# ✅ 질문 전처리기: 주소 사전(구 / 동 이름) + 도메인 키워드를 Aho-Corasick 오토마톤으로 한 번만 컴파일하고,
+# 질문을 한 번 훑어서 지역 / 의도 / 나머지 핵심어를 뽑아 정규화된 검색어(canonical)를 만듭니다.
+# canonical 은 같은 뜻의 질문이면 같은 문자열이 되도록 구성하므로 검색 캐시 키로도 사용합니다.
+
+# 키워드 → 의도 (키워드 순서가 canonical 내 순서)
+KEYWORD_INTENTS = {
+    "상권": "location",
+    "입지": "location",
+    "분석": "analysis",
+    "업종": "recommendation",
+    "추천": "recommendation",
+    "창업": "recommendation",
+    "유동인구": "population",
+    "시간대": "population",
+    "연령대": "population",
+    "혼잡도": "population",
+}
+
+# 매치 뒤에 붙어 남는 조사 / 의미 없는 단어는 검색어에서 제외
+STOPWORDS = {"에서", "으로", "에게", "까지", "부터", "관련", "대해", "대한", "정보", "주변", "근처"}
+
+_TOKEN_RE = re.compile(r"[가-힣A-Za-z0-9]+")
+_DONG_NUMBER_RE = re.compile(r"\d+(·\d+)*(가)?동$")
+
+def _is_hangul(ch):
+    return "가" <= ch <= "힣"
+
+class Gazetteer:
+    # 용어 → payload 사전을 Aho-Corasick 오토마톤으로 컴파일
+    # bounded(payload) 가 참인 용어만 한글 단어 경계 규칙을 적용 (나머지는 단어 중간에서도 매치)
+    def __init__(self, terms, bounded=None):
+        self._bounded = bounded or (lambda payload: True)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for term, payload in terms.items():
+            self._add(term, payload)
+        self._build()
+
+    def _add(self, term, payload):
+        node = 0
+        for ch in term:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(term), payload))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0) if node else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text):
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, payload in self._out[node]:
+                yield i + 1 - length, i + 1, payload
+
+    def find(self, text):
+        # 왼쪽부터 가장 긴 매치를 겹치지 않게 선택.
+        # 경계 규칙 대상 용어는 한글 단어 중간에서 시작하는 매치(예: '활동', '행동' 속 '동')를 버리되,
+        # 바로 앞 매치에 붙은 경우('강남구역삼동')는 허용
+        matches = sorted(self.find_all(text), key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        last_end = 0
+        for start, end, payload in matches:
+            if start < last_end:
+                continue
+            if start > 0 and _is_hangul(text[start - 1]) and start != last_end and self._bounded(payload):
+                continue
+            selected.append((start, end, payload))
+            last_end = end
+        return selected
+
+class ParsedQuestion:
+    __slots__ = ("gu", "dong", "intents", "keywords", "terms", "canonical")
+
+    def __init__(self, gu, dong, intents, keywords, terms):
+        self.gu = gu
+        self.dong = dong
+        self.intents = intents
+        self.keywords = keywords
+        self.terms = terms
+        self.canonical = " ".join([part for part in (gu, dong) if part] + keywords + terms)
+
+    def __repr__(self):
+        return f"ParsedQuestion({self.canonical!r}, intents={self.intents})"
+
+class QuestionParser:
+    def __init__(self, address_rows, keywords=KEYWORD_INTENTS):
+        terms = {}
+        for row in address_rows:
+            gu = row.get("cgg_nm", "").strip()
+            dong = row.get("dong_nm", "").strip()
+            if not gu or not dong:
+                continue
+            terms[gu] = ("gu", gu, None)
+            # '역삼1동' 은 '역삼동' 으로도 찾을 수 있게 별칭 등록 (같은 별칭이 여러 구에 있으면 후보로 보관)
+            for alias in {dong, _DONG_NUMBER_RE.sub("동", dong)}:
+                kind, name, candidates = terms.get(alias, ("dong", alias, frozenset()))
+                if kind == "dong":
+                    terms[alias] = ("dong", alias, candidates | {gu})
+        for keyword in keywords:
+            terms[keyword] = ("keyword", keyword, None)
+        self._keyword_order = {keyword: i for i, keyword in enumerate(keywords)}
+        self._keywords = keywords
+        # 구 / 동 이름만 단어 경계를 따짐 (도메인 키워드는 '카페창업' 처럼 붙여 써도 찾음)
+        self._gazetteer = Gazetteer(terms, bounded=lambda payload: payload[0] != "keyword")
+
+    def parse(self, question):
+        gu = dong = None
+        dong_gus = frozenset()
+        found_keywords = set()
+        consumed = []
+        for start, end, (kind, name, candidates) in self._gazetteer.find(question):
+            consumed.append((start, end))
+            if kind == "gu" and gu is None:
+                gu = name
+            elif kind == "dong" and dong is None:
+                dong, dong_gus = name, candidates
+            elif kind == "keyword":
+                found_keywords.add(name)
+
+        # 구를 말하지 않았어도 동 이름이 한 구에만 있으면 구를 채움
+        if gu is None and len(dong_gus) == 1:
+            gu = next(iter(dong_gus))
+
+        keywords = sorted(found_keywords, key=self._keyword_order.get)
+        intents = list(dict.fromkeys(self._keywords[kw] for kw in keywords))
+
+        # 사전에 없는 나머지 두 글자 이상 단어는 순서대로 중복 없이 유지
+        remainder = list(question)
+        for start, end in consumed:
+            remainder[start:end] = " " * (end - start)
+        terms = [t for t in dict.fromkeys(_TOKEN_RE.findall("".join(remainder))) if len(t) > 1 and t not in STOPWORDS]
+        return ParsedQuestion(gu, dong, intents, keywords, terms)
@@ -14,6 +14,11 @@ from langchain.chat_models import ChatOpenAI
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
+from log_utils import get_logger
+from question_parser import QuestionParser
+
+logger = get_logger(__name__)
+
 # 1. Weaviate 클라이언트 생성
 def get_weaviate_client():
     return weaviate.Client(
@@ -47,33 +52,9 @@ template = r"""
 """
 CUSTOM_PROMPT = PromptTemplate(template=template, input_variables=["context", "question"])
 
-# 4. 질문 전처리
-def emphasize_keywords(question: str, keywords: list[str]) -> str:
-    for kw in keywords:
-        if kw in question:
-            question += f" {kw} 관련 정보 {kw} 분석"
-    return question
-
-def reformulate_for_search(question: str) -> str:
-    base_keywords = re.findall(r"[가-힣]+", question)
-    keywords = [kw for kw in base_keywords if len(kw) > 1]
-    return " ".join(keywords)
-
+# 4. 질문 전처리 (주소 사전 + 도메인 키워드 기반 정규화 검색어)
 def preprocess_question(question: str) -> str:
-    match = re.search(r"([가-힣]+동)", question)
-    dong_name = match.group(1) if match else ""
-
-    keywords = ["상권", "입지", "분석", "업종", "추천", "창업", "유동인구", "시간대", "연령대", "혼잡도"]
-    emphasized = emphasize_keywords(question, keywords)
-    reformatted = reformulate_for_search(emphasized)
-
-    if dong_name:
-        return f"""
-'{dong_name}' 지역에 대해 유동인구, 업종, 상권, 창업, 시간대 분석과 관련된 문서를 찾고자 합니다.
-핵심 키워드: {reformatted}
-원 질문: {question}
-"""
-    return f"{reformatted}\n\n원 질문: {question}"
+    return question_parser.parse(question).canonical
 
 # ✅ GPT 단독으로 답변할 질문 종류
 gpt_only_types = ["recommendation", "location_analysis"]
@@ -110,7 +91,7 @@ def ask_rag(question, retriever=None, fallback_context="", force_gpt=False):
 
     if not context.strip():
         llm = ChatOpenAI(model_name="gpt-4", temperature=0.7)
-        response = llm.predict(preprocessed)
+        response = llm.predict(question)
         return f"\U0001F4A1 GPT 단독 추론 응답 (문서/컨텍스트 없음)\n\n{response}"
 
     qa_chain = RetrievalQA.from_chain_type(
@@ -200,9 +181,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import json
-import xml.etree.ElementTree as ET
-from datetime import datetime
-import pandas as pd
+from estate_utils import iter_deal_items_from_response, recent_months, sort_recent, mean_price, deals_to_dicts
 
 # 환경 변수 로딩
 REAL_ESTATE_API = "http://apis.data.go.kr/1613000/RTMSDataSvcNrgTrade/getRTMSDataSvcNrgTrade"
@@ -218,16 +197,16 @@ with open("real_estate.json", "r", encoding="utf-8") as f:
 with open("address_master.json", "r", encoding="utf-8") as f:
     address_data = json.load(f)
 
+question_parser = QuestionParser(address_data["DATA"])
+
 # 부동산 거래 데이터 조회
 
 def get_real_estate_by_dong(gu, dong):
     lawd_cd = gu_code_map.get(gu)
     if not lawd_cd:
         return []
-    now = datetime.now()
     results = []
-    for i in range(6):
-        yyyymm = (now.replace(day=1) - pd.DateOffset(months=i)).strftime("%Y%m")
+    for yyyymm in recent_months(6):
         params = {
             "serviceKey": REAL_ESTATE_KEY,
             "LAWD_CD": lawd_cd,
@@ -237,24 +216,12 @@ def get_real_estate_by_dong(gu, dong):
             "type": "xml"
         }
         try:
-            res = requests.get(REAL_ESTATE_API, params=params, timeout=10)
-            root = ET.fromstring(res.content)
-            items = root.find("body/items")
-            for item in items.findall("item"):
-                umd = item.findtext("umdNm", default="N/A")
-                if dong in umd:
-                    results.append({
-                        "dealAmount": item.findtext("dealAmount", "N/A"),
-                        "dealYear": int(item.findtext("dealYear", "0")),
-                        "dealMonth": int(item.findtext("dealMonth", "0")),
-                        "dealDay": int(item.findtext("dealDay", "0")),
-                        "buildingType": item.findtext("buildingType", "N/A")
-                    })
+            res = requests.get(REAL_ESTATE_API, params=params, timeout=10, stream=True)
+            results.extend(iter_deal_items_from_response(res, dong))
         except Exception as e:
-            print("[ERROR] 부동산 API 오류:", e)
+            logger.error("부동산 API 오류: %s", e, extra={"upstream": "real_estate", "gu": gu})
             continue
-    results.sort(key=lambda x: (x["dealYear"], x["dealMonth"], x["dealDay"]), reverse=True)
-    return results[:30]
+    return sort_recent(results, 30)
 
 # 유동인구 데이터 조회
 
@@ -277,7 +244,7 @@ def get_passenger_info_by_dong(gu, dong):
                 if row.get("DONG_ID") == target_id:
                     return row
     except Exception as e:
-        print("[ERROR] 유동인구 API 오류:", e)
+        logger.error("유동인구 API 오류: %s", e, extra={"upstream": "population"})
     return None
 
 # 입지 평가 점수 계산
@@ -292,8 +259,8 @@ def evaluate_suitability(pop, estate_data, similar_count):
         pass
     try:
         if estate_data:
-            recent = [int(x["dealAmount"].replace(",", "")) for x in estate_data if x["dealAmount"] != "N/A"]
-            if recent and sum(recent)/len(recent) < 120000:
+            avg = mean_price(estate_data)
+            if avg is not None and avg < 120000:
                 score += 1
     except:
         pass
@@ -321,7 +288,7 @@ def analyze_market(gu, dong, item, get_similar_business_info_rag, get_rag_busine
         "dong": dong,
         "item": item,
         "population": pop,
-        "estate": estate,
+        "estate": deals_to_dicts(estate),
         "similar": similar,
         "score": score,
         "recommendation": recommendation,
@@ -1,49 +1,206 @@
 from flask import Flask, request, jsonify
-from flask_cors import CORS  # ← 추가
 
 from dotenv import load_dotenv
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)  # ← CORS 허용 설정
-
 import os
 import re
+import json
+import time
+import logging
+import threading
 import requests
 import urllib.parse
-import weaviate
-import json
-import xml.etree.ElementTree as ET
-from datetime import datetime
-import pandas as pd
+from datetime import date
+
+from log_utils import get_logger
+from resilience import (
+    UPSTREAMS, LastGood, call_upstream, deadline_scope, fan_out, record_upstream_calls, remaining, time_budget, breaker_states
+)
+from llm_router import route_model, track_llm_call, routing_stats
+from llm_governor import BatchedEmbeddings, BACKGROUND_PRIORITY, governed_call, governor_stats, llm_priority
+from http_utils import parse_fields, select_fields, json_with_etag, compress_response
+from cache_utils import StaleWhileRevalidateCache, TwoTierCache, make_key, get_snapshot, start_snapshotter
+from question_parser import QuestionParser
+from vector_search import multi_search
+from job_queue import JobQueue, QueueFull, PRIORITIES
+from prefetch import Prefetcher
+from competitor_index import COMPETITOR_CRAWL_RADIUS_M, get_competitor_index, get_competitor_store, request_crawl, start_crawler
+from estate_utils import iter_umd_deals_from_response, filter_dong, recent_months, sort_recent, mean_price, deals_to_dicts
+
+logger = get_logger(__name__)
 
-from weaviate.auth import AuthApiKey
-from langchain_community.vectorstores import Weaviate as LangchainWeaviate
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.chat_models import ChatOpenAI
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
+# 행 단위 / 전체 응답 덤프 같은 대량 디버그 로그의 샘플링 비율
+DEBUG_SAMPLE_RATE = float(os.environ.get("DEBUG_SAMPLE_RATE", "0.01"))
 
+# ✅ 업스트림 / LLM 응답 캐시 (프로세스 내 LRU + CACHE_URL 공유 저장소)
+estate_cache = TwoTierCache("estate", float(os.environ.get("ESTATE_CACHE_TTL_SEC", "21600")))
+population_cache = TwoTierCache("population", float(os.environ.get("POPULATION_CACHE_TTL_SEC", "3600")))
+kakao_cache = TwoTierCache("kakao", float(os.environ.get("KAKAO_CACHE_TTL_SEC", "86400")))
+llm_cache = TwoTierCache("llm", float(os.environ.get("LLM_CACHE_TTL_SEC", "86400")))
+
+# ⚡ langchain / weaviate / flask_cors 는 무거운 의존성이라 실제로 처음 쓸 때 import 합니다 (워커 콜드 스타트 단축)
 app = Flask(__name__)
+app.after_request(compress_response)  # gzip / brotli 응답 압축
 
 # 1. Weaviate 클라이언트 생성
+WEAVIATE_CONNECT_TIMEOUT_SEC = float(os.environ.get("WEAVIATE_CONNECT_TIMEOUT_SEC", "3"))
+
 def get_weaviate_client():
+    import weaviate
+    from weaviate.auth import AuthApiKey
+
     return weaviate.Client(
         url=os.environ["WEAVIATE_URL"],
         auth_client_secret=AuthApiKey(api_key=os.environ["WEAVIATE_API_KEY"]),
-        additional_headers={"X-OpenAI-Api-Key": os.environ["OPENAI_API_KEY"]}
+        additional_headers={"X-OpenAI-Api-Key": os.environ["OPENAI_API_KEY"]},
+        timeout_config=(WEAVIATE_CONNECT_TIMEOUT_SEC, UPSTREAMS["weaviate"]["timeout"])
+    )
+
+# 2. 검색 설정
+RAG_INDEX_CLASS = os.environ.get("RAG_INDEX_CLASS", "BusinessAPI")
+RAG_TOP_K = int(os.environ.get("RAG_TOP_K", "5"))
+# app: 질문 임베딩을 서버에서 만들어 nearVector 로 검색 (동시 요청을 embeddings API 한 번으로 묶음)
+# weaviate: Weaviate 의 text2vec-openai 모듈이 질문마다 임베딩 (nearText)
+RAG_QUERY_EMBEDDING = os.environ.get("RAG_QUERY_EMBEDDING", "app")
+# 이 거리(cosine)보다 먼 문서는 관련 없는 문서로 보고 버림 (0 이면 사용 안 함)
+RAG_MAX_DISTANCE = float(os.environ.get("RAG_MAX_DISTANCE", "0.35")) or None
+
+# ✅ 프로세스(워커)별 공유 객체: fork 이후 각 워커에서 새로 만들어야 커넥션이 섞이지 않습니다
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "16"))
+
+_worker_lock = threading.Lock()
+_http_session = None
+_http_session_pid = None
+_weaviate_client = None
+_weaviate_client_pid = None
+_query_embeddings = None
+_query_embeddings_pid = None
+
+def get_http_session():
+    global _http_session, _http_session_pid
+    if _http_session is None or _http_session_pid != os.getpid():
+        with _worker_lock:
+            if _http_session is None or _http_session_pid != os.getpid():
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _http_session, _http_session_pid = session, os.getpid()
+    return _http_session
+
+def get_shared_weaviate_client():
+    global _weaviate_client, _weaviate_client_pid
+    if _weaviate_client is None or _weaviate_client_pid != os.getpid():
+        with _worker_lock:
+            if _weaviate_client is None or _weaviate_client_pid != os.getpid():
+                _weaviate_client, _weaviate_client_pid = get_weaviate_client(), os.getpid()
+    return _weaviate_client
+
+def get_query_embeddings():
+    global _query_embeddings, _query_embeddings_pid
+    if _query_embeddings is None or _query_embeddings_pid != os.getpid():
+        from langchain_community.embeddings import OpenAIEmbeddings
+        with _worker_lock:
+            if _query_embeddings is None or _query_embeddings_pid != os.getpid():
+                inner = OpenAIEmbeddings(openai_api_key=os.environ["OPENAI_API_KEY"])
+                _query_embeddings, _query_embeddings_pid = BatchedEmbeddings(inner), os.getpid()
+    return _query_embeddings
+
+# ✅ 검색 결과 캐시: (인덱스 버전, 정규화된 검색어) → 상위 문서
+# 캐시 적중 시 임베딩 API 와 Weaviate 질의를 모두 건너뜁니다. 인덱스 버전이 키에 들어가므로
+# 문서가 추가 / 삭제되면 이전 결과는 자동으로 쓰이지 않습니다.
+# 버전은 RAG_INDEX_VERSION 이 있으면 그 값, 없으면 클래스의 객체 수를 INDEX_VERSION_CHECK_SEC 마다 조회해 사용
+RETRIEVAL_CACHE_TTL_SEC = float(os.environ.get("RETRIEVAL_CACHE_TTL_SEC", "86400"))
+INDEX_VERSION_CHECK_SEC = float(os.environ.get("INDEX_VERSION_CHECK_SEC", "300"))
+
+retrieval_cache = TwoTierCache("retrieval", RETRIEVAL_CACHE_TTL_SEC)
+
+_index_version = None
+_index_version_checked_at = 0.0
+_index_version_lock = threading.Lock()
+
+def _fetch_index_version():
+    result = get_shared_weaviate_client().query.aggregate(RAG_INDEX_CLASS).with_meta_count().do()
+    count = result["data"]["Aggregate"][RAG_INDEX_CLASS][0]["meta"]["count"]
+    return f"count:{count}"
+
+def get_index_version():
+    global _index_version, _index_version_checked_at
+    if os.environ.get("RAG_INDEX_VERSION"):
+        return os.environ["RAG_INDEX_VERSION"]
+    if _index_version is not None and time.monotonic() - _index_version_checked_at < INDEX_VERSION_CHECK_SEC:
+        return _index_version
+    with _index_version_lock:
+        if _index_version is None or time.monotonic() - _index_version_checked_at >= INDEX_VERSION_CHECK_SEC:
+            try:
+                version = _fetch_index_version()
+                if version != _index_version and _index_version is not None:
+                    logger.info("index %s changed: %s -> %s", RAG_INDEX_CLASS, _index_version, version)
+                _index_version = version
+            except Exception as e:
+                # 버전을 알 수 없으면 캐시를 쓰지 않음 (None)
+                logger.warning("index version check failed: %s", e)
+            _index_version_checked_at = time.monotonic()
+    return _index_version
+
+# client.query.raw 는 호출별 timeout 을 받지 않으므로 GraphQL 엔드포인트로 직접 보내 남은 예산을 timeout 으로 사용
+def _weaviate_graphql(graphql, timeout):
+    res = get_http_session().post(
+        os.environ["WEAVIATE_URL"].rstrip("/") + "/v1/graphql",
+        json={"query": graphql},
+        headers={
+            "Authorization": f"Bearer {os.environ['WEAVIATE_API_KEY']}",
+            "X-OpenAI-Api-Key": os.environ["OPENAI_API_KEY"],
+        },
+        timeout=timeout
     )
+    res.raise_for_status()
+    return res.json()
 
-# 2. Retriever 생성
-def get_retriever(class_name="BusinessAPI", top_k=5):
-    client = get_weaviate_client()
-    vectorstore = LangchainWeaviate(
-        client=client,
-        index_name=class_name,
-        text_key="content",
-        embedding=OpenAIEmbeddings(openai_api_key=os.environ["OPENAI_API_KEY"])
+# 여러 검색어를 GraphQL 다중 질의 한 번으로 검색 (content + distance 만 조회, RAG_MAX_DISTANCE 로 거름)
+def _search_rows(queries):
+    vectors = None
+    if RAG_QUERY_EMBEDDING == "app":
+        embeddings = get_query_embeddings()
+        # 한 건이면 다른 요청과 micro-batch, 여러 건이면 그 자체로 한 번에 임베딩
+        vectors = [embeddings.embed_query(queries[0])] if len(queries) == 1 else embeddings.embed_documents(queries)
+    return multi_search(
+        lambda graphql: call_upstream("weaviate", lambda timeout: _weaviate_graphql(graphql, timeout)),
+        RAG_INDEX_CLASS, queries, RAG_TOP_K, vectors=vectors, max_distance=RAG_MAX_DISTANCE
     )
-    return vectorstore.as_retriever(search_kwargs={"k": top_k})
+
+def _retrieval_key(version, query):
+    return make_key(RAG_INDEX_CLASS, version, RAG_TOP_K, RAG_MAX_DISTANCE, RAG_QUERY_EMBEDDING, query)
+
+def retrieve_rows_batch(queries):
+    # 캐시에 없는 검색어만 모아 한 번에 검색하고, 결과는 검색어별로 캐시
+    version = get_index_version()
+    if version is None:
+        return _search_rows(queries) if queries else []
+    if len(queries) == 1:
+        # 한 건이면 같은 검색어 동시 요청이 한 번만 검색하도록 get_or_compute 사용
+        return [retrieval_cache.get_or_compute(_retrieval_key(version, queries[0]), lambda: _search_rows(queries)[0])]
+
+    results = [retrieval_cache.get(_retrieval_key(version, query)) for query in queries]
+    missing = list(dict.fromkeys(query for query, rows in zip(queries, results) if rows is None))
+    if missing:
+        found = dict(zip(missing, _search_rows(missing)))
+        for query, rows in found.items():
+            retrieval_cache.set(_retrieval_key(version, query), rows)
+        results = [found[query] if rows is None else rows for query, rows in zip(queries, results)]
+    return results
+
+def retrieve_documents(query, retriever=None):
+    from langchain.schema import Document
+
+    # 직접 넘긴 retriever 는 검색 조건이 다를 수 있으므로 캐시하지 않음
+    if retriever is not None:
+        return [doc for doc in retriever.get_relevant_documents(query) if doc.page_content.strip()]
+
+    rows = retrieve_rows_batch([query])[0]
+    return [Document(page_content=row["content"], metadata=row["metadata"]) for row in rows]
 
 # 3. Custom Prompt 생성
 template = r"""
@@ -57,35 +214,30 @@ template = r"""
 
 위 내용을 바탕으로 구체적이고 신뢰도 높은 답변을 작성하세요:
 """
-CUSTOM_PROMPT = PromptTemplate(template=template, input_variables=["context", "question"])
+_custom_prompt = None
 
-# 4. 질문 전처리 함수들
-def emphasize_keywords(question: str, keywords: list[str]) -> str:
-    for kw in keywords:
-        if kw in question:
-            question += f" {kw} 관련 정보 {kw} 분석"
-    return question
+def get_custom_prompt():
+    global _custom_prompt
+    if _custom_prompt is None:
+        from langchain.prompts import PromptTemplate
+        _custom_prompt = PromptTemplate(template=template, input_variables=["context", "question"])
+    return _custom_prompt
 
-def reformulate_for_search(question: str) -> str:
-    base_keywords = re.findall(r"[가-힣]+", question)
-    keywords = [kw for kw in base_keywords if len(kw) > 1]
-    return " ".join(keywords)
+# 4. 질문 전처리: 주소 사전 + 도메인 키워드로 컴파일한 파서를 프로세스당 한 번만 생성
+_question_parser = None
 
+def get_question_parser():
+    global _question_parser
+    if _question_parser is None:
+        address_rows = get_address_data()["DATA"]
+        with _data_lock:
+            if _question_parser is None:
+                _question_parser = QuestionParser(address_rows)
+    return _question_parser
+
+# 정규화된 검색어 (지역 + 의도 키워드 + 나머지 핵심어), 검색 캐시 키로도 사용
 def preprocess_question(question: str) -> str:
-    match = re.search(r"([가-힣]+동)", question)
-    dong_name = match.group(1) if match else ""
-
-    keywords = ["상권", "입지", "분석", "업종", "추천", "창업", "유동인구", "시간대", "연령대", "혼잡도"]
-    emphasized = emphasize_keywords(question, keywords)
-    reformatted = reformulate_for_search(emphasized)
-
-    if dong_name:
-        return f"""
-'{dong_name}' 지역에 대해 유동인구, 업종, 상권, 창업, 시간대 분석과 관련된 문서를 찾고자 합니다.
-핵심 키워드: {reformatted}
-원 질문: {question}
-"""
-    return f"{reformatted}\n\n원 질문: {question}"
+    return get_question_parser().parse(question).canonical
 
 # ✅ GPT 단독으로 답변할 질문 종류 (필요 시 활용)
 gpt_only_types = ["recommendation", "location_analysis"]
@@ -94,23 +246,36 @@ gpt_only_types = ["recommendation", "location_analysis"]
 def postprocess_response(text):
     return re.sub(r'(\d{2})(\d{2})시', r'\1~\2시', text)
 
+# ✅ LLM 생성 (timeout 은 요청 deadline 의 남은 예산으로 제한)
+def _chat_llm(timeout, model="gpt-4.1", **kwargs):
+    from langchain_community.chat_models import ChatOpenAI
+    return ChatOpenAI(model_name=model, temperature=0.7, request_timeout=timeout, max_retries=1, **kwargs)
+
+# 질문 / 경로 / 엔드포인트로 모델 등급을 골라 호출 (실제 API 호출만 등급별 통계에 기록)
+def _predict(prompt, question, path, route):
+    tier, model = route_model(question, path, route)
+
+    def call(timeout):
+        with track_llm_call(tier, model, route, path):
+            return _chat_llm(timeout, model).predict(prompt)
+
+    return llm_cache.get_or_compute(make_key(model, prompt), lambda: governed_call(route, prompt, call))
+
 # 5. RAG 수행 함수 (fallback 보장)
-def ask_rag(question, retriever=None, fallback_context="", force_gpt=False):
+def ask_rag(question, retriever=None, fallback_context="", force_gpt=False, route="ask_rag", chat_context=""):
+    # chat_context(분석 요약 등)는 프롬프트에만 붙이고, 모델 등급은 사용자 질문만 보고 고름
+    prompt = f"{chat_context}\n\n{question}" if chat_context else question
     if force_gpt:
-        llm = ChatOpenAI(model_name="gpt-4.1", temperature=0.7)
-        response = llm.predict(question)
+        response = _predict(prompt, question, "forced", route)
         return f"\U0001F4A1 GPT 단독 응답\n\n{response}"
 
-    if retriever is None:
-        retriever = get_retriever()
-
-    preprocessed = preprocess_question(question)
+    preprocessed = preprocess_question(prompt)
     try:
-        docs = retriever.get_relevant_documents(preprocessed)
+        docs = retrieve_documents(preprocessed, retriever)
     except Exception as e:
+        logger.warning("retrieval failed: %s", e)
         docs = []
 
-    docs = [doc for doc in docs if doc.page_content.strip()]
     is_rag = bool(docs)
 
     if is_rag:
@@ -121,36 +286,85 @@ def ask_rag(question, retriever=None, fallback_context="", force_gpt=False):
         context = ""
 
     if not context.strip():
-        llm = ChatOpenAI(model_name="gpt-4.1", temperature=0.7)
-        response = llm.predict(preprocessed)
+        response = _predict(prompt, question, "no_context", route)
         return f"\U0001F4A1 GPT 단독 추론 응답 (문서/컨텍스트 없음)\n\n{response}"
 
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=ChatOpenAI(model_name="gpt-4.1", temperature=0.7),
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": CUSTOM_PROMPT}
-    )
+    path = "rag" if is_rag else "fallback_context"
+    tier, model = route_model(question, path, route)
+
+    # 이미 찾은 문서(또는 fallback 컨텍스트)를 그대로 프롬프트에 넣음 (체인이 다시 검색하지 않도록)
+    if not is_rag:
+        from langchain.schema import Document
+        docs = [Document(page_content=context)]
+
+    def run_chain(timeout):
+        from langchain.chains.question_answering import load_qa_chain
+
+        qa_chain = load_qa_chain(_chat_llm(timeout, model), chain_type="stuff", prompt=get_custom_prompt())
+        with track_llm_call(tier, model, route, path):
+            return qa_chain({"input_documents": docs, "question": prompt})
 
-    result = qa_chain({"query": question, "context": context})
-    response_text = postprocess_response(result["result"])
+    result = governed_call(route, context + prompt, run_chain)
+    response_text = postprocess_response(result["output_text"])
     source_type = "\U0001F50D 문서 기반 응답 (RAG)" if is_rag else "\U0001F4A1 GPT 추론 응답 (Fallback Context)"
     return f"{source_type}\n\n{response_text}"
 
 # 6. 유사 업종 수 추정
+# 로컬 경쟁 점포 인덱스에 이 동 / 업종이 수집돼 있으면 동 중심 반경 SIMILAR_BUSINESS_RADIUS_M 안의 점포 수를 바로 계산하고,
+# 아직 없으면 크롤러에 수집을 요청한 뒤 카카오 키워드 검색의 total_count 로 대신합니다.
+SIMILAR_BUSINESS_RADIUS_M = float(os.environ.get("SIMILAR_BUSINESS_RADIUS_M", "500"))
+
+def kakao_get(url, params):
+    headers = {"Authorization": f"KakaoAK {os.environ['KAKAO_REST_API_KEY']}"}
+
+    def fetch(timeout):
+        res = get_http_session().get(url, headers=headers, params=params, timeout=timeout)
+        res.raise_for_status()
+        return res.json()
+
+    return call_upstream("kakao", fetch)
+
+def count_competitors(gu, dong, business_type, radius_m=SIMILAR_BUSINESS_RADIUS_M):
+    # 수집 반경 밖 점포는 인덱스에 없을 수 있으므로 수집 반경까지만 셈
+    radius_m = min(radius_m, COMPETITOR_CRAWL_RADIUS_M)
+    index = get_competitor_index()
+    location = index.centroid(gu, dong)
+    crawled_at = index.crawled_at(gu, dong, business_type)
+    if location is None or crawled_at is None:
+        request_crawl(gu, dong, business_type)
+        return None
+    count = index.count(*location, radius_m, category=business_type.strip())
+    truncated = index.is_truncated(gu, dong, business_type)
+    # 수집이 검색 한도에 걸렸으면 실제 점포 수는 이보다 많음
+    at_least = " 이상" if truncated else ""
+    desc = f"'{gu} {dong}' 중심 반경 {radius_m:.0f}m 안의 '{business_type}' 점포는 {count}곳{at_least}으로 확인됩니다."
+    return {"description": desc, "count": count, "radius_m": radius_m, "source": "local_index",
+            "crawled_at": int(crawled_at), "truncated": truncated}
+
 def get_similar_business_info_rag(gu, dong, business_type):
+    try:
+        local = count_competitors(gu, dong, business_type)
+        if local is not None:
+            return local
+    except Exception as e:
+        logger.warning("competitor index unavailable: %s", e)
+
     query = f"{gu} {dong} {business_type}"
     try:
-        headers = {"Authorization": f"KakaoAK {os.environ['KAKAO_REST_API_KEY']}"}
         url = f"https://dapi.kakao.com/v2/local/search/keyword.json?query={urllib.parse.quote(query)}"
-        res = requests.get(url, headers=headers, timeout=10)
-        data = res.json()
+        headers = {"Authorization": f"KakaoAK {os.environ['KAKAO_REST_API_KEY']}"}
+
+        def fetch(timeout):
+            res = get_http_session().get(url, headers=headers, timeout=timeout)
+            res.raise_for_status()
+            return res.json()
+
+        data = kakao_cache.get_or_compute(query, lambda: call_upstream("kakao", fetch, fallback_key=query, mark_fallback=True))
         count = data.get("meta", {}).get("total_count", 0)
         desc = f"카카오 API 기준 '{query}' 관련 업종 수는 약 {count}건으로 확인됩니다."
-        return {"description": desc, "count": count}
+        return {"description": desc, "count": count, "source": "kakao_search"}
     except Exception as e:
-        return {"description": f"카카오 API 호출 오류: {e}", "count": 0}
+        return {"description": f"카카오 API 호출 오류: {e}", "count": 0, "source": "error"}
 
 # 7. 유망 업종 추천 (GPT 강제)
 def get_rag_business_recommendation(gu, dong, population, estate_data):
@@ -166,7 +380,7 @@ def get_rag_business_recommendation(gu, dong, population, estate_data):
 """
 
     question = f"{gu} {dong} 지역의 상권 데이터를 바탕으로 유망한 창업 업종을 추천하고, 그 이유를 구체적으로 설명해주세요."
-    return ask_rag(question, fallback_context=fallback_context, force_gpt=True)
+    return ask_rag(question, fallback_context=fallback_context, force_gpt=True, route="recommend_business")
 
 # 8. 입지 분석 (GPT 강제)
 def get_location_analysis_with_rag(gu, dong, item, population, estate_data, similar_desc):
@@ -183,7 +397,61 @@ def get_location_analysis_with_rag(gu, dong, item, population, estate_data, simi
 """
 
     question = f"{gu} {dong} 지역에서 '{item}' 업종의 창업 가능성을 분석해주세요."
-    return ask_rag(question, fallback_context=fallback_context, force_gpt=True)
+    return ask_rag(question, fallback_context=fallback_context, force_gpt=True, route="location_analysis")
+
+# 8-1. 추천 + 입지 분석 통합 (GPT 1회 호출, JSON 응답)
+COMBINED_ANALYSIS_TEMPLATE = """
+서울시 {gu} {dong} 지역의 창업 분석을 요청합니다.
+- 분석 업종: '{item}'
+- 유동인구: {pop}명
+- 최근 부동산 거래 건수: {deals}건
+- 유사 업종 정보: {similar_desc}
+
+아래 두 가지를 작성하고, 반드시 다음 키를 가진 JSON 객체 하나로만 답하세요.
+{{"recommendation": "...", "location_analysis": "..."}}
+
+1. recommendation: 이 지역의 상권 데이터를 바탕으로 유망한 창업 업종을 추천하고, 그 이유를 구체적으로 설명
+2. location_analysis: '{item}' 업종이 이 지역에서 창업하기에 적합한지 유동인구, 거래 건수, 경쟁 업종을 근거로 구체적으로 평가
+"""
+
+def parse_combined_analysis(text):
+    text = text.strip()
+    # ```json ... ``` 코드 블록으로 감싸서 오는 경우 제거
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.index("{"):] if "{" in text else text
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("combined analysis is not a JSON object")
+    result = {}
+    for key in ("recommendation", "location_analysis"):
+        value = data.get(key)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"combined analysis missing '{key}'")
+        result[key] = value.strip()
+    return result
+
+def get_combined_market_analysis(gu, dong, item, population, estate_data, similar_desc):
+    pop = population.get("PSNG_NO", "정보 없음") if population else "정보 없음"
+    deals = len(estate_data) if estate_data else 0
+    prompt = COMBINED_ANALYSIS_TEMPLATE.format(gu=gu, dong=dong, item=item, pop=pop, deals=deals, similar_desc=similar_desc)
+
+    tier, model = route_model(prompt, "combined", "analyze_market")
+
+    def call(timeout):
+        llm = _chat_llm(timeout, model, model_kwargs={"response_format": {"type": "json_object"}})
+        with track_llm_call(tier, model, "analyze_market", "combined"):
+            return llm.predict(prompt)
+
+    # 파싱 실패는 업스트림 장애가 아니므로 서킷 밖에서 검증하고, 검증에 성공한 결과만 캐시
+    result = llm_cache.get_or_compute(
+        make_key(model, "combined", prompt),
+        lambda: parse_combined_analysis(governed_call("analyze_market", prompt, call))
+    )
+    return {
+        "recommendation": f"\U0001F4A1 GPT 단독 응답\n\n{result['recommendation']}",
+        "location_analysis": f"\U0001F4A1 GPT 단독 응답\n\n{result['location_analysis']}"
+    }
 
 # 9. 자유 질의 (RAG)
 def ask_chat_with_rag(user_input, analyzed_context):
@@ -203,100 +471,281 @@ def ask_chat_with_rag(user_input, analyzed_context):
 - 추천 업종: {analyzed_context.get('recommendation', '정보 없음')}
 - 입지 분석: {analyzed_context.get('location_analysis', '정보 없음')}
 """
-    return ask_rag(context + "\n\n" + user_input)
+    return ask_rag(user_input, route="chat", chat_context=context)
 
 # 부동산 거래 데이터 조회 관련 설정 및 함수
 REAL_ESTATE_API = "http://apis.data.go.kr/1613000/RTMSDataSvcNrgTrade/getRTMSDataSvcNrgTrade"
-REAL_ESTATE_KEY = os.environ["REAL_ESTATE_KEY"]
-POPULATION_API_KEY = os.environ["POPULATION_API_KEY"]
-POPULATION_API = f"http://openapi.seoul.go.kr:8088/{POPULATION_API_KEY}/json/tpssPassengerCnt/1/1000"
+# 구 × 월 응답을 totalCount 까지 페이지로 나눠 받음 (페이지마다 업스트림 호출 1회)
+REAL_ESTATE_PAGE_ROWS = int(os.environ.get("REAL_ESTATE_PAGE_ROWS", "1000"))
+REAL_ESTATE_MAX_PAGES = int(os.environ.get("REAL_ESTATE_MAX_PAGES", "10"))
+POPULATION_API_TEMPLATE = "http://openapi.seoul.go.kr:8088/{key}/json/tpssPassengerCnt/1/1000"
 
-# 지역 코드 매핑 로드
-with open("real_estate.json", "r", encoding="utf-8") as f:
-    gu_code_map = json.load(f)
+# ✅ 필수 환경 변수 (import 시점이 아니라 앱 시작 시점에 검증)
+REQUIRED_ENV_VARS = [
+    "OPENAI_API_KEY",
+    "WEAVIATE_URL",
+    "WEAVIATE_API_KEY",
+    "KAKAO_REST_API_KEY",
+    "REAL_ESTATE_KEY",
+    "POPULATION_API_KEY",
+]
 
-# 주소 마스터 데이터 로드
-with open("address_master.json", "r", encoding="utf-8") as f:
-    address_data = json.load(f)
+def validate_config():
+    missing = [name for name in REQUIRED_ENV_VARS if not os.environ.get(name)]
+    if missing:
+        raise RuntimeError(f"필수 환경 변수가 설정되지 않았습니다: {', '.join(missing)}")
 
-def get_real_estate_by_dong(gu, dong):
-    lawd_cd = gu_code_map.get(gu)
-    if not lawd_cd:
-        return []
-    now = datetime.now()
-    results = []
-    for i in range(6):
-        yyyymm = (now.replace(day=1) - pd.DateOffset(months=i)).strftime("%Y%m")
+def get_real_estate_key():
+    return os.environ["REAL_ESTATE_KEY"]
+
+def get_population_api():
+    return POPULATION_API_TEMPLATE.format(key=os.environ["POPULATION_API_KEY"])
+
+# 지역 코드 매핑 / 주소 마스터 데이터 (처음 사용할 때 로드)
+_data_lock = threading.Lock()
+_gu_code_map = None
+_address_data = None
+
+def get_gu_code_map():
+    global _gu_code_map
+    if _gu_code_map is None:
+        with _data_lock:
+            if _gu_code_map is None:
+                with open("real_estate.json", "r", encoding="utf-8") as f:
+                    _gu_code_map = json.load(f)
+    return _gu_code_map
+
+def get_address_data():
+    global _address_data
+    if _address_data is None:
+        with _data_lock:
+            if _address_data is None:
+                with open("address_master.json", "r", encoding="utf-8") as f:
+                    _address_data = json.load(f)
+    return _address_data
+
+# 실거래가 응답은 구 × 월 단위이므로 구 전체 거래를 (umdNm, Deal) 로 한 번에 캐시하고 동 필터는 메모리에서 적용
+def _fetch_real_estate_month(gu, lawd_cd, yyyymm):
+    def fetch_page(page):
         params = {
-            "serviceKey": REAL_ESTATE_KEY,
+            "serviceKey": get_real_estate_key(),
             "LAWD_CD": lawd_cd,
             "DEAL_YMD": yyyymm,
-            "pageNo": "1",
-            "numOfRows": "100",
+            "pageNo": str(page),
+            "numOfRows": str(REAL_ESTATE_PAGE_ROWS),
             "type": "xml"
         }
+
+        def fetch(timeout):
+            # HTTP 오류 / resultCode 오류는 예외로 (거래 0건으로 캐시 / 집계하지 않도록)
+            res = get_http_session().get(REAL_ESTATE_API, params=params, timeout=timeout, stream=True)
+            if res.status_code != 200:
+                res.close()
+                res.raise_for_status()
+            meta = {}
+            umd_deals = list(iter_umd_deals_from_response(res, meta))
+            return umd_deals, meta.get("totalCount", len(umd_deals))
+
+        # 실패 / 서킷 open 시 같은 페이지의 마지막 정상 응답으로 대체
+        return call_upstream("real_estate", fetch, fallback_key=(lawd_cd, yyyymm, page), mark_fallback=True)
+
+    def compute():
+        # 한 페이지라도 마지막 정상 응답(LastGood)으로 대체했으면 캐시 / 집계에 다시 넣지 않음
+        first = fetch_page(1)
+        stale = isinstance(first, LastGood)
+        umd_deals, total = first.value if stale else first
+        page_count = -(-total // REAL_ESTATE_PAGE_ROWS)
+        if page_count > REAL_ESTATE_MAX_PAGES:
+            logger.warning("real estate %s %s: %d deals, reading first %d pages only", lawd_cd, yyyymm, total,
+                           REAL_ESTATE_MAX_PAGES, extra={"upstream": "real_estate"})
+        umd_deals = list(umd_deals)
+        for page in range(2, min(page_count, REAL_ESTATE_MAX_PAGES) + 1):
+            result = fetch_page(page)
+            if isinstance(result, LastGood):
+                stale, result = True, result.value
+            umd_deals.extend(result[0])
+        if stale:
+            return LastGood(umd_deals)
+        ingest_estate_trend(gu, yyyymm, umd_deals)
+        return umd_deals
+
+    return estate_cache.get_or_compute(make_key(lawd_cd, yyyymm), compute)
+
+def get_real_estate_by_dong(gu, dong, failed_months=None):
+    lawd_cd = get_gu_code_map().get(gu)
+    if not lawd_cd:
+        return []
+    # 6개월치를 동시에 조회하고, 실패한 달은 건너뛰어 부분 결과라도 반환 (failed_months 에 실패한 달 기록)
+    futures = {yyyymm: fan_out(_fetch_real_estate_month, gu, lawd_cd, yyyymm) for yyyymm in recent_months(6)}
+    results = []
+    for yyyymm, future in futures.items():
         try:
-            res = requests.get(REAL_ESTATE_API, params=params, timeout=10)
-            root = ET.fromstring(res.content)
-            items = root.find("body/items")
-            if items is not None:
-                for item in items.findall("item"):
-                    umd = item.findtext("umdNm", default="N/A")
-                    if dong in umd:
-                        results.append({
-                            "dealAmount": item.findtext("dealAmount", "N/A"),
-                            "dealYear": int(item.findtext("dealYear", "0")),
-                            "dealMonth": int(item.findtext("dealMonth", "0")),
-                            "dealDay": int(item.findtext("dealDay", "0")),
-                            "buildingType": item.findtext("buildingType", "N/A")
-                        })
+            results.extend(filter_dong(future.result(), dong))
         except Exception as e:
-            print("[ERROR] 부동산 API 오류:", e)
-            continue
-    results.sort(key=lambda x: (x["dealYear"], x["dealMonth"], x["dealDay"]), reverse=True)
-    return results[:30]
+            logger.error("부동산 API 오류: %s", e, extra={"upstream": "real_estate", "gu": gu, "yyyymm": yyyymm})
+            if failed_months is not None:
+                failed_months.append(yyyymm)
+    return sort_recent(results, 30)
+
+# ✅ 동 × 월 거래가 누적 집계 (구별 GuTrend 를 공유 캐시에 두고 새 응답이 올 때마다 그 달 집계를 갱신)
+ESTATE_TREND_TTL_SEC = float(os.environ.get("ESTATE_TREND_TTL_SEC", str(90 * 86400)))
+ESTATE_TREND_MAX_MONTHS = int(os.environ.get("ESTATE_TREND_MAX_MONTHS", "36"))
+# 집계가 없는 달을 다시 채우러 가기 전 최소 간격 (같은 달을 요청마다 조회하지 않도록)
+ESTATE_TREND_BACKFILL_RETRY_SEC = float(os.environ.get("ESTATE_TREND_BACKFILL_RETRY_SEC", "600"))
+estate_trend_cache = TwoTierCache("estate_trend", ESTATE_TREND_TTL_SEC)
+
+def ingest_estate_trend(gu, yyyymm, umd_deals):
+    from estate_trend import GuTrend
+
+    # 조회 가능한 기간(ESTATE_TREND_MAX_MONTHS)보다 오래된 달은 쌓지 않고 지움
+    oldest = recent_months(ESTATE_TREND_MAX_MONTHS)[-1]
+    if yyyymm < oldest:
+        return
 
-def get_passenger_info_by_dong(gu, dong):
+    def apply(trend):
+        trend = trend or GuTrend(gu)
+        new_month = not trend.has_month(yyyymm)
+        pruned = trend.prune(oldest)
+        if trend.ingest(yyyymm, umd_deals) or new_month or pruned:
+            return trend
+        return None
+
+    try:
+        estate_trend_cache.update(gu, apply)
+    except Exception as e:
+        # 집계 실패가 거래 조회를 막지 않도록
+        logger.warning("estate trend ingest failed: %s", e, extra={"gu": gu, "yyyymm": yyyymm})
+
+# 백필은 요청 경로가 쓰는 fan-out 풀을 쓰지 않고 작업 스레드 하나에서 한 달씩 순서대로 조회합니다.
+# 실거래가 API 호출은 분당 ESTATE_BACKFILL_PER_MINUTE 회, 하루 ESTATE_BACKFILL_DAILY_QUOTA 회(워커 전체 합계)까지만 사용
+ESTATE_BACKFILL_PER_MINUTE = float(os.environ.get("ESTATE_BACKFILL_PER_MINUTE", "20"))
+ESTATE_BACKFILL_DAILY_QUOTA = int(os.environ.get("ESTATE_BACKFILL_DAILY_QUOTA", "500"))
+estate_backfill_usage = TwoTierCache("estate_backfill_usage", 2 * 86400)
+
+_trend_backfill_requested = {}
+_estate_backfill_job_id = None
+
+def _estate_backfill_job(payload, report):
+    lawd_codes = get_gu_code_map()
+    tasks = [(gu, yyyymm) for gu, months in payload["months"].items() for yyyymm in months]
+    interval = 60.0 / ESTATE_BACKFILL_PER_MINUTE if ESTATE_BACKFILL_PER_MINUTE > 0 else 0.0
+    today = date.today().isoformat()
+    failed = skipped = 0
+    next_at = 0.0
+    for i, (gu, yyyymm) in enumerate(tasks):
+        if (estate_backfill_usage.get(today) or 0) >= ESTATE_BACKFILL_DAILY_QUOTA:
+            skipped = len(tasks) - i
+            logger.warning("estate backfill: daily quota used up, %d months left", skipped)
+            break
+        time.sleep(max(0.0, next_at - time.monotonic()))
+        with record_upstream_calls() as calls:
+            try:
+                _fetch_real_estate_month(gu, lawd_codes[gu], yyyymm)
+            except Exception as e:
+                failed += 1
+                logger.warning("estate backfill failed: %s", e, extra={"gu": gu, "yyyymm": yyyymm})
+        # 캐시에서 바로 채운 달은 호출 수가 0 이라 쉬지 않음
+        if calls:
+            estate_backfill_usage.update(today, lambda used: (used or 0) + len(calls))
+            next_at = time.monotonic() + interval * len(calls)
+        report("fetching", {"done": i + 1, "total": len(tasks)})
+    return {"months": len(tasks), "failed": failed, "skipped": skipped}
+
+def request_estate_backfill(missing):
+    # missing: {gu: [yyyymm, ...]}, 최근에 요청한 달은 빼고 낮은 우선순위 작업 하나로 제출
+    # 이 프로세스의 백필 작업이 아직 대기 / 실행 중이면 새로 제출하지 않고 그 작업을 반환 (작업 스레드를 여러 개 잡지 않도록)
+    global _estate_backfill_job_id
+    if _estate_backfill_job_id is not None:
+        running = jobs.get(_estate_backfill_job_id)
+        if running is not None and running["status"] in ("queued", "running"):
+            return _estate_backfill_job_id
+    now = time.monotonic()
+    months = {}
+    for gu, gu_months in missing.items():
+        due = [m for m in gu_months if now - _trend_backfill_requested.get((gu, m), -ESTATE_TREND_BACKFILL_RETRY_SEC) >= ESTATE_TREND_BACKFILL_RETRY_SEC]
+        if due:
+            months[gu] = due
+    if not months:
+        return None
+    try:
+        job_id = jobs.submit("estate_backfill", _estate_backfill_job, {"months": months}, "low")
+    except QueueFull:
+        return None
+    _estate_backfill_job_id = job_id
+    for gu, gu_months in months.items():
+        for m in gu_months:
+            _trend_backfill_requested[(gu, m)] = now
+    return job_id
+
+# 유동인구 API 는 동과 상관없이 같은 응답이므로 DONG_ID → 행 인덱스로 만들어 캐시
+def _fetch_population_rows():
+    def fetch(timeout):
+        res = get_http_session().get(get_population_api(), timeout=timeout)
+        logger.debug("Population API status code: %s", res.status_code)
+        res.raise_for_status()
+        return res.json()
+
+    data = call_upstream("population", fetch, fallback_key="tpssPassengerCnt", mark_fallback=True)
+    stale = isinstance(data, LastGood)
+    if stale:
+        data = data.value
+    # 전체 응답 덤프는 디버그 레벨에서도 일부 요청만 기록
+    logger.debug("Population API response: %s", data, extra={"sample_rate": DEBUG_SAMPLE_RATE})
+    population_data = data.get("tpssPassengerCnt") if data else None
+    if not population_data:
+        raise ValueError("'tpssPassengerCnt' key not found in population API response")
+    rows = population_data.get("row", [])
+    logger.debug("Found %d rows in population data", len(rows))
+    debug_rows = logger.isEnabledFor(logging.DEBUG)
+    rows_by_dong = {}
+    for row in rows:
+        current_dong_id = row.get("DONG_ID", "").strip()
+        if debug_rows:
+            logger.debug("Row dong_id: %s", current_dong_id, extra={"sample_rate": DEBUG_SAMPLE_RATE})
+        rows_by_dong.setdefault(current_dong_id, row)
+    return LastGood(rows_by_dong) if stale else rows_by_dong
+
+def get_population_rows():
+    return population_cache.get_or_compute("tpssPassengerCnt", _fetch_population_rows)
+
+# 동 × 24시간 유동인구 배열 (원본 행과 같은 TTL 로 캐시, numpy 는 처음 사용할 때 import)
+def get_population_profiles():
+    from population_profiles import PopulationProfiles
+    return population_cache.get_or_compute(
+        "tpssPassengerCnt:profiles",
+        lambda: PopulationProfiles.from_rows(get_population_rows(), get_address_data()["DATA"])
+    )
+
+def get_passenger_info_by_dong(gu, dong, raise_errors=False):
     target_id = None
     # address_data 내에서 gu와 dong 비교 시 양쪽 문자열의 공백 제거 및 gu는 소문자로 비교
-    for entry in address_data["DATA"]:
+    for entry in get_address_data()["DATA"]:
         entry_gu = entry.get("cgg_nm", "").strip().lower()
         entry_dong = entry.get("dong_nm", "").strip()
         candidate_id = entry.get("dong_id", "").strip()
         if entry_gu == gu.strip().lower() and entry_dong == dong.strip():
             if len(candidate_id) == 8:
                 target_id = candidate_id
-                print(f"[DEBUG] Found dong_id: {target_id} for gu='{gu}', dong='{dong}'")
+                logger.debug("Found dong_id %s for gu=%s dong=%s", target_id, gu, dong)
                 break
 
     if not target_id:
-        print(f"[DEBUG] No matching dong_id found for gu='{gu}', dong='{dong}'")
+        logger.info("No matching dong_id found for gu=%s dong=%s", gu, dong)
         return None
 
     try:
-        res = requests.get(POPULATION_API, timeout=10)
-        print("DEBUG: Population API status code:", res.status_code)
-        if res.status_code == 200:
-            data = res.json()
-            print("DEBUG: Population API response:", data)
-            population_data = data.get("tpssPassengerCnt")
-            if not population_data:
-                print("[DEBUG] 'tpssPassengerCnt' key not found in API response")
-                return None
-            rows = population_data.get("row", [])
-            print(f"[DEBUG] Found {len(rows)} rows in population data")
-            for row in rows:
-                current_dong_id = row.get("DONG_ID", "").strip()
-                print(f"[DEBUG] Row dong_id: {current_dong_id}")
-                if current_dong_id == target_id:
-                    print("[DEBUG] Matching row found:", row)
-                    return row
-            print("[DEBUG] No matching row found for dong_id:", target_id)
-        else:
-            print(f"[DEBUG] Population API returned status code: {res.status_code}")
+        rows_by_dong = get_population_rows()
     except Exception as e:
-        print("[ERROR] Population API error:", e)
-    return None
+        logger.error("Population API error: %s", e, extra={"upstream": "population"})
+        if raise_errors:
+            raise
+        return None
+    row = rows_by_dong.get(target_id)
+    if row is None:
+        logger.info("No matching population row for dong_id %s", target_id)
+        return None
+    logger.debug("Matching row found: %s", row)
+    return row
 
 
 def evaluate_suitability(pop, estate_data, similar_count):
@@ -309,8 +758,8 @@ def evaluate_suitability(pop, estate_data, similar_count):
         pass
     try:
         if estate_data:
-            recent = [int(x["dealAmount"].replace(",", "")) for x in estate_data if x["dealAmount"] != "N/A"]
-            if recent and sum(recent)/len(recent) < 120000:
+            avg = mean_price(estate_data)
+            if avg is not None and avg < 120000:
                 score += 1
     except:
         pass
@@ -323,26 +772,129 @@ def evaluate_suitability(pop, estate_data, similar_count):
     else:
         return "❌ 다소 불리한 입지입니다."
 
-def analyze_market(gu, dong, item, get_similar_business_info_rag, get_rag_business_recommendation, get_location_analysis_with_rag):
-    estate = get_real_estate_by_dong(gu, dong)
-    pop = get_passenger_info_by_dong(gu, dong)
-    similar = get_similar_business_info_rag(gu, dong, item)
+# ✅ /analyze_market 전체 시간 예산 (초): 이 안에 끝나지 않은 항목은 부분 결과로 응답
+ANALYZE_MARKET_DEADLINE_SEC = float(os.environ.get("ANALYZE_MARKET_DEADLINE_SEC", "30"))
+ANALYZE_COMBINED_LLM = os.environ.get("ANALYZE_COMBINED_LLM", "1") != "0"
+LLM_UNAVAILABLE_MESSAGE = "⏱️ GPT 응답이 지연되어 이번 분석에서는 생략되었습니다. 잠시 후 다시 시도해주세요."
+
+def _result_or(future, default, name, degraded=None):
+    # 실패 / 시간 초과 시 default 로 대체하고 degraded 에 name 기록 (대체값이 들어간 결과는 캐시하지 않음)
+    try:
+        if future.done():
+            return future.result()
+        # 남은 시간 예산만큼 대기 (비동기 작업은 JOB_DEADLINE_SEC 까지)
+        return future.result(timeout=time_budget(remaining() or ANALYZE_MARKET_DEADLINE_SEC))
+    except Exception as e:
+        logger.warning("analyze_market: %s 생략 (%s)", name, e)
+        future.cancel()
+        if degraded is not None:
+            degraded.append(name)
+        return default
+
+def analyze_market(gu, dong, item, get_similar_business_info_rag, get_rag_business_recommendation, get_location_analysis_with_rag, progress=None):
+    # 서로 독립적인 업스트림 조회는 동시에 실행
+    degraded = []
+    failed_months = []
+    estate_f = fan_out(get_real_estate_by_dong, gu, dong, failed_months=failed_months)
+    pop_f = fan_out(get_passenger_info_by_dong, gu, dong, raise_errors=True)
+    similar_f = fan_out(get_similar_business_info_rag, gu, dong, item)
+    estate = _result_or(estate_f, [], "estate", degraded)
+    if failed_months and "estate" not in degraded:
+        degraded.append("estate")
+    pop = _result_or(pop_f, None, "population", degraded)
+    similar = _result_or(similar_f, {"description": "카카오 API 응답 지연", "count": 0}, "similar", degraded)
+    if similar.get("source") == "error":
+        degraded.append("similar")
     score = evaluate_suitability(pop, estate, similar["count"])
-    recommendation = get_rag_business_recommendation(gu, dong, pop, estate)
-    location_analysis = get_location_analysis_with_rag(gu, dong, item, pop, estate, similar["description"])
+    if progress is not None:
+        # 비동기 작업: GPT 분석 전에 데이터 조회 결과를 먼저 공개
+        progress("fetched", {"gu": gu, "dong": dong, "item": item, "population": pop,
+                             "estate": deals_to_dicts(estate), "similar": similar, "score": score})
+
+    # 통합 모드: 추천 + 입지 분석을 GPT 1회 호출로 받고, JSON 파싱 실패 시 기존 2회 호출로 대체
+    combined = None
+    if ANALYZE_COMBINED_LLM:
+        combined_f = fan_out(get_combined_market_analysis, gu, dong, item, pop, estate, similar["description"])
+        combined = _result_or(combined_f, None, "combined_analysis")
+
+    if combined:
+        recommendation = combined["recommendation"]
+        location_analysis = combined["location_analysis"]
+    else:
+        recommendation_f = fan_out(get_rag_business_recommendation, gu, dong, pop, estate)
+        location_f = fan_out(get_location_analysis_with_rag, gu, dong, item, pop, estate, similar["description"])
+        recommendation = _result_or(recommendation_f, LLM_UNAVAILABLE_MESSAGE, "recommendation", degraded)
+        location_analysis = _result_or(location_f, LLM_UNAVAILABLE_MESSAGE, "location_analysis", degraded)
 
     return {
         "gu": gu,
         "dong": dong,
         "item": item,
         "population": pop,
-        "estate": estate,
+        "estate": deals_to_dicts(estate),
         "similar": similar,
         "score": score,
         "recommendation": recommendation,
-        "location_analysis": location_analysis
+        "location_analysis": location_analysis,
+        "degraded": degraded
     }
 
+# ✅ analyze_market 결과 캐시 (입력 데이터는 하루 단위로 바뀌므로 soft TTL 이후엔 백그라운드 갱신)
+ANALYZE_CACHE_SOFT_TTL_SEC = float(os.environ.get("ANALYZE_CACHE_SOFT_TTL_SEC", "3600"))
+ANALYZE_CACHE_HARD_TTL_SEC = float(os.environ.get("ANALYZE_CACHE_HARD_TTL_SEC", "86400"))
+
+# 비동기 작업 / 미리 계산은 동기 요청보다 긴 시간 예산을 줌
+JOB_DEADLINE_SEC = float(os.environ.get("JOB_DEADLINE_SEC", "120"))
+
+_analyze_cache = StaleWhileRevalidateCache(ANALYZE_CACHE_SOFT_TTL_SEC, ANALYZE_CACHE_HARD_TTL_SEC, name="analyze_market")
+
+def _run_analyze_market(gu, dong, item, progress=None, deadline=ANALYZE_MARKET_DEADLINE_SEC):
+    with deadline_scope(deadline):
+        return analyze_market(gu, dong, item, get_similar_business_info_rag, get_rag_business_recommendation,
+                              get_location_analysis_with_rag, progress=progress)
+
+# 조회 / GPT 결과 중 하나라도 대체값이 들어간 부분 결과는 캐시하지 않음
+def _is_complete_analysis(result):
+    return not result.get("degraded")
+
+def get_analyze_market_cached(gu, dong, item, progress=None, deadline=ANALYZE_MARKET_DEADLINE_SEC):
+    # progress 는 이번 요청(작업)에서 직접 계산할 때만 사용, stale 값의 백그라운드 갱신은 요청이 끝난 뒤에도 돌기 때문에 넘기지 않음
+    return _analyze_cache.get(
+        (gu, dong, item),
+        lambda: _run_analyze_market(gu, dong, item, progress=progress, deadline=deadline),
+        cacheable=_is_complete_analysis,
+        refresh=lambda: _run_analyze_market(gu, dong, item, deadline=deadline)
+    )
+
+# ✅ 인기 (구, 동, 업종) 분석 결과를 한가한 시간대에 미리 계산 (부동산 / 유동인구 / 카카오 / LLM 캐시도 함께 채워짐)
+def _prefetch_analyze_market(key):
+    gu, dong, item = key
+    refreshed = _analyze_cache.refresh(
+        key,
+        lambda: _run_analyze_market(gu, dong, item, deadline=JOB_DEADLINE_SEC),
+        cacheable=_is_complete_analysis
+    )
+    return refreshed is not None and _is_complete_analysis(refreshed[0])
+
+analyze_prefetcher = Prefetcher(
+    "analyze_market", _prefetch_analyze_market, _analyze_cache.age, ANALYZE_CACHE_SOFT_TTL_SEC,
+    key_fields=("gu", "dong", "item")
+)
+
+# ✅ 비동기 분석 작업: 요청은 작업 ID 만 받고, 결과는 GET /jobs/<id> 로 조회
+# 동기 요청보다 긴 시간 예산을 주어 GPT 응답이 늦어도 완전한 결과를 만들 수 있게 합니다
+
+jobs = JobQueue("jobs")
+
+def _analyze_market_job(payload, report):
+    # high 우선순위 작업만 동기 요청과 같은 순서로, 나머지는 OpenAI 대기열에서 대화형 요청 뒤로
+    priority = None if payload.get("priority") == "high" else BACKGROUND_PRIORITY
+    with llm_priority(priority):
+        result, meta = get_analyze_market_cached(payload["gu"], payload["dong"], payload["item"],
+                                                 progress=report, deadline=JOB_DEADLINE_SEC)
+    analyze_prefetcher.observe((payload["gu"], payload["dong"], payload["item"]), meta)
+    return {**result, "meta": meta}
+
 @app.route('/ask_rag', methods=['POST'])
 def ask_rag_endpoint():
     data = request.get_json()
@@ -351,6 +903,32 @@ def ask_rag_endpoint():
     response = ask_rag(question, force_gpt=force_gpt)
     return jsonify({"response": response})
 
+# ✅ 여러 질문의 관련 문서를 한 번에 검색 (배치 분석 / 통합 프롬프트용)
+RAG_BATCH_MAX_QUERIES = int(os.environ.get("RAG_BATCH_MAX_QUERIES", "20"))
+
+@app.route('/search_documents', methods=['POST'])
+def search_documents():
+    data = request.get_json(silent=True) or {}
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) for q in questions):
+        return jsonify({"error": "questions must be a non-empty list of strings."}), 400
+    if len(questions) > RAG_BATCH_MAX_QUERIES:
+        return jsonify({"error": f"at most {RAG_BATCH_MAX_QUERIES} questions per request."}), 400
+    queries = [preprocess_question(q) for q in questions]
+    try:
+        results = retrieve_rows_batch(queries)
+    except Exception as e:
+        logger.warning("batch retrieval failed: %s", e)
+        return jsonify({"error": "document search unavailable."}), 503
+    return jsonify({"results": [
+        {
+            "question": question,
+            "query": query,
+            "documents": [{"content": row["content"], "distance": row["metadata"].get("distance")} for row in rows]
+        }
+        for question, query, rows in zip(questions, queries, results)
+    ]})
+
 @app.route('/similar_business_info', methods=['GET'])
 def similar_business_info_endpoint():
     gu = request.args.get('gu')
@@ -361,6 +939,48 @@ def similar_business_info_endpoint():
     response = get_similar_business_info_rag(gu, dong, business_type)
     return jsonify(response)
 
+@app.route('/competitors', methods=['GET'])
+def competitors_endpoint():
+    # 예) ?gu=강남구&dong=역삼1동&category=카페&radius=300 (category 없으면 반경 안 카테고리별 점포 수)
+    gu = request.args.get('gu')
+    dong = request.args.get('dong')
+    category = request.args.get('category')
+    if not all([gu, dong]):
+        return jsonify({"error": "gu and dong parameters are required."}), 400
+    try:
+        radius = float(request.args.get('radius', SIMILAR_BUSINESS_RADIUS_M))
+    except ValueError:
+        return jsonify({"error": "radius must be a number."}), 400
+    # 크롤러는 동 중심 COMPETITOR_CRAWL_RADIUS_M 안만 수집하므로 그보다 큰 반경은 받지 않음
+    if not 0 < radius <= COMPETITOR_CRAWL_RADIUS_M:
+        return jsonify({"error": f"radius must be between 0 and {COMPETITOR_CRAWL_RADIUS_M:.0f} meters."}), 400
+
+    index = get_competitor_index()
+    location = index.centroid(gu, dong)
+    if location is None:
+        if request_crawl(gu, dong, category or "음식점"):
+            return jsonify({"error": f"{gu} {dong} is not indexed yet, crawl requested."}), 404
+        return jsonify({"error": f"{gu} {dong} is not indexed yet."}), 404
+    result = {"gu": gu, "dong": dong, "centroid": {"lat": location[0], "lng": location[1]}, "radius_m": radius}
+    if category:
+        crawled_at = index.crawled_at(gu, dong, category)
+        if crawled_at is None:
+            request_crawl(gu, dong, category)
+        result.update({
+            "category": category,
+            "count": index.count(*location, radius, category=category.strip()),
+            "crawled_at": int(crawled_at) if crawled_at else None,
+            "truncated": index.is_truncated(gu, dong, category),
+        })
+    else:
+        result["categories"] = [{"category": c, "count": n} for c, n in index.category_counts(*location, radius, n=20)]
+    return jsonify(result)
+
+@app.route('/competitors/stats', methods=['GET'])
+def competitors_stats():
+    index = get_competitor_index()
+    return jsonify({**get_competitor_store().stats(), "indexed_places": len(index), "indexed_version": index.version})
+
 @app.route('/recommend_business', methods=['GET'])
 def recommend_business_endpoint():
     gu = request.args.get('gu')
@@ -392,8 +1012,124 @@ def analyze_market_endpoint():
     item = request.args.get('item')
     if not all([gu, dong, item]):
         return jsonify({"error": "gu, dong, and item parameters are required."}), 400
-    result = analyze_market(gu, dong, item, get_similar_business_info_rag, get_rag_business_recommendation, get_location_analysis_with_rag)
-    return jsonify(result)
+    result, meta = get_analyze_market_cached(gu, dong, item)
+    analyze_prefetcher.observe((gu, dong, item), meta)
+    # ?fields=score,similar 처럼 필요한 필드만 반환, ETag 는 meta(캐시 나이)를 뺀 내용으로 계산
+    fields = parse_fields(request.args.get('fields'))
+    return json_with_etag(
+        select_fields({**result, "meta": meta}, fields),
+        etag_source=select_fields(result, fields),
+        headers={"Age": str(int(meta["age_sec"])), "X-Cache": meta["cache"]}
+    )
+
+@app.route('/population/hourly', methods=['GET'])
+def population_hourly():
+    # 예) ?gu=강남구&dong=역삼1동&start=11&end=14 (점심 시간 비중), ?start=18&end=21&top=10 (저녁 상위 동)
+    try:
+        start = int(request.args.get('start', 11))
+        end = int(request.args.get('end', 14))
+        top = int(request.args.get('top', 10))
+        from population_profiles import window_hours
+        window_hours(start, end)
+    except ValueError:
+        return jsonify({"error": "start must be 0-23, end 0-24 and top an integer."}), 400
+    sort = request.args.get('sort', 'window_total')
+    if sort not in ("window_total", "window_share"):
+        return jsonify({"error": "sort must be window_total or window_share."}), 400
+
+    try:
+        profiles = get_population_profiles()
+    except Exception as e:
+        logger.error("Population API error: %s", e, extra={"upstream": "population"})
+        return jsonify({"error": "population data unavailable."}), 503
+
+    result = {"window": {"start": start, "end": end}, "dongs": len(profiles)}
+    gu, dong = request.args.get('gu'), request.args.get('dong')
+    if gu and dong:
+        i = profiles.find(gu, dong)
+        if i is None:
+            return jsonify({"error": f"no population profile for {gu} {dong}."}), 404
+        result["profile"] = profiles.describe(i, start, end)
+    if top > 0:
+        result["top"] = profiles.top(start, end, n=top, by=sort)
+    return json_with_etag(result)
+
+@app.route('/estate_trend', methods=['GET'])
+def estate_trend_endpoint():
+    # 예) ?gu=강남구&dong=역삼동&months=12 (동), ?gu=강남구 (구 전체 + 동 목록), 파라미터 없음 (25개 구 전체)
+    gu, dong = request.args.get('gu'), request.args.get('dong')
+    if dong and not gu:
+        return jsonify({"error": "dong requires gu."}), 400
+    try:
+        n = int(request.args.get('months', 12))
+    except ValueError:
+        return jsonify({"error": "months must be an integer."}), 400
+    if not 1 <= n <= ESTATE_TREND_MAX_MONTHS:
+        return jsonify({"error": f"months must be between 1 and {ESTATE_TREND_MAX_MONTHS}."}), 400
+    gu_codes = get_gu_code_map()
+    if gu and gu not in gu_codes:
+        return jsonify({"error": f"unknown gu: {gu}."}), 404
+
+    from estate_trend import GuTrend
+    months = sorted(recent_months(n))
+    trends = {name: estate_trend_cache.get(name) or GuTrend(name) for name in ([gu] if gu else gu_codes)}
+    missing = {name: trend.missing(months) for name, trend in trends.items() if trend.missing(months)}
+    # 비어 있는 달은 응답을 기다리지 않고 낮은 우선순위 작업으로 채움
+    backfill_job = request_estate_backfill(missing) if missing else None
+
+    result = {"months": months, "missing": missing, "backfill_job": backfill_job}
+    if gu:
+        trend = trends[gu]
+        result.update({"gu": gu, "dong": dong, "series": trend.series(months, dong)})
+        if not dong:
+            result["dongs"] = trend.dongs()
+    else:
+        result["gus"] = {name: trend.series(months) for name, trend in trends.items()}
+    return json_with_etag(result)
+
+@app.route('/jobs/analyze_market', methods=['POST'])
+def submit_analyze_market_job():
+    data = request.get_json(silent=True) or request.args
+    gu, dong, item = data.get('gu'), data.get('dong'), data.get('item')
+    priority = data.get('priority', 'normal')
+    if not all([gu, dong, item]):
+        return jsonify({"error": "gu, dong, and item parameters are required."}), 400
+    if priority not in PRIORITIES:
+        return jsonify({"error": f"priority must be one of {', '.join(PRIORITIES)}."}), 400
+    try:
+        payload = {"gu": gu, "dong": dong, "item": item, "priority": priority}
+        job_id = jobs.submit("analyze_market", _analyze_market_job, payload, priority)
+    except QueueFull:
+        return jsonify({"error": "too many pending jobs, retry later."}), 503, {"Retry-After": "5"}
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202, \
+        {"Location": f"/jobs/{job_id}"}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "job not found or expired."}), 404
+    return jsonify(job)
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    if not _ready.is_set():
+        return jsonify({"status": "warming_up", "pid": os.getpid()}), 503
+    return jsonify({
+        "status": "ready",
+        "pid": os.getpid(),
+        "retriever": _weaviate_client is not None,
+        "index_version": _index_version,
+        "circuits": breaker_states()
+    })
+
+@app.route('/llm_stats', methods=['GET'])
+def llm_stats():
+    return jsonify({**routing_stats(), "governor": governor_stats()})
+
+@app.route('/prefetch/stats', methods=['GET'])
+def prefetch_stats():
+    return jsonify(analyze_prefetcher.stats())
 
 @app.route('/ping', methods=['GET'])
 def ping():
@@ -403,5 +1139,59 @@ def ping():
 def index():
     return jsonify({"message": "Flask RAG API 서버 정상 작동 중입니다."})
 
+# ✅ 앱 시작 시 초기화: 설정 검증 + CORS 등록 (import 시점에는 아무것도 하지 않음)
+_app_initialized = False
+
+def init_app():
+    global _app_initialized
+    if _app_initialized:
+        return app
+    validate_config()
+    from flask_cors import CORS
+    CORS(app)  # CORS 허용 설정
+    _app_initialized = True
+    return app
+
+# ✅ 마스터 프로세스 예열: fork 전에 읽기 전용 데이터와 모듈을 올려두면 워커들이 copy-on-write 로 공유합니다
+_ready = threading.Event()
+
+def warm_up():
+    get_gu_code_map()
+    get_address_data()
+    get_question_parser()
+    get_custom_prompt()
+    # 경쟁 점포 인덱스도 마스터에서 한 번 읽어두면 워커들이 공유 (이후 변경분은 워커별로 다시 읽음)
+    try:
+        get_competitor_index()
+    except Exception as e:
+        logger.error("competitor index 로드 실패: %s", e)
+    # 이전 실행의 캐시 스냅샷을 mmap (값은 처음 요청될 때 꺼냄)
+    get_snapshot()
+    # 무거운 모듈도 마스터에서 한 번만 import (코드 객체를 워커들이 공유)
+    import weaviate  # noqa: F401
+    from langchain_community.embeddings import OpenAIEmbeddings  # noqa: F401
+    from langchain_community.chat_models import ChatOpenAI  # noqa: F401
+    from langchain.chains.question_answering import load_qa_chain  # noqa: F401
+
+# ✅ 워커 초기화: fork 이후 커넥션 풀 / Weaviate 클라이언트를 워커마다 새로 생성
+def init_worker():
+    global _http_session, _weaviate_client
+    _ready.clear()
+    _http_session = None
+    _weaviate_client = None
+    get_http_session()
+    start_snapshotter()
+    analyze_prefetcher.start()
+    start_crawler(kakao_get, [(e["cgg_nm"].strip(), e["dong_nm"].strip()) for e in get_address_data()["DATA"]])
+    try:
+        get_shared_weaviate_client()
+    except Exception as e:
+        # Weaviate 장애 시에도 GPT fallback 으로 응답할 수 있으므로 준비 완료로 처리하고 요청 시 재시도
+        logger.error("Weaviate 클라이언트 초기화 실패: %s", e)
+    _ready.set()
+
 if __name__ == '__main__':
+    init_app()
+    warm_up()
+    init_worker()
     app.run(host='0.0.0.0', port=8080, debug=True)
@@ -13,6 +13,14 @@ from langchain_community.chat_models import ChatOpenAI
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
+from cache_utils import TwoTierCache, cached
+from chat_history import truncate_tokens
+
+# ✅ 캐시 (프로세스 내 LRU + CACHE_URL 공유 저장소, 여러 Flask_API 프로세스가 공유)
+KAKAO_CACHE_TTL_SEC = float(os.environ.get("KAKAO_CACHE_TTL_SEC", "86400"))
+LLM_CACHE_TTL_SEC = float(os.environ.get("LLM_CACHE_TTL_SEC", "86400"))
+kakao_cache = TwoTierCache("kakao", KAKAO_CACHE_TTL_SEC)
+
 # 1. Weaviate 클라이언트 생성
 def get_weaviate_client():
     return weaviate.Client(
@@ -84,8 +92,14 @@ def get_similar_business_info_rag(gu, dong, business_type):
     try:
         headers = {"Authorization": f"KakaoAK {os.environ['KAKAO_REST_API_KEY']}"}
         url = f"https://dapi.kakao.com/v2/local/search/keyword.json?query={urllib.parse.quote(query)}"
-        res = requests.get(url, headers=headers, timeout=10)
-        data = res.json()
+
+        def fetch():
+            res = requests.get(url, headers=headers, timeout=10)
+            res.raise_for_status()
+            return res.json()
+
+        # 오류 응답은 캐시하지 않도록 성공한 JSON 만 저장
+        data = kakao_cache.get_or_compute(query, fetch)
         count = data.get("meta", {}).get("total_count", 0)
         desc = f"카카오 API 기준 '{query}' 관련 업종 수는 약 {count}건으로 확인됩니다."
         return {"description": desc, "count": count}
@@ -93,6 +107,7 @@ def get_similar_business_info_rag(gu, dong, business_type):
         return {"description": f"카카오 API 호출 오류: {e}", "count": 0}
 
 # 6. 창업 업종 추천 (RAG + fallback context)
+@cached("llm_recommendation", LLM_CACHE_TTL_SEC)
 def get_rag_business_recommendation(gu, dong, population, estate_data):
     pop = population.get("PSNG_NO", "정보 없음") if population else "정보 없음"
     deals = len(estate_data) if estate_data else 0
@@ -107,6 +122,7 @@ def get_rag_business_recommendation(gu, dong, population, estate_data):
     return ask_rag(question, retriever=retriever, fallback_context=fallback_context)
 
 # 7. 입지 분석 (RAG 기반 분석)
+@cached("llm_location", LLM_CACHE_TTL_SEC)
 def get_location_analysis_with_rag(gu, dong, item, population, estate_data, similar_desc):
     pop = population.get("PSNG_NO", "정보 없음") if population else "정보 없음"
     deals = len(estate_data) if estate_data else 0
@@ -124,19 +140,33 @@ def get_location_analysis_with_rag(gu, dong, item, population, estate_data, simi
     return ask_rag(question, fallback_context=fallback_context)
 
 # 8. 자유 질의 GPT (Flask 전용)
-def ask_chat_with_rag(user_input, analyzed_context=None):
-    context = ""
-
-    if analyzed_context:
-        context = f"""
+# 분석 요약 컨텍스트에 넣을 GPT 텍스트 최대 토큰 수 (긴 분석문을 매 턴 프롬프트에 다시 넣지 않도록)
+# 추천 업종 / 입지 분석이 이보다 길면 앞부분만 넣고 "…" 로 표시합니다 (챗봇 답변 근거가 줄어드므로 필요하면 늘려서 사용)
+CHAT_CONTEXT_FIELD_MAX_TOKENS = int(os.environ.get("CHAT_CONTEXT_FIELD_MAX_TOKENS", "400"))
+
+def _clip(text):
+    text = "" if text is None else str(text)
+    clipped = truncate_tokens(text, CHAT_CONTEXT_FIELD_MAX_TOKENS)
+    return clipped if clipped == text else clipped + "…"
+
+def build_chat_context(analyzed_context):
+    if not analyzed_context:
+        return ""
+    population = analyzed_context.get('population') or {}
+    similar = analyzed_context.get('similar') or {}
+    return f"""
 [분석 요약]
 - 지역: {analyzed_context.get('gu')} {analyzed_context.get('dong')}
 - 업종: {analyzed_context.get('item')}
-- 유동인구: {analyzed_context.get('population', {}).get('PSNG_NO', '정보 없음')}
-- 유사 업종: {analyzed_context.get('similar', {}).get('description', '없음')}
+- 유동인구: {population.get('PSNG_NO', '정보 없음')}
+- 유사 업종: {similar.get('description', '없음')}
 - 창업 평가: {analyzed_context.get('score')}
-- 추천 업종: {analyzed_context.get('recommendation')}
-- 입지 분석: {analyzed_context.get('location_analysis')}
+- 추천 업종: {_clip(analyzed_context.get('recommendation'))}
+- 입지 분석: {_clip(analyzed_context.get('location_analysis'))}
 """
 
+def ask_chat_with_context(user_input, context=""):
     return ask_rag(context + "\n\n" + user_input)
+
+def ask_chat_with_rag(user_input, analyzed_context=None):
+    return ask_chat_with_context(user_input, build_chat_context(analyzed_context))
@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import threading
+import itertools
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# ✅ 외부 API 호출 공통 안정성 레이어
+# 1) deadline: 요청 단위 시간 예산을 contextvar 로 전달, 하위 호출의 timeout 은 남은 예산으로 잘림
+# 2) hedged request: hedge_after 초 안에 응답이 없으면 같은 요청을 한 번 더 보내고 먼저 온 응답 사용
+# 3) circuit breaker: 업스트림별 연속 실패가 쌓이면 일정 시간 호출하지 않고 바로 마지막 정상 응답(캐시)으로 대체
+# 4) 동시 호출 상한: 업스트림별 max_concurrency 만큼만 동시에 호출 (백그라운드 작업이 몰려도 쿼터 초과 방지)
+
+class DeadlineExceeded(Exception):
+    pass
+
+class UpstreamUnavailable(Exception):
+    pass
+
+class ConcurrencyLimited(UpstreamUnavailable):
+    pass
+
+class LastGood:
+    # call_upstream(mark_fallback=True) 가 마지막 정상 응답으로 대체했을 때 돌려주는 표시
+    # (TwoTierCache.get_or_compute 는 값만 꺼내 반환하고 다시 저장하지 않음)
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+# 업스트림별 기본 설정 (timeout: 1회 호출 상한, hedge_after: 중복 요청 대기 시간, None 이면 hedge 안 함,
+# max_concurrency: 프로세스당 동시 호출 수 상한)
+UPSTREAMS = {
+    # 실거래가 / 유동인구는 정상 응답도 2초를 넘기는 큰 응답이라 hedge 하면 쿼터만 두 배로 씀
+    "real_estate": {"timeout": 10, "hedge_after": None, "failure_threshold": 5, "reset_timeout": 30, "max_concurrency": 8},
+    "population": {"timeout": 10, "hedge_after": None, "failure_threshold": 5, "reset_timeout": 30, "max_concurrency": 4},
+    "kakao": {"timeout": 5, "hedge_after": 1.0, "failure_threshold": 5, "reset_timeout": 30, "max_concurrency": 8},
+    "weaviate": {"timeout": 10, "hedge_after": None, "failure_threshold": 5, "reset_timeout": 30, "max_concurrency": 8},
+    # OpenAI 동시 호출 / 토큰 속도는 llm_governor 가 우선순위 대기열로 조절
+    "openai": {"timeout": 60, "hedge_after": None, "failure_threshold": 3, "reset_timeout": 60},
+}
+
+# UPSTREAM_CONCURRENCY='{"openai": 4}' 처럼 환경변수로 상한 덮어쓰기
+for _name, _limit in json.loads(os.environ.get("UPSTREAM_CONCURRENCY", "{}")).items():
+    UPSTREAMS.setdefault(_name, {})["max_concurrency"] = int(_limit)
+
+RESILIENCE_WORKERS = int(os.environ.get("RESILIENCE_WORKERS", "32"))
+
+# 1. Deadline
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline_scope(seconds):
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    # 바깥 deadline 이 더 짧으면 그대로 유지
+    token = _deadline.set(min(deadline, current) if current is not None else deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining():
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def time_budget(cap):
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return min(cap, left)
+
+# 2. Circuit breaker
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            # half-open 상태에서는 한 번에 하나의 시험 호출만 허용
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        # half-open 시험 호출을 보내지 못했으면 다음 호출이 시험할 수 있게 되돌림
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("circuit opened for %s after %d failures", self.name, self._failures)
+                self._opened_at = time.monotonic()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name):
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                config = UPSTREAMS.get(name, {})
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=config.get("failure_threshold", 5),
+                    reset_timeout=config.get("reset_timeout", 30)
+                )
+                _breakers[name] = breaker
+    return breaker
+
+def breaker_states():
+    return {name: breaker.state for name, breaker in _breakers.items()}
+
+# 3. Hedged request
+# "upstream" 풀은 실제 HTTP 호출(및 hedge), "fanout" 풀은 여러 업스트림 호출을 동시에 돌리는 용도.
+# 풀을 나눠서 fan-out 작업이 hedge 호출용 스레드를 모두 잡고 기다리는 일이 없게 합니다.
+_executors = {}
+_executors_pid = None
+_executor_lock = threading.Lock()
+
+def get_executor(pool="upstream"):
+    # fork 이후에는 스레드가 없으므로 워커 프로세스마다 새로 생성
+    global _executors, _executors_pid
+    if _executors_pid != os.getpid() or pool not in _executors:
+        with _executor_lock:
+            if _executors_pid != os.getpid():
+                _executors, _executors_pid = {}, os.getpid()
+            if pool not in _executors:
+                _executors[pool] = ThreadPoolExecutor(max_workers=RESILIENCE_WORKERS, thread_name_prefix=pool)
+    return _executors[pool]
+
+def submit(fn, *args, pool="upstream", **kwargs):
+    # 현재 deadline 등 contextvar 를 스레드로 전달
+    ctx = contextvars.copy_context()
+    return get_executor(pool).submit(ctx.run, fn, *args, **kwargs)
+
+def fan_out(fn, *args, **kwargs):
+    return submit(fn, *args, pool="fanout", **kwargs)
+
+def hedged_call(fn, hedge_after, total_timeout, attempts=2):
+    futures = [submit(fn)]
+    started = time.monotonic()
+    errors = []
+    while True:
+        left = total_timeout - (time.monotonic() - started)
+        if left <= 0:
+            raise TimeoutError(f"no response within {total_timeout:.1f}s")
+        wait_for = min(hedge_after, left) if hedge_after is not None and len(futures) < attempts else left
+        done, _ = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            futures.remove(future)
+            if future.exception() is None:
+                for other in futures:
+                    other.cancel()
+                return future.result()
+            errors.append(future.exception())
+        if len(futures) + len(errors) < attempts and (not done or not futures):
+            # 느리거나 실패한 요청이 있으면 예비 요청 전송
+            futures.append(submit(fn))
+        elif not futures:
+            raise errors[-1]
+
+# 4. 동시 호출 상한
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+def get_semaphore(name):
+    semaphore = _semaphores.get(name)
+    if semaphore is None:
+        with _semaphores_lock:
+            semaphore = _semaphores.get(name)
+            if semaphore is None:
+                limit = UPSTREAMS.get(name, {}).get("max_concurrency")
+                semaphore = threading.BoundedSemaphore(limit) if limit else None
+                _semaphores[name] = semaphore
+    return semaphore
+
+@contextmanager
+def concurrency_slot(name, timeout):
+    semaphore = get_semaphore(name)
+    if semaphore is None:
+        yield
+        return
+    # 남은 시간 안에 자리가 나지 않으면 실패로 처리 (breaker 에는 반영하지 않음)
+    if not semaphore.acquire(timeout=timeout):
+        raise ConcurrencyLimited(f"{name} concurrency limit reached")
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+# 5. 업스트림 호출 진입점
+LAST_GOOD_MAX_ENTRIES = int(os.environ.get("LAST_GOOD_MAX_ENTRIES", "2048"))
+
+_last_good = OrderedDict()
+_last_good_lock = threading.Lock()
+
+# 구간 안에서 실제로 나간 업스트림 호출 기록 (submit / fan_out 으로 넘긴 작업 포함, 쿼터 계산용)
+_call_log = contextvars.ContextVar("upstream_calls", default=None)
+
+@contextmanager
+def record_upstream_calls():
+    calls = []
+    token = _call_log.set(calls)
+    try:
+        yield calls
+    finally:
+        _call_log.reset(token)
+
+def _attempt(name, fn, cap, started, hedge):
+    # 원 요청 / hedge 모두 자기 스레드에서 동시 호출 자리를 잡고 호출 기록(쿼터)에 남김
+    # hedge 는 자리가 바로 나지 않으면 보내지 않음 (원 요청은 이미 진행 중)
+    with concurrency_slot(name, 0 if hedge else time_budget(cap)):
+        # 자리를 기다린 시간만큼 예산을 다시 계산
+        left = cap - (time.monotonic() - started)
+        if left <= 0:
+            raise TimeoutError(f"{name}: no concurrency slot within {cap:.1f}s")
+        calls = _call_log.get()
+        if calls is not None:
+            calls.append(name)
+        return fn(time_budget(left))
+
+def call_upstream(name, fn, fallback_key=None, mark_fallback=False):
+    # fn(timeout) 은 timeout 초 안에 끝나는 1회 호출이어야 합니다
+    # mark_fallback=True 면 마지막 정상 응답으로 대체한 결과를 LastGood 으로 감싸 반환 (캐시에 다시 저장하지 않도록)
+    config = UPSTREAMS.get(name, {})
+    breaker = get_breaker(name)
+
+    try:
+        cap = time_budget(config.get("timeout", 10))
+        started = time.monotonic()
+        if not breaker.allow():
+            raise UpstreamUnavailable(f"{name} circuit open")
+        try:
+            hedge_after = config.get("hedge_after")
+            if hedge_after is not None and hedge_after < cap:
+                order = itertools.count()
+                result = hedged_call(lambda: _attempt(name, fn, cap, started, next(order) > 0), hedge_after, cap)
+            else:
+                result = _attempt(name, fn, cap, started, False)
+        except ConcurrencyLimited:
+            # 자리가 없어 호출하지 못한 것은 업스트림 실패가 아님
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            logger.warning("upstream %s failed: %s", name, e, extra={"upstream": name})
+            raise
+    except Exception as e:
+        result = _fallback(name, fallback_key, e)
+        return LastGood(result) if mark_fallback else result
+
+    breaker.record_success()
+    if fallback_key is not None:
+        with _last_good_lock:
+            _last_good[(name, fallback_key)] = result
+            _last_good.move_to_end((name, fallback_key))
+            while len(_last_good) > LAST_GOOD_MAX_ENTRIES:
+                _last_good.popitem(last=False)
+    return result
+
+def _fallback(name, fallback_key, error):
+    if fallback_key is not None:
+        with _last_good_lock:
+            if (name, fallback_key) in _last_good:
+                logger.info("serving last good %s response for %s", name, fallback_key, extra={"upstream": name})
+                return _last_good[(name, fallback_key)]
+    if isinstance(error, UpstreamUnavailable):
+        raise error
+    raise UpstreamUnavailable(f"{name}: {error}") from error
@@ -0,0 +1,119 @@
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+
+from werkzeug.serving import make_server
+
+import rag_total_final_api as api
+from cache_utils import save_snapshot
+from log_utils import get_logger, install_debug_toggle
+
+logger = get_logger("serve")
+
+# ✅ 운영용 pre-fork 서버 진입점
+# 마스터가 설정 검증 + 데이터/모듈 예열 후 소켓을 열고 워커를 fork 합니다.
+# gu_code_map, 주소 데이터, 프롬프트, langchain 모듈은 fork 전에 올라가므로 워커들이 copy-on-write 로 공유하고,
+# HTTP 커넥션 풀과 retriever 클라이언트는 fork 이후 워커마다 새로 만듭니다.
+#
+# 사용법: python serve.py
+#   HOST (기본 0.0.0.0), PORT (기본 8080), WEB_CONCURRENCY (워커 수, 기본 CPU 수),
+#   WORKER_THREADS=0 으로 두면 워커당 단일 스레드, LOG_LEVEL / LOG_FORMAT 은 log_utils 참고
+
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8080"))
+WORKERS = int(os.environ.get("WEB_CONCURRENCY", str(os.cpu_count() or 2)))
+THREADED = os.environ.get("WORKER_THREADS", "1") != "0"
+BACKLOG = int(os.environ.get("BACKLOG", "128"))
+
+_children = {}
+_shutting_down = False
+
+def open_listen_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+def stop_worker(signum, frame):
+    # 종료 전 캐시 스냅샷 저장 (다음 실행의 워커가 바로 예열된 상태로 시작)
+    try:
+        save_snapshot()
+    except Exception as e:
+        logger.warning("cache snapshot on shutdown failed: %s", e)
+    os._exit(0)
+
+def run_worker(sock):
+    signal.signal(signal.SIGTERM, stop_worker)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    api.init_worker()
+    server = make_server(HOST, PORT, api.app, threaded=THREADED, fd=sock.fileno())
+    logger.info("worker %d ready", os.getpid())
+    server.serve_forever()
+
+def spawn_worker(sock):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock)
+        except BaseException as e:
+            logger.exception("worker %d 종료: %s", os.getpid(), e)
+            code = 1
+        finally:
+            os._exit(code)
+    _children[pid] = time.monotonic()
+    return pid
+
+def shutdown(signum, frame):
+    global _shutting_down
+    _shutting_down = True
+    for pid in list(_children):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+def main():
+    api.init_app()
+    api.warm_up()
+    sock = open_listen_socket()
+
+    # 예열된 객체를 GC 대상에서 빼서 워커에서 refcount/GC 스캔으로 페이지가 복사되는 것을 줄입니다
+    gc.collect()
+    gc.freeze()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    # kill -USR1 <pid> 로 디버그 로그 on/off (fork 된 워커에도 상속)
+    install_debug_toggle()
+
+    logger.info("master %d listening on %s:%d with %d workers", os.getpid(), HOST, PORT, WORKERS)
+    for _ in range(WORKERS):
+        spawn_worker(sock)
+
+    while _children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = _children.pop(pid, None)
+        if started is None or _shutting_down:
+            continue
+        logger.error("worker %d 비정상 종료 (status=%s), 재시작합니다", pid, status)
+        # 시작 직후 죽는 워커가 무한 재시작하며 CPU 를 잡아먹지 않도록 잠시 대기
+        if time.monotonic() - started < 1:
+            time.sleep(1)
+        spawn_worker(sock)
+
+    sock.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
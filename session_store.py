@@ -0,0 +1,46 @@
+import os
+import pickle
+import secrets
+
+from cache_utils import TwoTierCache
+
+# ✅ 서버 측 분석 세션 저장소
+# /analyze 결과를 세션 ID 로 저장해 두고, /ask 는 세션 ID 만 받아 저장된 컨텍스트를 사용합니다.
+# 저장소는 TwoTierCache 라서 CACHE_URL 을 공유 저장소로 설정하면 여러 API 프로세스가 같은 세션을 봅니다.
+#   ANALYSIS_SESSION_TTL_SEC: 마지막 사용 후 만료까지 시간 (기본 1시간)
+#   ANALYSIS_SESSION_MAX_BYTES: 세션 하나의 최대 크기 (기본 64KB)
+#   ANALYSIS_SESSION_MAX_LOCAL: 프로세스 내 보관 세션 수 상한 (기본 1000)
+
+ANALYSIS_SESSION_TTL_SEC = float(os.environ.get("ANALYSIS_SESSION_TTL_SEC", "3600"))
+ANALYSIS_SESSION_MAX_BYTES = int(os.environ.get("ANALYSIS_SESSION_MAX_BYTES", str(64 * 1024)))
+ANALYSIS_SESSION_MAX_LOCAL = int(os.environ.get("ANALYSIS_SESSION_MAX_LOCAL", "1000"))
+
+class SessionTooLarge(ValueError):
+    pass
+
+class AnalysisSessionStore:
+    def __init__(self, ttl=ANALYSIS_SESSION_TTL_SEC, max_bytes=ANALYSIS_SESSION_MAX_BYTES, cache=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.cache = cache or TwoTierCache("analysis_session", ttl, local_ttl=min(ttl, 300))
+        self.cache.local.max_entries = ANALYSIS_SESSION_MAX_LOCAL
+
+    def create(self, session):
+        size = len(pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            raise SessionTooLarge(f"분석 세션이 너무 큽니다 ({size} bytes > {self.max_bytes} bytes)")
+        session_id = secrets.token_urlsafe(16)
+        self.cache.set(session_id, session, self.ttl)
+        return session_id
+
+    def get(self, session_id, touch=True):
+        if not session_id:
+            return None
+        session = self.cache.get(session_id)
+        if session is not None and touch:
+            # 사용할 때마다 만료 시간 연장
+            self.cache.set(session_id, session, self.ttl)
+        return session
+
+    def delete(self, session_id):
+        self.cache.delete(session_id)
@@ -1,15 +1,26 @@
 import json
 import requests
-import xml.etree.ElementTree as ET
-from datetime import datetime
 import streamlit as st
 import openai
 import matplotlib.pyplot as plt
 import re
-import pandas as pd
 import folium
 from streamlit_folium import st_folium
+from datetime import date
 import urllib.parse
+import io
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from log_utils import get_logger
+from chat_history import ChatHistoryManager
+from estate_utils import iter_deal_items_from_response, recent_months, sort_recent, mean_price
+from huff_model import analyze_new_store, distance_matrix_km, grid_points
+from competitor_index import rect_around, search_rect
+
+logger = get_logger(__name__)
 # import streamlit as st
 #
 # # ✅ CSS 외부 파일 로딩
@@ -26,11 +37,40 @@ matplotlib.rcParams['font.family'] = font_prop.get_name()
 
 # matplotlib.rcParams['font.family'] = 'NanumGothic'  # 추천
 
+# ==== 상담 챗봇 설정 ====
+CHAT_MODEL = "gpt-4"
+CHAT_SUMMARY_MODEL = "gpt-4.1-mini"
+CHAT_TOKEN_BUDGET = 3000
+
+def summarize_chat_turns(summary, turns):
+    dialogue = "\n".join(f"사용자: {t['user']}\n상담사: {t['assistant']}" for t in turns)
+    prompt = f"""
+아래는 창업 상담 대화의 기존 요약과 새로 추가된 대화입니다.
+두 내용을 합쳐 핵심 질문, 답변, 결정 사항만 5문장 이내로 다시 요약해줘.
+
+[기존 요약]
+{summary or '없음'}
+
+[추가된 대화]
+{dialogue}
+"""
+    response = openai.ChatCompletion.create(
+        model=CHAT_SUMMARY_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=300
+    )
+    return response.choices[0].message["content"]
+
 # ==== 세션 초기화 ====
 if "analyzed" not in st.session_state:
     st.session_state["analyzed"] = None
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = [{"role": "system", "content": "너는 유동인구, 부동산, 업종 데이터를 바탕으로 창업을 상담해주는 전문가야."}]
+    # 토큰 예산 안에서 최근 대화는 그대로, 오래된 대화는 요약해서 유지
+    st.session_state.chat_history = ChatHistoryManager(
+        "너는 유동인구, 부동산, 업종 데이터를 바탕으로 창업을 상담해주는 전문가야.",
+        summarize=lambda summary, turns: summarize_chat_turns(summary, turns),
+        token_budget=CHAT_TOKEN_BUDGET
+    )
 
 # ==== API 설정 ====
 openai.api_key = st.secrets["OPENAI_API_KEY"]
@@ -48,43 +88,72 @@ REAL_ESTATE_KEY = "KY6+sZJd4Nm01OKBmqKrAv/Ao/HM3mUBs5w+Yz2ojnNs7pUZZ+gMJA8y/U4lO
 POPULATION_API_KEY = "637a794770696d773835554e517467"
 POPULATION_API = f"http://openapi.seoul.go.kr:8088/{POPULATION_API_KEY}/json/tpssPassengerCnt/1/1000"
 
+# ==== 캐시 설정 ====
+# rerun 마다 같은 API / GPT 호출이 반복되지 않도록 입력값 기준으로 TTL 캐시 (실패한 호출은 예외로 빠져 캐시되지 않음)
+DATA_CACHE_TTL_SEC = 3600
+GPT_CACHE_TTL_SEC = 86400
+GEOCODE_CACHE_TTL_SEC = 7 * 86400
+
+@st.cache_data(ttl=GPT_CACHE_TTL_SEC, show_spinner=False)
+def cached_chat_completion(model, messages):
+    # messages: ((role, content), ...) 튜플 (캐시 키로 쓰기 위해 해시 가능한 형태)
+    response = openai.ChatCompletion.create(
+        model=model,
+        messages=[{"role": role, "content": content} for role, content in messages]
+    )
+    return response.choices[0].message["content"]
+
+# 제출 시 서로 독립적인 조회를 동시에 실행 (스레드에서도 st.* 호출이 가능하도록 ScriptRunContext 전달)
+def run_concurrently(*calls):
+    ctx = get_script_run_ctx()
+
+    def run(fn, args):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        futures = [executor.submit(run, fn, args) for fn, *args in calls]
+        return [future.result() for future in futures]
+
 # ==== 함수들 ====
 
+# 월별로 캐시: 실패한 달은 예외가 나서 캐시되지 않고 다음 실행에서 다시 조회
+@st.cache_data(ttl=DATA_CACHE_TTL_SEC, show_spinner=False)
+def fetch_real_estate_month(lawd_cd, yyyymm, dong_name):
+    params = {
+        "serviceKey": REAL_ESTATE_KEY,
+        "LAWD_CD": lawd_cd,
+        "DEAL_YMD": yyyymm,
+        "pageNo": "1",
+        "numOfRows": "100",
+        "type": "xml"
+    }
+    res = requests.get(REAL_ESTATE_API, params=params, timeout=10, stream=True)
+    return list(iter_deal_items_from_response(res, dong_name))
+
 def get_real_estate_by_dong(gu_name, dong_name):
     lawd_cd = gu_code_map.get(gu_name)
     if not lawd_cd:
         return []
-    now = datetime.now()
     results = []
-    for i in range(6):
-        yyyymm = (now.replace(day=1) - pd.DateOffset(months=i)).strftime("%Y%m")
-        params = {
-            "serviceKey": REAL_ESTATE_KEY,
-            "LAWD_CD": lawd_cd,
-            "DEAL_YMD": yyyymm,
-            "pageNo": "1",
-            "numOfRows": "100",
-            "type": "xml"
-        }
+    for yyyymm in recent_months(6):
         try:
-            res = requests.get(REAL_ESTATE_API, params=params, timeout=10)
-            root = ET.fromstring(res.content)
-            items = root.find("body/items")
-            for item in items.findall("item"):
-                umd = item.findtext("umdNm", default="N/A")
-                if dong_name in umd:
-                    results.append({
-                        "dealAmount": item.findtext("dealAmount", "N/A"),
-                        "dealYear": int(item.findtext("dealYear", "0")),
-                        "dealMonth": int(item.findtext("dealMonth", "0")),
-                        "dealDay": int(item.findtext("dealDay", "0")),
-                        "buildingType": item.findtext("buildingType", "N/A")
-                    })
+            results.extend(fetch_real_estate_month(lawd_cd, yyyymm, dong_name))
         except Exception as e:
-            print("부동산 API 오류:", e)
+            logger.error("부동산 API 오류: %s", e)
             continue
-    results.sort(key=lambda x: (x["dealYear"], x["dealMonth"], x["dealDay"]), reverse=True)
-    return results[:30]
+    return sort_recent(results, 30)
+
+# 유동인구 API 응답은 동과 무관하므로 DONG_ID → 행 인덱스로 한 번만 캐시
+@st.cache_data(ttl=DATA_CACHE_TTL_SEC, show_spinner=False)
+def fetch_population_rows():
+    response = requests.get(POPULATION_API, timeout=10)
+    response.raise_for_status()
+    rows = response.json().get("tpssPassengerCnt", {}).get("row", [])
+    rows_by_dong = {}
+    for row in rows:
+        rows_by_dong.setdefault(row.get("DONG_ID"), row)
+    return rows_by_dong
 
 def get_passenger_info_by_dong(gu_name, dong_name):
     target_id = None
@@ -95,33 +164,24 @@ def get_passenger_info_by_dong(gu_name, dong_name):
                 break
 
     if not target_id:
-        print("⚠️ JSON에서 동을 찾지 못했습니다.")
+        logger.info("JSON에서 동을 찾지 못했습니다: %s %s", gu_name, dong_name)
         return None
 
     try:
-        response = requests.get(POPULATION_API, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            rows = data.get("tpssPassengerCnt", {}).get("row", [])
-            filtered = [row for row in rows if row.get("DONG_ID") == target_id]
-            if filtered:
-                return filtered[0]
-            else:
-                print("해당 DONG_ID 데이터 없음.")
+        row = fetch_population_rows().get(target_id)
+        if row:
+            return row
+        logger.info("해당 DONG_ID 데이터 없음: %s", target_id)
     except Exception as e:
-        print("❌ 유동인구 API 오류:", e)
+        logger.error("유동인구 API 오류: %s", e)
 
 def get_similar_business_info_gpt(gu_name, dong_name, business_type):
     prompt = f"""
 서울시 {gu_name} {dong_name} 지역에 '{business_type}' 업종과 관련된 경쟁 업종 종류와 대략적인 개수를 알려줘.
 """
     try:
-        messages = [
-            {"role": "system", "content": "너는 지역 상권 분석 전문가야."},
-            {"role": "user", "content": prompt}
-        ]
-        response = openai.ChatCompletion.create(model="gpt-4", messages=messages)
-        answer = response.choices[0].message["content"]
+        messages = (("system", "너는 지역 상권 분석 전문가야."), ("user", prompt))
+        answer = cached_chat_completion("gpt-4", messages)
         number_match = re.search(r'\d+', answer.replace(',', ''))
         count = int(number_match.group()) if number_match else 0
         return {"description": answer, "count": count}
@@ -137,12 +197,8 @@ def get_gpt_business_recommendation(gu, dong, population, estate_data):
 서울시 {gu} {dong} 지역에서 유동인구가 약 {pop_value}명이고, 최근 {estate_count}건의 부동산 거래가 발생했어.
 이 조건을 바탕으로 창업에 적합한 업종을 하나 추천해줘.
 """
-        messages = [
-            {"role": "system", "content": "너는 창업 전략가야."},
-            {"role": "user", "content": prompt}
-        ]
-        response = openai.ChatCompletion.create(model="gpt-4", messages=messages)
-        return response.choices[0].message["content"]
+        messages = (("system", "너는 창업 전략가야."), ("user", prompt))
+        return cached_chat_completion("gpt-4", messages)
     except Exception as e:
         st.error(f"GPT 업종 추천 오류: {e}")
         return "GPT 추천 실패"
@@ -158,8 +214,8 @@ def evaluate_suitability(pop, estate_data, similar_count):
             pass
     if estate_data:
         try:
-            recent = [int(x["dealAmount"].replace(",", "")) for x in estate_data if x["dealAmount"] != "N/A"]
-            if recent and sum(recent)/len(recent) < 120000:
+            avg = mean_price(estate_data)
+            if avg is not None and avg < 120000:
                 score += 1
         except:
             pass
@@ -172,52 +228,65 @@ def evaluate_suitability(pop, estate_data, similar_count):
     else:
         return "❌ 다소 불리한 입지입니다."
 
-def plot_population_by_hour(data):
-    hours = list(range(24))
-    values = [data.get(f"PSNG_NO_{str(h).zfill(2)}", 0) for h in hours]
+# 그래프는 데이터 값을 키로 PNG 를 캐시해서 rerun 때 다시 그리지 않음
+def _figure_to_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+@st.cache_data(ttl=DATA_CACHE_TTL_SEC, show_spinner=False)
+def render_population_chart(values):
     fig, ax = plt.subplots()
-    ax.plot(hours, values, marker='o')
+    ax.plot(list(range(24)), list(values), marker='o')
     ax.set_title("시간대별 유동인구", fontproperties=font_prop)
     ax.set_xlabel("시간", fontproperties=font_prop)
     ax.set_ylabel("인구 수", fontproperties=font_prop)
     ax.grid(True)
-    st.pyplot(fig)
+    return _figure_to_png(fig)
 
-def plot_real_estate_trend(data):
-    df = pd.DataFrame(data)
-    if df.empty:
-        return
-    df['날짜'] = pd.to_datetime(df['dealYear'].astype(str) + '-' + df['dealMonth'].astype(str) + '-' + df['dealDay'].astype(str))
-    df['가격'] = df['dealAmount'].str.replace(',', '').astype(float)
-    df = df.sort_values('날짜')
+@st.cache_data(ttl=DATA_CACHE_TTL_SEC, show_spinner=False)
+def render_estate_trend_chart(points):
+    # points: ((date_ordinal, price), ...) 날짜순
     fig, ax = plt.subplots()
-    ax.plot(df['날짜'], df['가격'], marker='o')
+    ax.plot([date.fromordinal(o) for o, _ in points], [p for _, p in points], marker='o')
     ax.set_title('부동산 거래 가격 추세', fontproperties=font_prop)
     ax.set_xlabel('날짜', fontproperties=font_prop)
     ax.set_ylabel('가격(만원)', fontproperties=font_prop)
-    st.pyplot(fig)
+    return _figure_to_png(fig)
 
+def plot_population_by_hour(data):
+    values = tuple(data.get(f"PSNG_NO_{str(h).zfill(2)}", 0) for h in range(24))
+    st.image(render_population_chart(values))
+
+def plot_real_estate_trend(data):
+    # 수집 시점에 파싱된 가격/날짜 ordinal 을 그대로 사용
+    deals = sorted((d for d in data if d.price is not None and d.date_ordinal), key=lambda d: d.date_ordinal)
+    if not deals:
+        return
+    st.image(render_estate_trend_chart(tuple((d.date_ordinal, d.price) for d in deals)))
+
+
+@st.cache_data(ttl=GEOCODE_CACHE_TTL_SEC, show_spinner=False)
+def geocode_address(address):
+    headers = {
+        "Authorization": f"KakaoAK {st.secrets['KAKAO_REST_API_KEY']}"
+    }
+    url = f"https://dapi.kakao.com/v2/local/search/address.json?query={urllib.parse.quote(address)}"
+    res = requests.get(url, headers=headers, timeout=10)
+    if res.status_code != 200:
+        raise RuntimeError(f"❌ Kakao API 오류: {res.status_code}")
+    documents = res.json().get("documents")
+    if not documents:
+        return None
+    return float(documents[0]["y"]), float(documents[0]["x"])
 
 def get_lat_lng_from_kakao(gu, dong):
     try:
-        address = f"서울특별시 {gu} {dong}"
-        headers = {
-            "Authorization": f"KakaoAK {st.secrets['KAKAO_REST_API_KEY']}"
-        }
-        url = f"https://dapi.kakao.com/v2/local/search/address.json?query={urllib.parse.quote(address)}"
-        res = requests.get(url, headers=headers)
-
-        if res.status_code == 200:
-            data = res.json()
-            documents = data.get("documents")
-            if documents:
-                lat = float(documents[0]["y"])
-                lng = float(documents[0]["x"])
-                return lat, lng
-            else:
-                st.warning("📍 Kakao API에서 주소 결과를 찾지 못했어요.")
-        else:
-            st.error(f"❌ Kakao API 오류: {res.status_code}")
+        location = geocode_address(f"서울특별시 {gu} {dong}")
+        if location:
+            return location
+        st.warning("📍 Kakao API에서 주소 결과를 찾지 못했어요.")
     except Exception as e:
         st.error(f"📡 Kakao 주소 변환 오류: {e}")
     return None, None
@@ -247,27 +316,120 @@ def show_map(gu, dong):
 
 
 
-# ✅ HUFF 모델 분석 함수
-def get_huff_analysis_with_gpt(gu_name, dong_name, item_name, population, estate_data, similar_desc):
-    try:
-        pop_value = population.get('PSNG_NO', '정보 없음') if population else '정보 없음'
-        recent_count = len(estate_data) if estate_data else 0
-        prompt = f"""
-서울시 {gu_name} {dong_name} 지역에 대해 HUFF 모델을 사용해서 '{item_name}' 업종의 입지 적합성을 분석해줘.
+# ✅ HUFF 모델 분석: 카카오 경쟁 점포 위치 + 유동인구 격자로 직접 계산하고, GPT 는 계산된 수치만 해설
+HUFF_RADIUS_M = 1000
+HUFF_GRID_STEP_M = 100
+HUFF_DECAY = 2.0
+HUFF_MAX_SPLIT_DEPTH = 3  # 검색 한도(45건)를 넘는 영역은 4등분해 다시 검색 (반경 1km 기준 최소 250m 사각형)
+HUFF_BRAND_ATTRACTIVENESS = 1.5  # 프랜차이즈(카테고리 마지막 단계가 브랜드) 점포, 신규 점포는 1
+HUFF_UNRELATED_ATTRACTIVENESS = 0.5  # 이름만 검색어와 겹치고 카테고리는 다른 업종인 점포
+
+@st.cache_data(ttl=DATA_CACHE_TTL_SEC, show_spinner=False)
+def fetch_competitors(item_name, lat, lng, radius_m=HUFF_RADIUS_M):
+    # 반경을 감싸는 사각형을 검색하고 반경 밖 점포는 제외: ((lat, lng, 점포명, 카테고리), ...), 검색 한도로 잘렸는지 여부
+    # 사각형 분할 검색은 경쟁 점포 크롤러와 같은 구현(competitor_index.search_rect)을 사용
+    headers = {"Authorization": f"KakaoAK {st.secrets['KAKAO_REST_API_KEY']}"}
+
+    def fetch_json(url, params):
+        res = requests.get(url, headers=headers, params=params, timeout=10)
+        res.raise_for_status()
+        return res.json()
+
+    found = {}
+    capped = search_rect(fetch_json, item_name, rect_around(lat, lng, radius_m), HUFF_MAX_SPLIT_DEPTH, found)
+    places = [(float(d["y"]), float(d["x"]), d.get("place_name", ""), d.get("category_name", "")) for d in found.values()]
+    if places:
+        distances = distance_matrix_km([lat], [lng], [p[0] for p in places], [p[1] for p in places])[0]
+        places = [p for p, distance in zip(places, distances) if distance * 1000 <= radius_m]
+    return tuple(places), capped
+
+def place_attractiveness(item_name, place_name, category_name):
+    # 카카오 카테고리로 경쟁 점포 매력도 추정 ('음식점 > 카페 > 커피전문점 > 스타벅스' → 프랜차이즈)
+    parts = [part.strip() for part in (category_name or "").split(">") if part.strip()]
+    if not any(item_name in part or part in item_name for part in parts):
+        return HUFF_UNRELATED_ATTRACTIVENESS
+    if len(parts) >= 3 and parts[-1] in place_name:
+        return HUFF_BRAND_ATTRACTIVENESS
+    return 1.0
+
+def get_dong_centroids(gu_name):
+    # 같은 구 행정동의 DONG_ID → 중심 좌표
+    # 주소별 결과는 geocode_address 가 캐시하므로 여기서는 캐시하지 않음 (실패한 동이 빠진 결과가 남지 않도록)
+    centroids = {}
+    for entry in address_data["DATA"]:
+        dong_id = entry.get("dong_id", "")
+        if entry["cgg_nm"] != gu_name or len(dong_id) != 8 or dong_id in centroids:
+            continue
+        try:
+            location = geocode_address(f"서울특별시 {gu_name} {entry['dong_nm']}")
+        except Exception as e:
+            logger.warning("동 좌표 조회 실패: %s %s (%s)", gu_name, entry["dong_nm"], e)
+            continue
+        if location:
+            centroids[dong_id] = location
+    return centroids
 
-다음과 같은 정보를 참고할 수 있어:
-- 유동인구: {pop_value}명
-- 부동산 거래 건수: {recent_count}
-- 유사 업종 정보: {similar_desc}
+def demand_weights(gu_name, location, population, lats, lngs):
+    # 격자마다 가장 가까운 같은 구 행정동의 유동인구를 배정 (동 면적이 비슷하다고 보고,
+    # 후보지 동의 유동인구가 그 동 격자에 고르게 나뉘도록 맞춤). 동 좌표 / 유동인구를 모르면 후보지 동 유동인구를 고르게 나눔
+    try:
+        centroids = get_dong_centroids(gu_name)
+        rows = fetch_population_rows()
+    except Exception as e:
+        logger.warning("HUFF 수요 가중치 계산 실패: %s", e)
+        centroids, rows = {}, {}
+    dong_ids = [dong_id for dong_id in centroids if rows.get(dong_id)]
+    if not dong_ids:
+        total_pop = float(population.get("PSNG_NO", 0) or 0) if population else 0.0
+        return np.full(len(lats), total_pop / len(lats) if total_pop > 0 else 1.0)
+    dong_pops = np.array([float(rows[dong_id].get("PSNG_NO", 0) or 0) for dong_id in dong_ids])
+    nearest = distance_matrix_km(
+        lats, lngs, [centroids[d][0] for d in dong_ids], [centroids[d][1] for d in dong_ids]
+    ).argmin(axis=1)
+    site_dong = nearest[distance_matrix_km([location[0]], [location[1]], lats, lngs)[0].argmin()]
+    weights = dong_pops[nearest] / (nearest == site_dong).sum()
+    return weights if weights.sum() > 0 else np.ones(len(lats))
+
+def compute_huff(gu_name, dong_name, item_name, population):
+    location = geocode_address(f"서울특별시 {gu_name} {dong_name}")
+    if not location:
+        return None
+    places, capped = fetch_competitors(item_name, *location)
+    competitors = [(lat, lng) for lat, lng, _, _ in places]
+    attractiveness = [place_attractiveness(item_name, name, category) for _, _, name, category in places]
+    lats, lngs = grid_points(*location, radius_km=HUFF_RADIUS_M / 1000, step_km=HUFF_GRID_STEP_M / 1000)
+    weights = demand_weights(gu_name, location, population, lats, lngs)
+    huff = analyze_new_store(location, competitors, lats, lngs, weights, decay=HUFF_DECAY,
+                             competitor_attractiveness=attractiveness)
+    huff["competitors_capped"] = capped
+    return huff
+
+def get_huff_analysis(gu_name, dong_name, item_name, population):
+    try:
+        huff = compute_huff(gu_name, dong_name, item_name, population)
+    except Exception as e:
+        return None, f"HUFF 모델 분석 실패: {e}"
+    if huff is None:
+        return None, "📍 위치를 찾지 못해 HUFF 모델을 계산하지 못했어요."
 
-필요하다면 합리적인 가정을 통해 데이터를 보완해서 HUFF 모델 기반 분석을 해줘. 분석 결과를 바탕으로 창업 적합성을 평가해줘.
+    nearest = f"{huff['nearest_competitor_km'] * 1000:.0f}m" if huff["nearest_competitor_km"] is not None else "없음"
+    capped = " 이상 (검색 한도로 일부 점포 누락)" if huff["competitors_capped"] else ""
+    prompt = f"""
+서울시 {gu_name} {dong_name} 에 '{item_name}' 점포를 새로 열 때의 HUFF 모델 계산 결과야.
+- 반경 {HUFF_RADIUS_M}m 내 경쟁 점포: {huff['competitors']}개{capped} (500m 이내 {huff['competitors_within_500m']}개, 가장 가까운 점포 {nearest})
+- 예상 시장 점유율: {huff['market_share']:.1%}
+- 예상 고객 수: 약 {huff['expected_customers']:,.0f}명 (전체 수요 {huff['total_demand']:,.0f}명 기준)
+- 경쟁 점포 평균 대비 점유율: {huff['relative_to_average']:.2f}배
+- 신규 점포 선택 확률이 50% 이상인 지역 비율: {huff['dominant_area_ratio']:.1%}
+
+숫자는 바꾸지 말고, 이 결과가 창업 적합성 측면에서 어떤 의미인지 3~5문장으로 해설해줘.
 """
-        messages = [{"role": "system", "content": "너는 HUFF 모델 기반 상권 분석 전문가야."},
-                    {"role": "user", "content": prompt}]
-        response = openai.ChatCompletion.create(model="gpt-4", messages=messages)
-        return response.choices[0].message["content"]
+    try:
+        messages = (("system", "너는 HUFF 모델 결과를 해설하는 상권 분석 전문가야."), ("user", prompt))
+        narrative = cached_chat_completion("gpt-4", messages)
     except Exception as e:
-        return f"HUFF 모델 분석 실패: {e}"
+        narrative = f"(GPT 해설 생략: {e})"
+    return huff, narrative
 
 # ==== Streamlit 앱 ====
 st.title("💬 창업 상담 챗봇")
@@ -283,12 +445,16 @@ if submit:
         del st.session_state["gpt_location"]
 
     with st.spinner("🔍 분석 중입니다..."):
-        estate = get_real_estate_by_dong(gu, dong)
-        pop = get_passenger_info_by_dong(gu, dong)
-        similar = get_similar_business_info_gpt(gu, dong, item)
+        estate, pop, similar = run_concurrently(
+            (get_real_estate_by_dong, gu, dong),
+            (get_passenger_info_by_dong, gu, dong),
+            (get_similar_business_info_gpt, gu, dong, item)
+        )
         score = evaluate_suitability(pop, estate, similar["count"])
-        recommendation = get_gpt_business_recommendation(gu, dong, pop, estate)
-        huff_analysis = get_huff_analysis_with_gpt(gu, dong, item, pop, estate, similar["description"])
+        recommendation, (huff, huff_analysis) = run_concurrently(
+            (get_gpt_business_recommendation, gu, dong, pop, estate),
+            (get_huff_analysis, gu, dong, item, pop)
+        )
 
         st.session_state["analyzed"] = {
             "gu": gu, "dong": dong, "item": item,
@@ -297,6 +463,7 @@ if submit:
             "similar_desc": similar["description"],
             "suitability": score,
             "recommendation": recommendation,
+            "huff": huff,
             "huff_analysis": huff_analysis  # ✅ 여기에 포함시킴
         }
 
@@ -308,7 +475,7 @@ if st.session_state["analyzed"]:
     st.subheader("🏠 부동산 거래 내역")
     if a["estate"]:
         for e in a["estate"]:
-            st.write(f"{e['dealYear']}년 {e['dealMonth']}월 {e['dealDay']}일 - {e['dealAmount']}원 / {e['buildingType']}")
+            st.write(f"{e.year}년 {e.month}월 {e.day}일 - {e.amount_text}원 / {e.building_type}")
         plot_real_estate_trend(a["estate"])
     else:
         st.write("📭 거래 내역 없음")
@@ -328,6 +495,15 @@ if st.session_state["analyzed"]:
     st.info(a["recommendation"])
 
     st.subheader("📐 HUFF 모델 기반 분석")
+    if a["huff"]:
+        h = a["huff"]
+        cols = st.columns(4)
+        cols[0].metric("예상 점유율", f"{h['market_share']:.1%}")
+        cols[1].metric("예상 고객 수", f"{h['expected_customers']:,.0f}명")
+        cols[2].metric(f"반경 {HUFF_RADIUS_M}m 경쟁 점포", f"{h['competitors']}개" + ("+" if h.get("competitors_capped") else ""))
+        cols[3].metric("가장 가까운 경쟁점", f"{h['nearest_competitor_km'] * 1000:.0f}m" if h["nearest_competitor_km"] is not None else "없음")
+        if h.get("competitors_capped"):
+            st.caption("⚠️ 경쟁 점포가 많아 카카오 검색 한도(영역당 45건)에 걸린 영역이 있어, 실제 점포 수는 더 많을 수 있어요.")
     st.markdown(a["huff_analysis"])
 
 # === GPT 자유 상담 챗봇 영역 ===
@@ -335,26 +511,29 @@ st.markdown("---")
 st.subheader("💬 GPT와 자유롭게 상담해보세요")
 user_input = st.text_input("질문해보세요")
 if user_input:
+    chat = st.session_state.chat_history
     if st.session_state["analyzed"]:
         a = st.session_state["analyzed"]
+        population = a['population'] or {}
         context = f"""
 - 지역: {a['gu']} {a['dong']}
 - 업종: {a['item']}
-- 유동인구: {a['population'].get('PSNG_NO', '정보 없음'):,}명
+- 유동인구: {population.get('PSNG_NO', '정보 없음')}명
 - 거래 건수: {len(a['estate'])}
 - 유사 업종 수: {a['similar_cnt']}개
 - 관련 업종 설명: {a['similar_desc']}
 - 적합도 평가: {a['suitability']}
 - 추천 업종: {a['recommendation']}
 """
-        st.session_state.chat_history.append({"role": "user", "content": context + "\n\n" + user_input})
+        # 분석 컨텍스트는 턴마다 붙이지 않고 한 번만 (바뀌었을 때만 교체)
+        chat.set_context(context)
     else:
-        st.session_state.chat_history.append({"role": "user", "content": user_input})
+        chat.set_context("")
 
     try:
-        res = openai.ChatCompletion.create(model="gpt-4", messages=st.session_state.chat_history)
+        res = openai.ChatCompletion.create(model=CHAT_MODEL, messages=chat.build_messages(user_input))
         reply = res.choices[0].message["content"]
-        st.session_state.chat_history.append({"role": "assistant", "content": reply})
+        chat.add_turn(user_input, reply)
         st.markdown(f"🤖 **GPT:**\n\n{reply}")
     except Exception as e:
-        st.error(f"GPT 응답 오류: {e}")
\ No newline at end of file
+        st.error(f"GPT 응답 오류: {e}")
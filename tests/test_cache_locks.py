@@ -0,0 +1,42 @@
+import time
+
+import cache_utils
+from cache_utils import SQLiteBackend, TwoTierCache
+
+
+def _cache(tmp_path, name, lock_ttl=30):
+    return TwoTierCache(name, 60, backend=SQLiteBackend(str(tmp_path / "cache.sqlite")), lock_ttl=lock_ttl)
+
+
+def test_lock_is_exclusive_until_released(tmp_path):
+    cache = _cache(tmp_path, "test-lock-exclusive")
+    with cache.lock("k") as first:
+        with cache.lock("k") as second:
+            assert first and not second
+    with cache.lock("k") as again:
+        assert again
+
+
+def test_expired_owner_does_not_release_new_owner(tmp_path):
+    cache = _cache(tmp_path, "test-lock-owner", lock_ttl=0.2)
+    with cache.lock("k") as first:
+        assert first
+        time.sleep(0.3)  # 연장되기 전에 만료
+        with cache.lock("k") as second:
+            assert second
+            holder = cache.backend.get(cache.full_key("k") + ":lock")
+        # 두 번째 잠금이 풀린 뒤 다른 소유자가 잡음
+        assert cache.backend.add(cache.full_key("k") + ":lock", b"other", 30)
+    # 첫 번째 소유자가 나가면서 다른 소유자의 잠금을 지우지 않음
+    assert holder is not None
+    assert cache.backend.get(cache.full_key("k") + ":lock") == b"other"
+
+
+def test_held_lock_is_renewed(tmp_path):
+    # 연장 주기(LOCK_RENEW_TICK_SEC)가 lock_ttl 안에 여러 번 돌도록
+    cache = _cache(tmp_path, "test-lock-renew", lock_ttl=3 * cache_utils.LOCK_RENEW_TICK_SEC)
+    with cache.lock("k") as first:
+        assert first
+        time.sleep(4 * cache_utils.LOCK_RENEW_TICK_SEC)
+        with cache.lock("k") as second:
+            assert not second
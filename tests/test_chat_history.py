@@ -0,0 +1,34 @@
+import chat_history
+from chat_history import ChatHistoryManager, count_tokens, truncate_tokens
+
+
+def test_truncate_tokens_respects_limit():
+    text = "상권 분석 요약 " * 200
+    assert count_tokens(truncate_tokens(text, 50)) <= 50
+    assert truncate_tokens("짧은 문장", 50) == "짧은 문장"
+
+
+def test_compacted_summary_stays_within_token_budget():
+    history = ChatHistoryManager("system", summarize=lambda summary, turns: "유동인구가 많은 역세권 상권입니다. " * 100,
+                                 keep_recent_turns=1, summary_budget=40)
+    history.add_turn("질문1", "답변1")
+    history.add_turn("질문2", "답변2")
+    assert history.summary
+    assert count_tokens(history.summary) <= 40
+
+
+def test_compacted_summary_trimmed_by_tokens_with_encoder(monkeypatch):
+    # 토크나이저가 글자보다 토큰을 더 많이 세는 경우에도 토큰 기준으로 잘림
+    class TwoTokensPerChar:
+        def encode(self, text):
+            return [ord(c) for c in text for _ in range(2)]
+
+        def decode(self, tokens):
+            return "".join(chr(t) for t in tokens[::2])
+
+    monkeypatch.setattr(chat_history, "_encoder", TwoTokensPerChar())
+    history = ChatHistoryManager("system", summarize=lambda summary, turns: "가" * 100,
+                                 keep_recent_turns=0, summary_budget=40)
+    history.add_turn("q", "a")
+    assert count_tokens(history.summary) <= 40
+    assert history.summary == "가" * 20
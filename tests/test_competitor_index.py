@@ -0,0 +1,109 @@
+import math
+import random
+from collections import OrderedDict
+
+import pytest
+
+import competitor_index as ci
+from competitor_index import (
+    COMPETITOR_CRAWL_MAX_ATTEMPTS, KAKAO_ADDRESS_API, KAKAO_PAGE_SIZE, M_PER_DEG_LAT,
+    CompetitorCrawler, CompetitorIndex, CompetitorStore, rect_around, search_rect,
+)
+
+
+def _fake_kakao(places, calls):
+    # rect 안 장소를 페이지 단위로 돌려주는 카카오 키워드 검색 흉내
+    def fetch_json(url, params):
+        calls.append(params)
+        left, bottom, right, top = map(float, params["rect"].split(","))
+        inside = [p for p in places if left <= p["x"] <= right and bottom <= p["y"] <= top]
+        page, size = params["page"], params["size"]
+        docs = inside[(page - 1) * size:page * size]
+        return {"meta": {"total_count": len(inside), "is_end": page * size >= len(inside)}, "documents": docs}
+    return fetch_json
+
+
+def test_search_rect_splits_dense_areas():
+    rng = random.Random(1)
+    left, bottom, right, top = rect_around(37.5, 127.0, 1000)
+    places = [{"id": str(i), "x": rng.uniform(left, right), "y": rng.uniform(bottom, top)} for i in range(200)]
+    calls, found = [], {}
+    assert search_rect(_fake_kakao(places, calls), "카페", (left, bottom, right, top), 3, found) is False
+    assert len(found) == 200
+
+
+def test_search_rect_reports_truncation_at_max_depth():
+    places = [{"id": str(i), "x": 127.0, "y": 37.5} for i in range(KAKAO_PAGE_SIZE * 4)]
+    calls, found = [], {}
+    assert search_rect(_fake_kakao(places, calls), "카페", rect_around(37.5, 127.0, 100), 1, found) is True
+    assert len(found) == KAKAO_PAGE_SIZE * 3
+
+
+def test_count_matches_brute_force():
+    rng = random.Random(2)
+    places = [
+        (str(i), 37.5 + rng.uniform(-0.02, 0.02), 127.0 + rng.uniform(-0.02, 0.02), frozenset([rng.choice(["카페", "편의점"])]))
+        for i in range(2000)
+    ]
+    index = CompetitorIndex(places)
+    for _ in range(20):
+        lat, lng = 37.5 + rng.uniform(-0.01, 0.01), 127.0 + rng.uniform(-0.01, 0.01)
+        radius = rng.uniform(50, 1500)
+        m_per_deg_lng = M_PER_DEG_LAT * math.cos(math.radians(lat))
+
+        def inside(place):
+            dy, dx = (place[1] - lat) * M_PER_DEG_LAT, (place[2] - lng) * m_per_deg_lng
+            return dx * dx + dy * dy <= radius * radius
+
+        assert index.count(lat, lng, radius) == sum(inside(p) for p in places)
+        assert index.count(lat, lng, radius, category="카페") == sum(inside(p) and "카페" in p[3] for p in places)
+
+
+def _crawler(store, geocode, dongs=()):
+    calls = []
+
+    def fetch_json(url, params):
+        calls.append(url)
+        if url == KAKAO_ADDRESS_API or "rect" not in params:
+            location = geocode.get(params["query"].replace("서울특별시 ", ""))
+            return {"documents": [{"y": location[0], "x": location[1]}] if location else []}
+        return {"meta": {"total_count": 0, "is_end": True}, "documents": []}
+
+    return CompetitorCrawler(fetch_json, list(dongs), store=store, keywords=[], per_minute=0), calls
+
+
+def test_unresolvable_dong_does_not_block_the_queue(tmp_path):
+    store = CompetitorStore(str(tmp_path / "competitors.sqlite"))
+    crawler, calls = _crawler(store, {"강남구 역삼1동": (37.5, 127.03)})
+    store.request_crawl("강남구", "없는동", "카페")
+    store.request_crawl("강남구", "역삼1동", "카페")
+
+    with pytest.raises(LookupError):
+        crawler.run_once()
+    assert crawler.run_once() == ("강남구", "역삼1동", "카페")
+    assert crawler.run_once() is None
+    assert len(calls) == 4  # 없는동 주소 / 키워드 검색 2번 + 역삼1동 좌표 + 사각형 검색
+
+    # 재시도 시각이 지나면 다시 시도하고, 한도에 닿으면 요청을 지움
+    for _ in range(2, COMPETITOR_CRAWL_MAX_ATTEMPTS + 1):
+        store._conn().execute("UPDATE crawl_failures SET retry_at = 0")
+        with pytest.raises(LookupError):
+            crawler.run_once()
+    assert store.pending_requests() == []
+    assert crawler.run_once() is None
+    assert store.stats()["failed"] == 1
+
+
+def test_request_crawl_rejects_unknown_dongs_and_keywords(tmp_path, monkeypatch):
+    store = CompetitorStore(str(tmp_path / "competitors.sqlite"))
+    monkeypatch.setattr(ci, "get_competitor_store", lambda: store)
+    monkeypatch.setattr(ci, "get_competitor_index", lambda: CompetitorIndex([]))
+    monkeypatch.setattr(ci, "_requested", OrderedDict())
+    monkeypatch.setattr(ci, "_known_dongs", None)
+    ci.set_known_dongs([("강남구", "역삼1동")])
+
+    assert ci.request_crawl("강남구", "역삼1동 ", "카페") is True
+    assert ci.request_crawl("강남구", "역삼1동", "카페") is True
+    assert ci.request_crawl("강남구", "없는동", "카페") is False
+    assert ci.request_crawl("강남구", "역삼1동", "아무거나") is False
+    assert [tuple(row) for row in store.pending_requests()] == [("강남구", "역삼1동", "카페")]
@@ -0,0 +1,79 @@
+import pickle
+import random
+import statistics
+
+import rag_total_final_api as api
+from cache_utils import TwoTierCache
+from estate_trend import GU_TOTAL, GuTrend, PriceSketch
+from estate_utils import Deal
+from resilience import call_upstream
+
+
+def _deals(prices, umd="역삼동"):
+    return [(umd, Deal(price, 2026, 5, 1 + i % 28, "아파트")) for i, price in enumerate(prices)]
+
+
+def test_sketch_median_within_relative_accuracy():
+    rng = random.Random(3)
+    for n in (1, 2, 101, 5000):
+        values = [rng.lognormvariate(11, 1) for _ in range(n)]
+        sketch = PriceSketch()
+        for value in values:
+            sketch.add(value)
+        expected = statistics.median_low(values)
+        assert abs(sketch.quantile(0.5) - expected) <= 0.01 * expected
+
+
+def test_reingest_same_month_does_not_double_count():
+    trend = GuTrend("강남구")
+    deals = _deals([100, 100, 200])
+    assert trend.ingest("202605", deals) is True
+    assert trend.ingest("202605", list(reversed(deals))) is False
+    assert trend.month("202605").to_dict()["count"] == 3
+
+    # 늦게 신고된 거래가 더해진 응답이면 그 달 집계를 새 응답으로 바꿈
+    assert trend.ingest("202605", deals + _deals([300], umd="삼성동")) is True
+    assert trend.month("202605").to_dict()["count"] == 4
+    assert trend.month("202605", "역삼1동").to_dict()["count"] == 3
+    assert trend.dongs() == ["삼성동", "역삼동"]
+
+
+def test_empty_month_is_recorded_and_prune_drops_old_months():
+    trend = GuTrend("강남구")
+    trend.ingest("202401", _deals([100]))
+    trend.ingest("202605", [])
+    assert trend.missing(["202401", "202605", "202606"]) == ["202606"]
+    assert trend.prune("202501") == 1
+    assert trend.missing(["202401", "202605"]) == ["202401"]
+    assert "202401" not in trend.months
+
+
+def test_old_pickles_are_upgraded():
+    trend = GuTrend("강남구")
+    trend.ingest("202605", _deals([100]))
+    state = pickle.loads(pickle.dumps(trend)).__dict__
+    del state["_digests"]
+    state["_seen"] = {"202605": {("역삼동", 100, 0, "아파트"): 1}}
+    old = GuTrend.__new__(GuTrend)
+    old.__setstate__(state)
+    assert old.has_month("202605")
+    assert old.ingest("202605", _deals([100])) is True
+    assert old.months["202605"][GU_TOTAL].count == 1
+
+
+def test_backfill_stops_at_daily_quota(monkeypatch):
+    fetched = []
+
+    def fetch_month(gu, lawd_cd, yyyymm):
+        fetched.append((gu, yyyymm))
+        return call_upstream("test_backfill", lambda timeout: [])
+
+    monkeypatch.setattr(api, "_fetch_real_estate_month", fetch_month)
+    monkeypatch.setattr(api, "get_gu_code_map", lambda: {"강남구": "11680"})
+    monkeypatch.setattr(api, "ESTATE_BACKFILL_PER_MINUTE", 0)
+    monkeypatch.setattr(api, "ESTATE_BACKFILL_DAILY_QUOTA", 2)
+    monkeypatch.setattr(api, "estate_backfill_usage", TwoTierCache("test-backfill-usage", 60))
+
+    result = api._estate_backfill_job({"months": {"강남구": ["202601", "202602", "202603"]}}, lambda *args: None)
+    assert fetched == [("강남구", "202601"), ("강남구", "202602")]
+    assert result == {"months": 3, "failed": 0, "skipped": 1}
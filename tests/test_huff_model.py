@@ -0,0 +1,41 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from huff_model import analyze_new_store, distance_matrix_km, grid_points, huff_probabilities
+
+SITE = (37.5, 127.0)
+
+
+def test_grid_points_stay_inside_radius():
+    lats, lngs = grid_points(*SITE, radius_km=1.0, step_km=0.1)
+    distances = distance_matrix_km([SITE[0]], [SITE[1]], lats, lngs)[0]
+    assert len(lats) > 300
+    assert distances.max() <= 1.001
+
+
+def test_probabilities_sum_to_one_and_favour_closer_store():
+    distances = np.array([[0.2, 0.4], [1.0, 0.5]])
+    probabilities = huff_probabilities(distances, [1.0, 1.0], decay=2.0)
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    assert probabilities[0, 0] == pytest.approx(0.8)
+
+
+def test_no_competitors_takes_whole_market():
+    lats, lngs = grid_points(*SITE, radius_km=0.5, step_km=0.1)
+    result = analyze_new_store(SITE, [], lats, lngs, np.ones(len(lats)))
+    assert result["market_share"] == pytest.approx(1.0)
+    assert result["nearest_competitor_km"] is None
+
+
+def test_demand_weights_and_attractiveness_shift_share():
+    lats, lngs = grid_points(*SITE, radius_km=1.0, step_km=0.1)
+    competitor = (SITE[0] + 0.006, SITE[1])  # 약 670m 북쪽
+    north = lats > SITE[0]
+    even = analyze_new_store(SITE, [competitor], lats, lngs, np.ones(len(lats)))
+    south_heavy = analyze_new_store(SITE, [competitor], lats, lngs, np.where(north, 1.0, 10.0))
+    assert south_heavy["market_share"] > even["market_share"]
+    strong = analyze_new_store(SITE, [competitor], lats, lngs, np.ones(len(lats)), competitor_attractiveness=[3.0])
+    assert strong["market_share"] < even["market_share"]
+    assert even["competitors_within_500m"] == 0
+    assert even["nearest_competitor_km"] == pytest.approx(0.667, abs=0.01)
@@ -0,0 +1,66 @@
+import time
+import threading
+
+import rag_total_final_api as api
+from cache_utils import StaleWhileRevalidateCache, make_key
+from job_queue import JobQueue
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_report_is_ignored_after_job_finishes():
+    jobs = JobQueue("test-jobs-late-report", workers=1)
+    reporters = []
+
+    def job(payload, report):
+        reporters.append(report)
+        return {"value": "final"}
+
+    job_id = jobs.submit("test", job, {})
+    assert _wait_for(lambda: jobs.get(job_id)["status"] == "done")
+    reporters[0]("fetched", {"value": "partial"})
+    finished = jobs.get(job_id)
+    assert finished["progress"] == "done"
+    assert finished["result"] == {"value": "final"}
+
+
+def test_stale_hit_refresh_does_not_touch_finished_job(monkeypatch):
+    # stale 값으로 끝난 작업의 결과를 백그라운드 갱신이 덮어쓰지 않아야 함
+    cache = StaleWhileRevalidateCache(soft_ttl=1, hard_ttl=3600, name="test-analyze-stale")
+    monkeypatch.setattr(api, "_analyze_cache", cache)
+    monkeypatch.setattr(api.analyze_prefetcher, "observe", lambda key, meta: None)
+    stale = {"gu": "강남구", "dong": "역삼1동", "item": "카페", "score": "old", "degraded": []}
+    cache.store.set(make_key(("강남구", "역삼1동", "카페")), (stale, time.time() - 10))
+
+    release = threading.Event()
+    refreshed = threading.Event()
+
+    def fake_analyze_market(gu, dong, item, *fns, progress=None):
+        release.wait(5)
+        if progress is not None:
+            progress("fetched", {"gu": gu, "dong": dong, "item": item, "score": "partial"})
+        refreshed.set()
+        return {"gu": gu, "dong": dong, "item": item, "score": "new", "degraded": []}
+
+    monkeypatch.setattr(api, "analyze_market", fake_analyze_market)
+    jobs = JobQueue("test-jobs-stale-refresh", workers=1)
+    job_id = jobs.submit("analyze_market", api._analyze_market_job,
+                         {"gu": "강남구", "dong": "역삼1동", "item": "카페"})
+    assert _wait_for(lambda: jobs.get(job_id)["status"] == "done")
+
+    release.set()
+    assert refreshed.wait(5)
+    assert _wait_for(lambda: cache.store.get(make_key(("강남구", "역삼1동", "카페")))[0]["score"] == "new")
+
+    finished = jobs.get(job_id)
+    assert finished["status"] == "done"
+    assert finished["progress"] == "done"
+    assert finished["result"]["score"] == "old"
+    assert finished["result"]["meta"]["cache"] == "stale"
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from llm_governor import EmbeddingBatcher, LLMGovernor, llm_priority
+from resilience import UpstreamUnavailable
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_higher_priority_waiter_runs_first():
+    governor = LLMGovernor(max_concurrency=1, tokens_per_minute=0)
+    order = []
+
+    def call(name, priority):
+        with llm_priority(priority):
+            with governor.slot(name, timeout=5):
+                order.append(name)
+
+    with governor.slot("holder"):
+        background = threading.Thread(target=call, args=("background", 5))
+        background.start()
+        assert _wait_for(lambda: governor.stats()["queued"] == 1)
+        chat = threading.Thread(target=call, args=("chat", 0))
+        chat.start()
+        assert _wait_for(lambda: governor.stats()["queued"] == 2)
+    background.join(5)
+    chat.join(5)
+    assert order == ["chat", "background"]
+
+
+def test_token_bucket_times_out_when_empty():
+    governor = LLMGovernor(max_concurrency=4, tokens_per_minute=60)
+    with governor.slot("chat", tokens=60):
+        pass
+    with pytest.raises(UpstreamUnavailable):
+        with governor.slot("chat", tokens=30, timeout=0.1):
+            pass
+    stats = governor.stats()
+    assert stats["granted"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["queued"] == 0
+
+
+def test_oversized_request_passes_on_full_bucket():
+    governor = LLMGovernor(max_concurrency=1, tokens_per_minute=100)
+    with governor.slot("chat", tokens=1000, timeout=0.1):
+        assert governor.stats()["in_flight"] == 1
+    assert governor.stats()["in_flight"] == 0
+
+
+def test_embedding_batcher_merges_concurrent_requests():
+    calls = []
+
+    def embed_many(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(embed_many, window_ms=200, max_batch=8)
+    futures = [batcher.submit(text) for text in ["a", "bb", "a"]]
+    assert [future.result(timeout=5) for future in futures] == [[1.0], [2.0], [1.0]]
+    assert calls == [["a", "bb"]]
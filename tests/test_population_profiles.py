@@ -0,0 +1,30 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from population_profiles import HOUR_FIELDS, PopulationProfiles, window_hours
+
+
+def test_window_hours():
+    assert list(window_hours(11, 14)) == [11, 12, 13]
+    assert list(window_hours(22, 2)) == [22, 23, 0, 1]
+    assert list(window_hours(5, 5)) == [5]
+    assert list(window_hours(0, 24)) == list(range(24))
+    with pytest.raises(ValueError):
+        window_hours(24, 3)
+
+
+def test_top_and_describe_window_share():
+    address_rows = [
+        {"dong_id": "11680640", "cgg_nm": "강남구", "dong_nm": "역삼1동"},
+        {"dong_id": "11140550", "cgg_nm": "중구", "dong_nm": "명동"},
+    ]
+    rows = {
+        "11680640": {field: 10 for field in HOUR_FIELDS},
+        "11140550": {**{field: 0 for field in HOUR_FIELDS}, "PSNG_NO_12": 100},
+    }
+    profiles = PopulationProfiles.from_rows(rows, address_rows)
+    assert [entry["dong"] for entry in profiles.top(12, 12, n=2)] == ["명동", "역삼1동"]
+    described = profiles.describe(profiles.find("강남구", "역삼1동"), 11, 14)
+    assert described["window_total"] == 30
+    assert described["window_share"] == round(30 / 240, 4)
@@ -0,0 +1,40 @@
+from question_parser import Gazetteer, QuestionParser
+
+ADDRESS_ROWS = [
+    {"cgg_nm": "강남구", "dong_nm": "역삼1동"},
+    {"cgg_nm": "강남구", "dong_nm": "삼성동"},
+    {"cgg_nm": "중구", "dong_nm": "신당동"},
+    {"cgg_nm": "동대문구", "dong_nm": "신당동"},
+]
+
+
+def test_keyword_inside_compound_word_is_found():
+    parsed = QuestionParser(ADDRESS_ROWS).parse("카페창업 하려면?")
+    assert parsed.intents == ["recommendation"]
+    assert parsed.keywords == ["창업"]
+    assert "카페" in parsed.terms
+
+
+def test_dong_inside_word_is_rejected():
+    parsed = QuestionParser([{"cgg_nm": "중구", "dong_nm": "활동"}]).parse("야외활동 상권")
+    assert parsed.dong is None
+    assert parsed.intents == ["location"]
+
+
+def test_attached_gu_and_dong_alias():
+    parsed = QuestionParser(ADDRESS_ROWS).parse("강남구역삼동 유동인구 분석")
+    assert (parsed.gu, parsed.dong) == ("강남구", "역삼동")
+    assert parsed.intents == ["analysis", "population"]
+    assert parsed.canonical == "강남구 역삼동 분석 유동인구"
+
+
+def test_dong_alone_fills_gu_only_when_unique():
+    parser = QuestionParser(ADDRESS_ROWS)
+    assert parser.parse("삼성동 입지").gu == "강남구"
+    assert parser.parse("신당동 입지").gu is None
+
+
+def test_gazetteer_prefers_longest_leftmost_match():
+    gazetteer = Gazetteer({"he": 1, "she": 2, "hers": 3, "his": 4})
+    assert [(start, end, payload) for start, end, payload in gazetteer.find("ushers")] == [(1, 4, 2)]
+    assert sorted(p for _, _, p in gazetteer.find_all("ushers")) == [1, 2, 3]
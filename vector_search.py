@@ -0,0 +1,52 @@
+import json
+
+# ✅ Weaviate 다중 질의 검색
+# 여러 질문을 GraphQL 별칭(q0, q1, ...)으로 한 요청에 묶어 보내고, 필요한 속성(content)과 거리(distance)만 받아옵니다.
+# max_distance 를 주면 서버(nearVector/nearText 의 distance)와 응답 파싱 양쪽에서 거리가 먼 문서를 걸러
+# 관련 없는 문서가 프롬프트에 들어가지 않게 합니다.
+
+def _near_clause(query, mode, max_distance):
+    distance = f", distance: {max_distance}" if max_distance else ""
+    if mode == "text":
+        return f"nearText: {{concepts: {json.dumps([query], ensure_ascii=False)}{distance}}}"
+    return f"nearVector: {{vector: {json.dumps([float(v) for v in query])}{distance}}}"
+
+def build_multi_get_query(class_name, queries, limit, properties=("content",), mode="vector", max_distance=None):
+    # queries: mode 가 vector 면 임베딩 벡터 목록, text 면 질문 문자열 목록
+    fields = " ".join(properties) + " _additional { id distance }"
+    parts = [
+        f"q{i}: {class_name}({_near_clause(query, mode, max_distance)}, limit: {int(limit)}) {{ {fields} }}"
+        for i, query in enumerate(queries)
+    ]
+    return "{ Get { " + " ".join(parts) + " } }"
+
+def parse_multi_get_result(result, count, text_key="content", max_distance=None):
+    # 질의 순서대로 [{"content", "metadata": {"id", "distance"}}] 목록을 반환
+    if result.get("errors"):
+        raise RuntimeError(f"weaviate query failed: {result['errors']}")
+    data = (result.get("data") or {}).get("Get") or {}
+    results = []
+    for i in range(count):
+        rows = []
+        for obj in data.get(f"q{i}") or []:
+            extra = obj.get("_additional") or {}
+            distance = extra.get("distance")
+            content = (obj.get(text_key) or "").strip()
+            if not content:
+                continue
+            if max_distance and distance is not None and distance > max_distance:
+                continue
+            rows.append({"content": content, "metadata": {"id": extra.get("id"), "distance": distance}})
+        results.append(rows)
+    return results
+
+def multi_search(run_query, class_name, queries, limit, vectors=None, max_distance=None, text_key="content"):
+    # run_query(graphql) -> 응답 dict, vectors 가 있으면 nearVector, 없으면 nearText
+    if not queries:
+        return []
+    mode = "vector" if vectors is not None else "text"
+    graphql = build_multi_get_query(
+        class_name, vectors if vectors is not None else queries, limit,
+        properties=(text_key,), mode=mode, max_distance=max_distance
+    )
+    return parse_multi_get_result(run_query(graphql), len(queries), text_key=text_key, max_distance=max_distance)